@@ -0,0 +1,164 @@
+"""
+Compare the time and memory of parsing one Video Intelligence result three ways:
+
+  dicts     the previous parser: one dict per object frame (bounding box) and per
+            text frame (rotated polygon), built through the proto-plus wrappers
+  summary   GoogleVideoAnalyzer's default: descriptions, spans, confidences and
+            frame counts only
+  geometry  summary plus per-frame geometry as float32 NumPy arrays
+
+The fixture is a serialized VideoAnnotationResults message. Pass --fixture to use a
+recorded one (e.g. VideoAnnotationResults.serialize(response.annotation_results[0])
+from a real response); otherwise a synthetic result shaped like a busy 60 s TikTok
+is generated, and --save writes it out for later runs.
+
+Usage:
+    python benchmarks/bench_annotation_parse.py [--fixture result.pb] [--save result.pb]
+        [--objects 40] [--object-frames 300] [--texts 60] [--text-frames 120] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from google.cloud import videointelligence
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.GoogleVideoAnalyzer import GoogleVideoAnalyzer
+
+
+def duration(seconds):
+    return {"seconds": int(seconds), "nanos": int((seconds % 1) * 1e9)}
+
+
+def synthetic_result(objects, object_frames, texts, text_frames, seed=7):
+    """Build a VideoAnnotationResults with the given numbers of objects, texts and frames."""
+    rng = random.Random(seed)
+    object_annotations = [{
+        "entity": {"description": f"object {i % 12}"},
+        "confidence": rng.random(),
+        "segment": {"start_time_offset": duration(0), "end_time_offset": duration(object_frames / 5)},
+        "frames": [{
+            "time_offset": duration(f / 5),
+            "normalized_bounding_box": {"left": rng.random(), "top": rng.random(),
+                                        "right": rng.random(), "bottom": rng.random()},
+        } for f in range(object_frames)],
+    } for i in range(objects)]
+    text_annotations = [{
+        "text": f"caption {i}",
+        "segments": [{
+            "confidence": rng.random(),
+            "segment": {"start_time_offset": duration(s * 20), "end_time_offset": duration(s * 20 + 10)},
+            "frames": [{
+                "time_offset": duration(s * 20 + f / 12),
+                "rotated_bounding_box": {"vertices": [{"x": rng.random(), "y": rng.random()} for _ in range(4)]},
+            } for f in range(text_frames // 3)],
+        } for s in range(3)],
+    } for i in range(texts)]
+    return videointelligence.VideoAnnotationResults(
+        segment={"start_time_offset": duration(0), "end_time_offset": duration(60)},
+        segment_label_annotations=[{"entity": {"description": f"label {i}"}} for i in range(20)],
+        shot_label_annotations=[{"entity": {"description": f"label {i}"}} for i in range(40)],
+        shot_annotations=[{"start_time_offset": duration(i * 3), "end_time_offset": duration(i * 3 + 3)}
+                          for i in range(20)],
+        object_annotations=object_annotations,
+        text_annotations=text_annotations,
+    )
+
+
+def parse_dicts(annotation_result):
+    """The object and text sections of the previous parser, for comparison."""
+    objects_info = []
+    for obj_annotation in annotation_result.object_annotations:
+        frames_data = []
+        for frame in obj_annotation.frames:
+            box = frame.normalized_bounding_box
+            frames_data.append({
+                "time_offset_sec": frame.time_offset.total_seconds(),
+                "bounding_box": {"left": box.left, "top": box.top, "right": box.right, "bottom": box.bottom}
+            })
+        objects_info.append({
+            "object_description": obj_annotation.entity.description,
+            "segment_start": obj_annotation.segment.start_time_offset.total_seconds(),
+            "segment_end": obj_annotation.segment.end_time_offset.total_seconds(),
+            "frames": frames_data
+        })
+    texts_info = []
+    for text_anno in annotation_result.text_annotations:
+        text_segments = []
+        for seg in text_anno.segments:
+            frames_data = []
+            for f in seg.frames:
+                box = f.rotated_bounding_box
+                poly = [{"x": v.x, "y": v.y} for v in box.vertices] if box else []
+                frames_data.append({"time_offset_sec": f.time_offset.total_seconds(), "bounding_polygon": poly})
+            text_segments.append({
+                "segment_start": seg.segment.start_time_offset.total_seconds(),
+                "segment_end": seg.segment.end_time_offset.total_seconds(),
+                "confidence": seg.confidence,
+                "frames": frames_data
+            })
+        texts_info.append({"text": text_anno.text, "text_segments": text_segments})
+    return {"objects": objects_info, "texts": texts_info}
+
+
+def measure(parse, payload, repeat):
+    """Return (median seconds, peak traced bytes) of parsing the serialized `payload`."""
+    times = []
+    for _ in range(repeat):
+        result = videointelligence.VideoAnnotationResults.deserialize(payload)
+        start = time.perf_counter()
+        parse(result)
+        times.append(time.perf_counter() - start)
+
+    result = videointelligence.VideoAnnotationResults.deserialize(payload)
+    tracemalloc.start()
+    parsed = parse(result)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del parsed
+    return statistics.median(times), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixture", help="Serialized VideoAnnotationResults to parse")
+    parser.add_argument("--save", help="Write the synthetic fixture to this path")
+    parser.add_argument("--objects", type=int, default=40)
+    parser.add_argument("--object-frames", type=int, default=300)
+    parser.add_argument("--texts", type=int, default=60)
+    parser.add_argument("--text-frames", type=int, default=120)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.fixture:
+        with open(args.fixture, "rb") as file:
+            payload = file.read()
+    else:
+        result = synthetic_result(args.objects, args.object_frames, args.texts, args.text_frames)
+        payload = videointelligence.VideoAnnotationResults.serialize(result)
+        if args.save:
+            with open(args.save, "wb") as file:
+                file.write(payload)
+
+    analyzer = GoogleVideoAnalyzer.__new__(GoogleVideoAnalyzer)
+    frames = videointelligence.VideoAnnotationResults.deserialize(payload)
+    object_frames = sum(len(obj.frames) for obj in frames.object_annotations)
+    text_frames = sum(len(seg.frames) for text in frames.text_annotations for seg in text.segments)
+    print(f"Fixture: {len(payload) / 1024:.0f} KiB, {object_frames} object frames, {text_frames} text frames")
+    print(f"{'mode':<10}{'median ms':>12}{'peak MiB':>12}")
+    for label, parse in (
+        ("dicts", parse_dicts),
+        ("summary", lambda result: analyzer._parse_annotation_result(result)),
+        ("geometry", lambda result: analyzer._parse_annotation_result(result, parse_mode="geometry")),
+    ):
+        seconds, peak = measure(parse, payload, args.repeat)
+        print(f"{label:<10}{seconds * 1000:>12.1f}{peak / 2 ** 20:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
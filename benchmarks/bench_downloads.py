@@ -0,0 +1,100 @@
+"""
+Measure per-download latency with a fresh connection per video (module-level
+requests.get, as before) versus the pooled keep-alive session of GCSVideoUploader.
+
+A local HTTP/1.1 server stands in for the TikTok CDN. Real CDN downloads pay DNS,
+TCP and TLS setup on every new connection; the server simulates that cost by
+delaying each new connection by --handshake milliseconds before serving it.
+
+Usage:
+    python benchmarks/bench_downloads.py [--videos 40] [--size-kb 512] [--handshake 30] [--workers 4]
+"""
+import argparse
+import concurrent.futures
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.GoogleCloud import GCSVideoUploader
+
+
+def make_handler(body, handshake_seconds):
+    class VideoHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        connections = 0
+
+        def setup(self):
+            super().setup()
+            VideoHandler.connections += 1
+            time.sleep(handshake_seconds)
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return VideoHandler
+
+
+def download(get, url, timeout):
+    """Stream one video the way the uploader does and return its latency in seconds."""
+    start = time.perf_counter()
+    with get(url, stream=True, timeout=timeout) as resp:
+        resp.raise_for_status()
+        for _ in resp.iter_content(chunk_size=256 * 1024):
+            pass
+    return time.perf_counter() - start
+
+
+def run(label, get, url, videos, workers, handler):
+    handler.connections = 0
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = list(pool.map(lambda _: download(get, url, (5.0, 30.0)), range(videos)))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(f"{label:<16}{statistics.mean(latencies) * 1000:>10.1f}{statistics.median(latencies) * 1000:>10.1f}"
+          f"{p95 * 1000:>10.1f}{wall:>10.2f}{handler.connections:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=40, help="Number of downloads")
+    parser.add_argument("--size-kb", type=int, default=512, help="Size of each video in KiB")
+    parser.add_argument("--handshake", type=float, default=30, help="Simulated connection setup cost in ms")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent downloads (and pool size)")
+    args = parser.parse_args()
+
+    handler = make_handler(os.urandom(args.size_kb * 1024), args.handshake / 1000)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/video.mp4"
+
+    session = GCSVideoUploader._build_session(args.workers)
+    print(f"{args.videos} downloads of {args.size_kb} KiB, {args.workers} workers, "
+          f"{args.handshake:.0f} ms simulated handshake")
+    print(f"{'mode':<16}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'wall s':>10}{'conns':>8}")
+    run("requests.get", requests.get, url, args.videos, args.workers, handler)
+    run("pooled session", session.get, url, args.videos, args.workers, handler)
+
+    session.close()
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Measure the latency and estimated cost of each Video Intelligence feature profile
+on real videos that are already in the bucket.
+
+Every video is analyzed once per profile, without the annotation cache. The report
+comes from GoogleVideoAnalyzer.profile_stats(): mean annotate_video latency (request
+to parsed result), analyzed minutes and the cost at list price per feature-minute.
+This calls the real API and is billed accordingly.
+
+Usage:
+    python benchmarks/bench_feature_profiles.py gs://bucket/tikapi_videos/1.mp4 [...] \
+        [--profiles fast standard full] [--workers 4]
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.GoogleVideoAnalyzer import GoogleVideoAnalyzer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("uris", nargs="+", help="gs:// URIs of videos to analyze")
+    parser.add_argument("--profiles", nargs="+", default=["fast", "standard", "full"])
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent analyses")
+    args = parser.parse_args()
+
+    analyzer = GoogleVideoAnalyzer()
+    for profile in args.profiles:
+        print(f"Profile {profile}...")
+        analyzer.analyze_videos_in_batch(args.uris, max_workers=args.workers, profile=profile)
+
+    stats = analyzer.profile_stats()
+    print(f"\n{'profile':<12}{'videos':>8}{'mean s':>10}{'minutes':>10}{'USD':>10}{'USD/video':>12}")
+    for profile in args.profiles:
+        row = stats.get(profile)
+        if not row or not row["videos"]:
+            print(f"{profile:<12}{'no successful analyses':>50}")
+            continue
+        print(f"{profile:<12}{row['videos']:>8}{row['mean_latency_seconds']:>10.1f}{row['video_minutes']:>10.2f}"
+              f"{row['estimated_cost_usd']:>10.4f}{row['estimated_cost_usd'] / row['videos']:>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
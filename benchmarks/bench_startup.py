@@ -0,0 +1,98 @@
+"""
+Measure the cold-start cost of the package with `python -X importtime`.
+
+Each target runs in fresh interpreters. The report shows:
+  imports   the total import time reported by -X importtime: the sum of the
+            cumulative times of the top-level imports, including the interpreter's
+            own startup imports (site, ...)
+  wall      wall-clock time of the whole interpreter run
+  modules   number of modules imported
+
+Targets:
+  package     import src
+  entry       the web app's import, load_config_and_initialize
+  finder      entry, plus constructing a ViralMusicFinder with placeholder credentials
+              (clients are built on first use, so no SDK is loaded and nothing is called)
+  clients     every API client class, i.e. what importing the package used to cost
+
+--top lists the slowest imports of the last run of each target. --max-ms fails the run
+(exit status 1) when a target's median import time exceeds its limit, to catch regressions.
+
+Usage:
+    python benchmarks/bench_startup.py [--targets package entry finder clients] [--repeat 5]
+        [--top 10] [--max-ms package=50 finder=400]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    "package": "import src",
+    "entry": "from src.ViralMusicFinder import load_config_and_initialize",
+    "finder": (
+        "from src.ViralMusicFinder import ViralMusicFinder\n"
+        "ViralMusicFinder('key', 'secret', 'llm-key', 'tikapi-key', 'google.json', 'bucket')"
+    ),
+    "clients": (
+        "from src import GoogleVideoAnalyzer, GCSVideoUploader, LastfmAPI, TikAPIWrapper, OpenAITrendSummarizer"
+    ),
+}
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def run(code):
+    """Run `code` in a fresh interpreter; return (wall seconds, [(self us, cumulative us, depth, module)])."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                            capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode:
+        raise RuntimeError(f"{code!r} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            rows.append((int(own), int(cumulative), len(indent) // 2, module))
+    return wall, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", nargs="+", default=list(TARGETS), choices=list(TARGETS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0, help="Slowest imports to list per target")
+    parser.add_argument("--max-ms", nargs="*", default=[], metavar="TARGET=MS",
+                        help="Fail if a target's median import time exceeds MS milliseconds")
+    args = parser.parse_args()
+    limits = {target: float(ms) for target, ms in (item.split("=", 1) for item in args.max_ms)}
+
+    print(f"{'target':<10}{'imports ms':>12}{'wall ms':>10}{'modules':>9}")
+    failed = []
+    for target in args.targets:
+        imports, walls = [], []
+        for _ in range(args.repeat):
+            wall, rows = run(TARGETS[target])
+            walls.append(wall)
+            imports.append(sum(cumulative for _, cumulative, depth, _ in rows if depth == 0) / 1000)
+        median = statistics.median(imports)
+        print(f"{target:<10}{median:>12.1f}{statistics.median(walls) * 1000:>10.1f}{len(rows):>9}")
+        for own, cumulative, depth, module in sorted(rows, key=lambda row: -row[1])[:args.top]:
+            print(f"{'':<4}{cumulative / 1000:>9.1f} ms  {module}")
+        if target in limits and median > limits[target]:
+            failed.append(f"{target}: {median:.1f} ms > {limits[target]:.1f} ms")
+
+    if failed:
+        print("Startup regression: " + "; ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Compare the wall time and token usage of the three ways to summarize a brief:
+
+  sequential  one completion per track, then one for the aggregate, one after another
+  concurrent  the per-track completions run in parallel under the OpenAI limit,
+              followed by the aggregate completion (the default summary_mode)
+  batched     a single JSON-mode completion for all tracks and the aggregate
+
+The OpenAI client is replaced by a simulated one, so the benchmark runs offline and
+costs nothing. Its latency grows with the number of generated tokens, and token counts
+are estimated at four characters per token.
+
+Usage:
+    python benchmarks/bench_summaries.py [--tracks 3] [--latency 0.4] [--per-token 0.004]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.OpenAITrend import OpenAITrendSummarizer
+from src.Scheduler import PipelineScheduler
+
+BRIEF = "Film a two-person dance in a bright bedroom with large captions centered on screen. " * 4
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class SimulatedCompletions:
+    """Answers chat completions after a delay proportional to the generated tokens."""
+
+    def __init__(self, latency, per_token):
+        self.latency = latency
+        self.per_token = per_token
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def create(self, model, messages, max_tokens, response_format=None, **kwargs):
+        prompt_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+        if response_format:
+            prompt = messages[-1]["content"]
+            track_count = prompt.count("### Track ")
+            content = json.dumps({
+                "tracks": [{"track": i + 1, "brief": BRIEF} for i in range(track_count)],
+                "overall": BRIEF,
+            })
+        else:
+            content = BRIEF
+        completion_tokens = estimate_tokens(content)
+        time.sleep(self.latency + completion_tokens * self.per_token)
+
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(total_tokens=prompt_tokens + completion_tokens),
+        )
+
+
+def make_trends(track_count):
+    tracks = []
+    for i in range(track_count):
+        tracks.append((f"'Track {i + 1}' by Artist", {
+            "label_trends": ["Dance", "Bedroom", f"Theme {i}"],
+            "object_trends": ["person"],
+            "text_trends": [f"@creator{i}", "POV"],
+        }))
+    overall = {}
+    for _, trends in tracks:
+        for category, items in trends.items():
+            overall.setdefault(category, []).extend(items)
+    return tracks, overall
+
+
+def run(mode, tracks, overall, latency, per_token):
+    completions = SimulatedCompletions(latency, per_token)
+    summarizer = OpenAITrendSummarizer(api_key="benchmark")
+    summarizer.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    scheduler = PipelineScheduler()
+
+    start = time.perf_counter()
+    if mode == "sequential":
+        for _, trends in tracks:
+            summarizer.summarize_trends(trends)
+        summarizer.summarize_trends(overall)
+    elif mode == "concurrent":
+        futures = [scheduler.submit("openai", summarizer.summarize_trends, trends) for _, trends in tracks]
+        for future in futures:
+            future.result()
+        summarizer.summarize_trends(overall)
+    else:
+        summarizer.summarize_batch(tracks, overall)
+    elapsed = time.perf_counter() - start
+    scheduler.shutdown()
+    return elapsed, completions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=3, help="Number of similar tracks")
+    parser.add_argument("--latency", type=float, default=0.4, help="Fixed latency per completion, in seconds")
+    parser.add_argument("--per-token", type=float, default=0.004, help="Seconds per generated token")
+    args = parser.parse_args()
+
+    tracks, overall = make_trends(args.tracks)
+    print(f"{'mode':<12}{'calls':>7}{'wall (s)':>10}{'prompt tok':>12}{'output tok':>12}{'total tok':>11}")
+    for mode in ("sequential", "concurrent", "batched"):
+        elapsed, completions = run(mode, tracks, overall, args.latency, args.per_token)
+        total = completions.prompt_tokens + completions.completion_tokens
+        print(f"{mode:<12}{completions.calls:>7}{elapsed:>10.2f}"
+              f"{completions.prompt_tokens:>12}{completions.completion_tokens:>12}{total:>11}")
+
+
+if __name__ == "__main__":
+    main()
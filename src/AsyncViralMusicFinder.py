@@ -0,0 +1,441 @@
+import asyncio
+import httpx
+from .CompareFeatures import CompareFeatures
+from .Cache import SQLiteCache
+from .Scheduler import PipelineScheduler
+from .MusicIndex import MusicIDIndex
+from .RateLimiter import RateLimiterRegistry
+from .VideoTranscoder import VideoTranscoder
+from .TrendStore import TrendStore
+from .TextSimilarity import TextClusterer
+from .ViralMusicFinder import ViralMusicFinder, DEFAULT_EXPANSION, lazy_client
+
+
+class AsyncViralMusicFinder:
+    """
+    An asyncio-native variant of ViralMusicFinder.
+
+    Every stage of the pipeline runs as an asyncio task on one event loop, so a single
+    process can work on many briefs at the same time. Video Intelligence and OpenAI are
+    called through their async clients and videos are downloaded with httpx. Last.fm,
+    TikAPI and the blocking GCS calls have no async clients and run in worker threads.
+    Each service is limited by its own semaphore, shared by all briefs on the loop.
+
+    find_tiktoks produces exactly the same output lines as ViralMusicFinder.find_tiktoks.
+    The semaphores and the HTTP client bind to the first event loop that uses them,
+    so an instance should be used from a single loop.
+
+    Attributes:
+        limits (dict): Maximum number of concurrent calls per service
+        http_client (httpx.AsyncClient or None): Client for video downloads, created on first use
+    """
+    def __init__(self, music_key:str, music_secret:str, LLM_key:str,
+                 tiktok_key:str, google_json:str, bucket_name:str,
+                 annotation_cache:SQLiteCache = None,
+                 summary_cache = None,
+                 limits:dict = None,
+                 prompt_budget:dict = None,
+                 music_index:MusicIDIndex = None,
+                 rate_limits:dict = None,
+                 http_timeouts:dict = None,
+                 transcode:dict = None,
+                 analysis:dict = None,
+                 trend_store:TrendStore = None,
+                 text_clustering:dict = None,
+                 lastfm:dict = None,
+                 expansion:dict = None):
+
+        self.music_key = music_key
+        self.music_secret = music_secret
+        self.LLM_key = LLM_key
+        self.tiktok_key = tiktok_key
+        self.google_json = google_json
+        self.bucket_name = bucket_name
+
+        # Token buckets and retry policies shared by every client talking to the same service
+        self.rate_limiters = RateLimiterRegistry(rate_limits)
+
+        # The API clients are built on first use, as in ViralMusicFinder
+        self._client_options = {
+            "annotation_cache": annotation_cache, "summary_cache": summary_cache, "prompt_budget": prompt_budget,
+            "http_timeouts": http_timeouts, "transcode": transcode, "analysis": analysis, "lastfm": lastfm,
+        }
+        self.trend_store = trend_store
+        # Near-duplicate OCR texts ("@user", "@usr", "user") are merged into one feature
+        self.Comparator = CompareFeatures(
+            threshold=0.5, store=trend_store, text_clusterer=TextClusterer.from_settings(text_clustering)
+        )
+
+        self.limits = dict(PipelineScheduler.DEFAULT_LIMITS)
+        self.limits.update(limits or {})
+        self._semaphores = {service: asyncio.Semaphore(limit) for service, limit in self.limits.items()}
+        self.http_client = None
+        self.music_index = music_index
+        self.expansion = {**DEFAULT_EXPANSION, **(expansion or {})}
+
+    music_api = lazy_client(ViralMusicFinder.music_api.build)
+    tiktok_api = lazy_client(ViralMusicFinder.tiktok_api.build)
+    Analyzer = lazy_client(ViralMusicFinder.Analyzer.build)
+    Summarizer = lazy_client(ViralMusicFinder.Summarizer.build)
+
+    @lazy_client
+    def Uploader(self):
+        """GCS uploader; downloads go through the shared httpx client instead of a pool."""
+        from .GoogleCloud import GCSVideoUploader
+        return GCSVideoUploader(
+            self.google_json, bucket_name=self.bucket_name, rate_limiter=self.rate_limiters.get("gcs"),
+            transcoder=VideoTranscoder.from_settings(self._client_options["transcode"]),
+            **(self._client_options["http_timeouts"] or {})
+        )
+
+    async def client(self, name):
+        """
+        Return the API client `name` ("music_api", "tiktok_api", "Uploader", "Analyzer" or
+        "Summarizer"). A client that is not built yet is built in a worker thread, so its SDK
+        import, credentials and warm-up calls never block the event loop.
+        """
+        if not lazy_client.is_built(self, name):
+            await asyncio.to_thread(getattr, self, name)
+        return getattr(self, name)
+
+    async def find_tiktoks(self, song: str = None, artist: str = None, feature_profile: str = None,
+                           track_budget: int = None, candidates: int = None) -> list:
+        # Initialize an empty list to hold each line of the output
+        output_lines = []
+
+        track_budget, candidates = ViralMusicFinder._expansion_limits(self.expansion, track_budget, candidates)
+
+        # 1. Get similar tracks from Last.fm, with their match scores
+        music_api = await self.client("music_api")
+        similar_tracks = await self._in_thread(
+            "lastfm", music_api.get_similar_tracks_scored, song=song, artist=artist, limit=candidates
+        )
+        if not similar_tracks:
+            print("No similar tracks found...")
+            return [
+                "No similar tracks found.",
+                f"no similar tracks found for {song} by {artist}"
+            ]
+
+        # The analyzer is only built here to check a requested profile, as in ViralMusicFinder
+        if feature_profile is not None:
+            analyzer = await self.client("Analyzer")
+            if feature_profile not in analyzer.profiles:
+                raise ValueError(f"Unknown feature profile '{feature_profile}', "
+                                 f"expected one of {sorted(analyzer.profiles)}")
+
+        # 2. Probe every candidate's TikTok presence cheaply and keep the best `track_budget`
+        ranked, failures = await self.rank_similar_tracks(similar_tracks)
+        selected = {(track["song"], track["artist"]): track for track in ranked[:track_budget]}
+        output_lines.extend(ViralMusicFinder._selection_lines(similar_tracks, selected))
+        for track_info, exc in failures:
+            error_line = f"Track {track_info} generated an exception: {exc}"
+            print(error_line)
+            output_lines.append(error_line)
+
+        # Process each selected track concurrently, collecting results as each finishes
+        results = []
+        async for track_info, result, exc in self.iter_track_results(list(selected), feature_profile=feature_profile,
+                                                                     probes=selected, summarize=False):
+            if exc is not None:
+                error_line = f"Track {track_info} generated an exception: {exc}"
+                print(error_line)
+                output_lines.append(error_line)
+            elif result:
+                results.append(result)
+
+        # Summaries run after the tracks, so a failed one (SummaryError) fails the brief
+        # instead of being reported as a failed track
+        if results:
+            summarizer = await self.client("Summarizer")
+            await asyncio.gather(*(self._summarize_track(summarizer, result) for result in results))
+
+        # Append summaries for each track
+        output_lines.extend(ViralMusicFinder._summary_lines(results))
+
+        # Aggregate trends from all similar tracks
+        aggregated_trends = await asyncio.to_thread(ViralMusicFinder._aggregate_trends, results, self.Comparator)
+
+        # Summarize trends if available
+        if aggregated_trends:
+            summarizer = await self.client("Summarizer")
+            async with self._semaphores["openai"]:
+                overall_summary = await summarizer.asummarize_trends(aggregated_trends)
+            output_lines.append(overall_summary)
+        else:
+            output_lines.append("No trends available")
+
+        return output_lines
+
+    async def rank_similar_tracks(self, similar_tracks, probe_videos: int = None) -> tuple:
+        """
+        Probe the TikTok presence of every similar track concurrently and rank them, as in
+        ViralMusicFinder.rank_similar_tracks.
+        """
+        probe_videos = probe_videos or self.expansion["probe_videos"]
+        probes = await asyncio.gather(
+            *(self._probe_track(title, track_artist, match, probe_videos)
+              for title, track_artist, match in similar_tracks),
+            return_exceptions=True
+        )
+        probed, failures = [], []
+        for (title, track_artist, _), probe in zip(similar_tracks, probes):
+            if isinstance(probe, Exception):
+                failures.append(((title, track_artist), probe))
+            else:
+                probed.append(probe)
+        ranked = sorted((track for track in probed if track["music_id"] and track["videos"]),
+                        key=lambda track: -track["score"])
+        return ranked, failures
+
+    async def _probe_track(self, song, artist, match, probe_videos):
+        """Gauge a similar track's TikTok presence with at most one TikAPI request, as in ViralMusicFinder."""
+        tiktok_api = await self.client("tiktok_api")
+        if self.music_index is not None:
+            entry = await asyncio.to_thread(self.music_index.lookup, song, artist)
+            if entry is not None:
+                videos = []
+                if entry["music_id"]:
+                    videos = await self._in_thread(
+                        "tikapi", tiktok_api.fetch_music_videos, entry["music_id"], limit=probe_videos
+                    )
+                return ViralMusicFinder._candidate(song, artist, match, entry["music_id"], None,
+                                                   *ViralMusicFinder._page_presence(videos), probe_videos)
+
+        music_list = await self._in_thread("tikapi", tiktok_api.search_music, song, artist)
+        return ViralMusicFinder._search_candidate(tiktok_api, song, artist, match, music_list, probe_videos)
+
+    async def iter_track_results(self, similar_tracks, feature_profile=None, probes=None, summarize=True):
+        """
+        Process similar tracks as concurrent tasks and yield each one as soon as it is done.
+
+        Yields:
+            tuple: (track_info, result, exception), as in ViralMusicFinder.iter_track_results
+        """
+        task_to_track = {
+            asyncio.create_task(
+                self.process_similar_track(
+                    track_song, track_artist, feature_profile=feature_profile, summarize=summarize,
+                    **ViralMusicFinder._probe_resolution((probes or {}).get((track_song, track_artist)))
+                )
+            ): (track_song, track_artist)
+            for track_song, track_artist in similar_tracks
+        }
+        pending = set(task_to_track)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    track_info = task_to_track[task]
+                    exc = task.exception()
+                    if exc is not None:
+                        yield track_info, None, exc
+                    else:
+                        yield track_info, task.result(), None
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def process_similar_track(self, song: str, artist: str, video_limit=4, feature_profile=None,
+                                    music_id=None, music_list=None, summarize=True):
+        """
+         Search for the song on TikTok (unless its `music_id` is already known) and verify
+         the match (among `music_list`, when the search was already made).
+         Fetch its videos.
+         Analyze and compare video features.
+         Generate a trend summary for the track (skipped, leaving "summary" as None,
+         when `summarize` is False).
+        """
+        print(f"\nProcessing similar track: '{song}' by {artist}")
+        # 1. Search music on TikTok & find a matching track
+        matched_song = music_id or await self._resolve_music_id(song, artist, music_list=music_list)
+        if not matched_song:
+            print(f"No matching song found on TikTok for '{song}' by {artist}.")
+            return None
+
+        # 2. Fetch top TikTok videos for this track
+        tiktok_api = await self.client("tiktok_api")
+        music_videos = await self._in_thread("tikapi", tiktok_api.fetch_music_videos, matched_song, limit=3)
+        if not music_videos:
+            print(f"No videos found for '{song}' by {artist}.")
+            return None
+
+        # 3. Analyze and process the videos for this track
+        trends, summary = await self.analyze_and_process_videos_for_track(
+            music_videos, n=video_limit, feature_profile=feature_profile, sound=matched_song, summarize=summarize
+        )
+        if not trends:
+            print(f"Could not detect trends for '{song}' by {artist}.")
+            return None
+
+        return {
+            "song": song,
+            "artist": artist,
+            "music_id": matched_song,
+            "trends": trends,
+            "summary": summary
+        }
+
+    async def analyze_and_process_videos_for_track(self, videos, n=4, feature_profile=None, sound=None,
+                                                   summarize=True):
+        """
+        Upload up to `n` TikTok videos concurrently.
+        Analyze the videos with the async Video Intelligence client, using `feature_profile`.
+        Compare features to detect trends (from the trend store for `sound`, if one is
+        configured) and summarize with OpenAI (unless `summarize` is False).
+        Returns tuple (trends, summary).
+        """
+        if not videos:
+            print("No videos found for analysis.")
+            return None, None
+
+        uploads = await asyncio.gather(*(self._upload_video(video) for video in videos[:n]))
+        gcs_uris = [gcs_url for gcs_url in uploads if gcs_url]
+
+        if not gcs_uris:
+            print("No GCS URIs to analyze.")
+            return None, None
+
+        analyzer = await self.client("Analyzer")
+        batch_results = await analyzer.analyze_videos_async(
+            gcs_uris, timeout=600, semaphore=self._semaphores["video_intelligence"], profile=feature_profile
+        )
+
+        video_features = ViralMusicFinder._video_features(batch_results)
+
+        if len(video_features) > 1:
+            sounds = await asyncio.to_thread(
+                ViralMusicFinder._record_trends, self.trend_store, self.Comparator, batch_results, video_features, sound
+            )
+            trends = await asyncio.to_thread(ViralMusicFinder._detect_trends, self.Comparator, video_features, sounds)
+            if not summarize:
+                return trends, None
+            summarizer = await self.client("Summarizer")
+            async with self._semaphores["openai"]:
+                summary = await summarizer.asummarize_trends(trends)
+            return trends, summary
+        else:
+            print("Only 1 or0 videos processed; skipping trend comparison.")
+            return None, None
+
+    async def _summarize_track(self, summarizer, result):
+        """Summarize one finished track under the OpenAI semaphore, storing it in result["summary"]."""
+        async with self._semaphores["openai"]:
+            try:
+                result["summary"] = await summarizer.asummarize_trends(result["trends"])
+            except Exception as e:
+                print(f"Error generating summary for '{result['song']}' by {result['artist']}: {e}")
+                raise
+
+    async def _resolve_music_id(self, song, artist, music_list=None):
+        """
+        Return the TikTok music ID for `song` by `artist`, consulting the music index first
+        (unless a probe's search results `music_list` are given), as in
+        ViralMusicFinder._resolve_music_id.
+        """
+        if music_list is None and self.music_index is not None:
+            entry = await asyncio.to_thread(self.music_index.lookup, song, artist)
+            if entry is not None:
+                print(f"Music ID for '{song}' by {artist} found in index: {entry['music_id']}")
+                return entry["music_id"]
+
+        tiktok_api = await self.client("tiktok_api")
+        if music_list is None:
+            music_list = await self._in_thread("tikapi", tiktok_api.search_music, song, artist)
+        # Candidates are verified in parallel, each verification under the TikAPI semaphore.
+        # The ranking thread itself holds no slot, or verifications could wait on it forever.
+        loop = asyncio.get_running_loop()
+        matched_song = await asyncio.to_thread(
+            tiktok_api.find_matching_song, song, artist, music_list,
+            submit=lambda fn, *args: asyncio.run_coroutine_threadsafe(self._in_thread("tikapi", fn, *args), loop)
+        )
+        if self.music_index is not None and (matched_song or music_list):
+            await asyncio.to_thread(self.music_index.record, song, artist, matched_song)
+        return matched_song
+
+    def throttle_stats(self) -> dict:
+        """
+        Return the rate limiting and retry counters of every external service.
+        """
+        return self.rate_limiters.stats()
+
+    def analysis_stats(self) -> dict:
+        """
+        Return the video analysis latency and estimated cost per feature profile
+        (empty until the analyzer has been used).
+        """
+        if not lazy_client.is_built(self, "Analyzer"):
+            return {}
+        return self.Analyzer.profile_stats()
+
+    def lastfm_stats(self) -> dict:
+        """
+        Return the Last.fm cache and coalescing counters (empty until Last.fm has been used).
+        """
+        if not lazy_client.is_built(self, "music_api"):
+            return {}
+        return self.music_api.cache_stats()
+
+    async def aclose(self):
+        """Close the HTTP client used for video downloads."""
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+
+    async def _upload_video(self, video):
+        """
+        Existence check, metadata fetch and streaming upload for one video.
+
+        Returns:
+            str or None: The GCS URI of the video, or None if it could not be uploaded
+        """
+        video_id = video.get("id")
+        if not video_id:
+            print("Video missing ID, skipping.")
+            return None
+        try:
+            # Built off the loop: creating the GCS client also lists the bucket's video prefix
+            uploader = await self.client("Uploader")
+            tiktok_api = await self.client("tiktok_api")
+            existing_url = await self._in_thread("gcs", uploader.existing_video_uri, video_id)
+            if existing_url:
+                # Videos uploaded by an earlier brief need neither metadata nor a re-upload
+                print(f"Video {video_id} already uploaded, skipping.")
+                return existing_url
+            print(f"Uploading Video (ID: {video_id})")
+            video_json = await self._in_thread("tikapi", tiktok_api.get_video_metadata, video_id)
+            if not video_json:
+                print(f"No metadata found for video {video_id}.")
+                return None
+            async with self._semaphores["gcs"]:
+                gcs_url = await uploader.upload_tiktok_video_async(
+                    video_json, self._get_http_client(uploader), check_existing=False
+                )
+        except Exception as exc:
+            print(f"Video {video_id} failed: {exc}")
+            return None
+        if not gcs_url:
+            print(f"Unable to upload video {video_id} to GCS.")
+        return gcs_url
+
+    def _get_http_client(self, uploader):
+        """
+        Return the shared httpx client, creating it on the running loop if needed.
+        Its keep-alive pool matches the GCS concurrency limit and it uses `uploader`'s timeouts.
+        """
+        if self.http_client is None:
+            connect_timeout, read_timeout = uploader.timeout
+            pool_size = self.limits["gcs"]
+            self.http_client = httpx.AsyncClient(
+                follow_redirects=True,
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+            )
+        return self.http_client
+
+    async def _in_thread(self, service, fn, *args, **kwargs):
+        """
+        Run a blocking client call in a worker thread under the semaphore for `service`.
+        """
+        async with self._semaphores[service]:
+            return await asyncio.to_thread(fn, *args, **kwargs)
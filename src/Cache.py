@@ -0,0 +1,234 @@
+import collections
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class LRUCache:
+    """
+    An in-memory key/value cache with a TTL and least-recently-used eviction.
+
+    It has the same interface as SQLiteCache, so either can be handed to a component
+    that accepts a cache. Entries do not survive a restart.
+
+    Attributes:
+        ttl_seconds (float or None): Default time-to-live for new entries (None = never expire)
+        max_entries (int or None): Maximum number of entries kept (None = unbounded)
+        hits (int): Number of successful lookups since creation
+        misses (int): Number of lookups that found no (or only an expired) entry
+    """
+    def __init__(self, ttl_seconds=None, max_entries=1024):
+        """
+        Args:
+            ttl_seconds (float, optional): Default time-to-live for entries, in seconds.
+            max_entries (int, optional): Maximum number of entries before eviction kicks in.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+
+    def get(self, key, default=None):
+        """
+        Return the cached value for `key`, or `default` if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl_seconds=None):
+        """
+        Store `value` under `key`, optionally overriding the cache-wide TTL.
+        """
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            if self.max_entries is not None:
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Remove a single entry, if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self):
+        """
+        Return a dictionary with the hit/miss counters and current size.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+        }
+
+
+class SQLiteCache:
+    """
+    A small persistent key/value cache backed by a local SQLite file.
+
+    Values are stored as JSON, so anything the pipeline already passes around
+    (dicts, lists, strings, numbers) can be cached without extra serialization code.
+    Entries expire after a TTL and the table is kept below a maximum number of
+    entries by evicting the least recently used rows.
+
+    Attributes:
+        path (str): Location of the SQLite database file
+        ttl_seconds (float or None): Default time-to-live for new entries (None = never expire)
+        max_entries (int or None): Maximum number of rows kept in the table (None = unbounded)
+        hits (int): Number of successful lookups since creation
+        misses (int): Number of lookups that found no (or only an expired) entry
+    """
+    def __init__(self, path, ttl_seconds=None, max_entries=None, table="cache"):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path (str): Path to the SQLite file. Parent directories are created if needed.
+                        Use ":memory:" for a throwaway in-process cache.
+            ttl_seconds (float, optional): Default time-to-live for entries, in seconds.
+            max_entries (int, optional): Maximum number of entries before eviction kicks in.
+            table (str, optional): Table name, so several caches can share one file.
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.table = table
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table} (accessed_at)"
+            )
+
+    def get(self, key, default=None):
+        """
+        Return the cached value for `key`, or `default` if it is missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                with self._conn:
+                    self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self.misses += 1
+                return default
+            with self._conn:
+                self._conn.execute(
+                    f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key, value, ttl_seconds=None):
+        """
+        Store `value` under `key`.
+
+        Args:
+            key (str): Cache key
+            value: Any JSON-serializable value
+            ttl_seconds (float, optional): Overrides the cache-wide TTL for this entry
+        """
+        now = time.time()
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = now + ttl if ttl is not None else None
+        payload = json.dumps(value)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, payload, expires_at, now)
+            )
+            self._evict(now)
+
+    def delete(self, key):
+        """Remove a single entry, if present."""
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def stats(self):
+        """
+        Return a dictionary with the hit/miss counters and current size.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+        }
+
+    def _evict(self, now):
+        """
+        Drop expired rows, then the least recently used rows above `max_entries`.
+        Must be called with the lock held and inside a transaction.
+        """
+        self._conn.execute(
+            f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+        )
+        if self.max_entries is None:
+            return
+        count = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f" SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,)
+            )
@@ -1,5 +1,83 @@
-from collections import Counter
 from typing import List, Dict
+import numpy as np
+
+# Feature categories compared across videos and the trend keys they are reported under
+CATEGORIES = {"labels": "label_trends", "objects": "object_trends", "texts": "text_trends"}
+
+
+class FeatureIncidence:
+    """
+    A sparse video x feature incidence matrix over one vocabulary shared by all categories.
+
+    Every distinct (category, item) pair gets a column. The matrix is stored as the
+    coordinates of its non-zero cells, deduplicated so that a feature seen many times in
+    one video (e.g. an object tracked in ten segments) counts once for that video. Per-
+    feature document frequencies for every category then come from a single bincount.
+
+    Attributes:
+        n_videos (int): Number of rows
+        vocabulary (list): (category, item) of each column, in first-seen order
+        rows (np.ndarray): Video index of each non-zero cell
+        columns (np.ndarray): Feature index of each non-zero cell
+        occurrences (np.ndarray): Raw number of occurrences of each feature
+        document_frequency (np.ndarray): Number of videos containing each feature
+    """
+    def __init__(self, video_features: List[Dict], categories=tuple(CATEGORIES)):
+        self.n_videos = len(video_features)
+        self.categories = list(categories)
+        index = {}
+        rows, columns = [], []
+        for row, features in enumerate(video_features):
+            for category in self.categories:
+                for item in features.get(category) or []:
+                    columns.append(index.setdefault((category, item), len(index)))
+                    rows.append(row)
+        self.vocabulary = list(index)
+        n_features = len(self.vocabulary)
+
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = np.asarray(columns, dtype=np.int64)
+        self.occurrences = np.bincount(columns, minlength=n_features)
+        cells = np.unique(rows * max(n_features, 1) + columns)
+        self.rows = cells // max(n_features, 1)
+        self.columns = cells % max(n_features, 1)
+        self.document_frequency = np.bincount(self.columns, minlength=n_features)
+        self.category_ids = np.asarray(
+            [self.categories.index(category) for category, _ in self.vocabulary], dtype=np.int64
+        )
+
+    def to_dense(self) -> np.ndarray:
+        """Return the incidence as a (n_videos, n_features) boolean matrix."""
+        matrix = np.zeros((self.n_videos, len(self.vocabulary)), dtype=bool)
+        matrix[self.rows, self.columns] = True
+        return matrix
+
+    def ranked(self, min_videos: int = 1) -> Dict[str, List[Dict]]:
+        """
+        Return, per category, the features found in at least `min_videos` videos, ranked
+        by the number of videos containing them, then by raw occurrences, then first seen.
+
+        Returns:
+            Dict: category -> list of {"feature", "videos", "occurrences", "support"}, where
+                  support is the fraction of videos containing the feature
+        """
+        ranked = {category: [] for category in self.categories}
+        keep = np.flatnonzero(self.document_frequency >= min_videos)
+        # lexsort sorts by the last key first: category, then -videos, -occurrences, column
+        order = keep[np.lexsort((keep, -self.occurrences[keep], -self.document_frequency[keep],
+                                 self.category_ids[keep]))]
+        for column in order:
+            category, item = self.vocabulary[column]
+            videos = int(self.document_frequency[column])
+            ranked[category].append({
+                "feature": item,
+                "videos": videos,
+                "occurrences": int(self.occurrences[column]),
+                "support": videos / self.n_videos,
+            })
+        return ranked
+
+
 
 class CompareFeatures:
     """
@@ -13,9 +91,13 @@ class CompareFeatures:
     Attributes:
         threshold (float): The minimum proportion of videos that must contain a feature
                            for it to be considered a trend (between 0.0 and 1.0)
+        store (TrendStore or None): Persistent, time-decayed feature frequencies that
+                           trends can be queried from instead of recomputed
+        text_clusterer (TextClusterer or None): Merges near-duplicate OCR texts into one
+                           feature before they are counted
     """
 
-    def __init__(self, threshold: float = 0.5):
+    def __init__(self, threshold: float = 0.5, store=None, text_clusterer=None):
         """
         Initialize the feature comparison engine with a specified threshold.
         
@@ -23,14 +105,19 @@ class CompareFeatures:
             threshold (float, optional): The minimum proportion of videos that must 
                                          contain a feature for it to be considered a trend.
                                          Defaults to 0.5 (50% of videos).
+            store (TrendStore, optional): Store queried when trends are requested for sounds.
+            text_clusterer (TextClusterer, optional): Clusters noisy OCR variants ("@user",
+                                         "@usr", "user") so that they count as one text.
         
         Note:
             Setting threshold=1.0 would only return features present in all videos.
             Setting threshold=0.0 would return all features from any video.
         """
         self.threshold = threshold
+        self.store = store
+        self.text_clusterer = text_clusterer
 
-    def detect_trends(self, video_features: List[Dict]) -> Dict:
+    def detect_trends(self, video_features: List[Dict] = None, sounds=None) -> Dict:
         """
         Analyze a collection of video features to detect common trends across videos.
         
@@ -39,52 +126,70 @@ class CompareFeatures:
                                         contains features extracted from a single video.
                                         Each dictionary should have keys 'labels', 'objects', 
                                         and 'texts' with lists of corresponding features.
+            sounds (list, optional): Music IDs to query the trend store for instead. The
+                                        trends are then those of every video folded into
+                                        the store for these sounds, weighted by recency.
         
         Returns:
-            Dict: A dictionary containing identified trends organized by feature type:
+            Dict: A dictionary containing identified trends organized by feature type,
+                  each a list ranked by the number of videos containing the feature:
                   - label_trends: Common video labels/categories
                   - object_trends: Common objects detected in videos
                   - text_trends: Common text elements appearing in videos
         
         """
+        ranked = self.rank_trends(video_features, sounds=sounds)
+        return {key: [trend["feature"] for trend in trends] for key, trends in ranked.items()}
+
+    def rank_trends(self, video_features: List[Dict] = None, sounds=None) -> Dict:
+        """
+        Like detect_trends, but with the support of each trend.
+
+        A feature counts once per video however often it occurs in it, and it is a trend
+        when at least `threshold` of the videos contain it.
+
+        Returns:
+            Dict: label_trends, object_trends and text_trends, each a ranked list of
+                  {"feature", "videos", "occurrences", "support"} dictionaries
+                  ({"feature", "videos", "score", "support"} when querying the store)
+
+        Raises:
+            ValueError: If `sounds` is given without a store
+        """
+        if sounds is not None:
+            if self.store is None:
+                raise ValueError("Trends by sound require a TrendStore")
+            return self.store.trends(sounds, min_support=self.threshold)
+
+        video_features = video_features or []
         total_videos = len(video_features)
         if total_videos == 0:
             return {}
 
-        label_trends = self._compare_category(video_features, "labels", total_videos)
-        object_trends = self._compare_category(video_features, "objects", total_videos)
-        text_trends = self._compare_category(video_features, "texts", total_videos)
-        return {
-            "label_trends": label_trends,
-            "object_trends": object_trends,
-            "text_trends": text_trends,
-        }
+        incidence = FeatureIncidence(self.merge_texts(video_features))
+        ranked = incidence.ranked(min_videos=self._min_videos(total_videos))
+        return {CATEGORIES[category]: trends for category, trends in ranked.items()}
 
-    def _compare_category(self, video_features: List[Dict], key: str, total_videos: int) -> List[str]:
+    def merge_texts(self, video_features: List[Dict]) -> List[Dict]:
         """
-        Compare a specific category of features across all videos to find trends.
-        
-        Args:
-            video_features (List[Dict]): List of video feature dictionaries
-            key (str): The feature category to compare ('labels', 'objects', or 'texts')
-            total_videos (int): Total number of videos being analyzed
-        
-        Returns:
-            List[str]: A list of trending features in the specified category
-        
-        Note:
-            This is an internal helper method used by detect_trends().
+        Replace every text of `video_features` by the representative of its cluster of
+        near-duplicates across all the videos. Returned unchanged without a text clusterer.
         """
-        all_items = []
-        for vf in video_features:
-            items = vf.get(key, [])
-            all_items.extend(items)
-
-        frequency = Counter(all_items)
+        if self.text_clusterer is None:
+            return video_features
+        representatives = self.text_clusterer.representatives(
+            text for features in video_features for text in features.get("texts") or []
+        )
+        return [
+            {**features, "texts": [representatives[str(text)] for text in features.get("texts") or []]}
+            for features in video_features
+        ]
 
+    def _min_videos(self, total_videos: int) -> int:
+        """
+        Return the number of videos a feature must appear in to be a trend.
+        """
         min_count = int(self.threshold * total_videos)
         if min_count < 1 and total_videos > 0:
             min_count = 1
-
-        trending_features = [item for item, freq in frequency.items() if freq >= min_count]
-        return trending_features
+        return min_count
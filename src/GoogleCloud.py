@@ -1,6 +1,11 @@
+import asyncio
+import threading
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 from google.cloud import storage
 from google.oauth2 import service_account
+from .RateLimiter import default_limiter
 
 class GCSVideoUploader:
     """
@@ -15,15 +20,40 @@ class GCSVideoUploader:
         storage_client (google.cloud.storage.Client): The authenticated Google Cloud Storage client
         bucket_name (str): Name of the Google Cloud Storage bucket for uploads
         bucket (google.cloud.storage.Bucket): The bucket object for performing operations
+        chunk_size (int): Size in bytes of each chunk streamed from TikTok into GCS
+        index_hits (int): Number of videos found already present in the bucket
+        index_misses (int): Number of videos that had to be downloaded and uploaded
+        limiter (ServiceLimiter): Rate limit and retry policy for GCS requests and transfers
+        http (requests.Session): Pooled keep-alive session used for video downloads
+        timeout (tuple): (connect, read) timeouts in seconds for video downloads
+        transcoder (VideoTranscoder or None): Optional ffmpeg stage between download and upload
     """
-    def __init__(self, GoogleJson_file=None, bucket_name=None):
+    # Resumable uploads require chunk sizes that are a multiple of 256 KiB
+    CHUNK_ALIGNMENT = 256 * 1024
+    VIDEO_PREFIX = "tikapi_videos/"
+
+    def __init__(self, GoogleJson_file=None, bucket_name=None, chunk_size=4 * 1024 * 1024,
+                 warm_index=True, rate_limiter=None, pool_size=8,
+                 connect_timeout=5.0, read_timeout=30.0, transcoder=None):
         """
         Initialize the Google Cloud Storage video uploader.
         
         Args:
             GoogleJson_file: Path to the service account JSON file
             bucket_name: GCS bucket name
-            project_id: Google Cloud project ID
+            chunk_size: Bytes per streamed chunk. Rounded up to a multiple of 256 KiB.
+                        Peak memory per upload is bounded by roughly this amount.
+            warm_index: If True, list the existing TikTok videos in the bucket once at startup
+                        so that already uploaded videos can be skipped without a round-trip.
+            rate_limiter (ServiceLimiter, optional): Shared "gcs" limiter; a default one is
+                        created if not given.
+            pool_size: Number of keep-alive connections kept per CDN host. Match it to the
+                        number of concurrent uploads so no download waits for a connection.
+            connect_timeout: Seconds allowed to establish a download connection.
+            read_timeout: Seconds a download may stall between two reads before it is aborted.
+            transcoder (VideoTranscoder, optional): Downsamples/trims videos on their way into
+                        the bucket. Its profile name is part of the blob name, so transcoded
+                        and original videos are cached separately.
         """
         # Handle authentication
             # Use explicit credentials file if it exists
@@ -37,20 +67,139 @@ class GCSVideoUploader:
     
         self.bucket_name = bucket_name
         self.bucket = self.storage_client.bucket(self.bucket_name)
+        self.chunk_size = self._align_chunk_size(chunk_size)
+        self._known_blobs = set()
+        self._index_lock = threading.Lock()
+        self.index_hits = 0
+        self.index_misses = 0
+        self.limiter = rate_limiter or default_limiter("gcs")
+        # Connections to the TikTok CDN are reused across downloads instead of paying
+        # DNS, TCP and TLS setup for every video
+        self.http = self._build_session(pool_size)
+        self.timeout = (connect_timeout, read_timeout)
+        self.transcoder = transcoder
         print(f"Successfully connected to bucket: {bucket_name}")
 
-    def upload_tiktok_video_direct(self, video_json, blob_name=None):
+        if warm_index:
+            self.warm_blob_index()
+
+    def warm_blob_index(self, prefix=VIDEO_PREFIX):
+        """
+        Populate the in-process index of known blobs with a single bulk listing.
+
+        Args:
+            prefix (str, optional): Only blobs under this prefix are listed.
+
+        Returns:
+            int: The number of blob names added to the index
+        """
+        try:
+            names = self.limiter.call(
+                lambda: {blob.name for blob in self.storage_client.list_blobs(self.bucket_name, prefix=prefix)}
+            )
+        except Exception as e:
+            print(f"Error listing existing blobs under {prefix}: {e}")
+            return 0
+        with self._index_lock:
+            self._known_blobs.update(names)
+        print(f"Indexed {len(names)} existing blobs under {prefix}")
+        return len(names)
+
+    def blob_exists(self, blob_name):
+        """
+        Check whether `blob_name` is already in the bucket.
+
+        The in-process index is consulted first; on an index miss a metadata request
+        is made and a positive answer is remembered. Updates the hit/miss counters.
+        """
+        with self._index_lock:
+            if blob_name in self._known_blobs:
+                self.index_hits += 1
+                return True
+
+        try:
+            exists = self.limiter.call(self.bucket.blob(blob_name).exists)
+        except Exception as e:
+            print(f"Error checking whether {blob_name} exists: {e}")
+            exists = False
+
+        with self._index_lock:
+            if exists:
+                self._known_blobs.add(blob_name)
+                self.index_hits += 1
+            else:
+                self.index_misses += 1
+        return exists
+
+    def existing_video_uri(self, video_id):
+        """
+        Return the GCS URI of an already uploaded TikTok video, or None if it is not in the bucket.
+        """
+        blob_name = self.video_blob_name(video_id)
+        if self.blob_exists(blob_name):
+            return f"gs://{self.bucket.name}/{blob_name}"
+        return None
+
+    def video_blob_name(self, video_id):
+        """
+        Return the blob name used for a TikTok video ID, suffixed with the transcode
+        profile (e.g. tikapi_videos/123_360p15_30s_crf30.mp4) when one is set.
+        """
+        if self.transcoder is not None:
+            return f"{self.VIDEO_PREFIX}{video_id}_{self.transcoder.name}.mp4"
+        return f"{self.VIDEO_PREFIX}{video_id}.mp4"
+
+    def get_index_stats(self):
+        """
+        Return the blob index counters.
+        """
+        with self._index_lock:
+            lookups = self.index_hits + self.index_misses
+            return {
+                "hits": self.index_hits,
+                "misses": self.index_misses,
+                "hit_rate": self.index_hits / lookups if lookups else 0.0,
+                "known_blobs": len(self._known_blobs),
+            }
+
+    @staticmethod
+    def _build_session(pool_size):
+        """
+        Return a requests.Session whose connection pool holds `pool_size` keep-alive
+        connections per host. Retries are left to the rate limiter.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def close(self):
+        """Close the pooled download connections."""
+        self.http.close()
+
+    @classmethod
+    def _align_chunk_size(cls, chunk_size):
+        """Round `chunk_size` up to the nearest multiple of 256 KiB."""
+        chunks = max(1, -(-int(chunk_size) // cls.CHUNK_ALIGNMENT))
+        return chunks * cls.CHUNK_ALIGNMENT
+
+    def upload_tiktok_video_direct(self, video_json, blob_name=None, check_existing=True):
         """
         Download a TikTok video from the API response and upload it directly to Google Cloud Storage.
         
         This method extracts the video download URL and authentication headers from the TikTok API
-        response, downloads the video content, and uploads it to the specified Google Cloud Storage bucket.
+        response and streams the video content into the specified Google Cloud Storage bucket.
+        The HTTP body is read in `chunk_size` pieces and written to a resumable upload, so the
+        whole video is never held in memory at once.
         
         Args:
             video_json (dict): The JSON response from TikTok API containing video information,
                             including download URL and authentication headers.
             blob_name (str, optional): Custom name for the uploaded file in GCS.
                                     If not provided, a name will be generated from the video ID.
+            check_existing (bool, optional): If True, skip the download and upload when the
+                                    blob is already in the bucket. Defaults to True.
         
         Returns:
             str or None: The Google Cloud Storage URI of the uploaded video (gs://bucket/path/to/video.mp4)
@@ -61,25 +210,25 @@ class GCSVideoUploader:
             google.cloud.exceptions.GoogleCloudError: If there's an error uploading to Google Cloud Storage
         """
         try:
-            video_info = video_json.get('itemInfo', {}).get('itemStruct', {}).get('video', {})
-            video_url = video_info.get('downloadAddr')
-            video_headers = video_json.get('$other', {}).get('videoLinkHeaders', {})
+            video_url, video_headers, blob_name, check_existing = self._video_source(
+                video_json, blob_name, check_existing
+            )
 
-            if not blob_name:
-                video_id = video_json.get('itemInfo', {}).get('itemStruct', {}).get('id', 'unknown_video')
-                blob_name = f"tikapi_videos/{video_id}.mp4"
+            gcs_url = f"gs://{self.bucket.name}/{blob_name}"
+            if check_existing and self.blob_exists(blob_name):
+                print(f"Video already in bucket: {gcs_url}")
+                return gcs_url
 
             if not video_url:
                 print("No downloadAddr found in video JSON")
                 return None
 
-            resp = requests.get(video_url, headers=video_headers, stream=True)
-            resp.raise_for_status()
-
-            blob = self.bucket.blob(blob_name)
-            blob.upload_from_string(resp.content, content_type='video/mp4')
-
+            # A failed attempt cancels its resumable session, so retries start from scratch
+            blob_name = self.limiter.call(self._transfer, video_url, video_headers, blob_name)
             gcs_url = f"gs://{self.bucket.name}/{blob_name}"
+
+            with self._index_lock:
+                self._known_blobs.add(blob_name)
             print(f"Video uploaded to {gcs_url}")
             return gcs_url
 
@@ -88,4 +237,190 @@ class GCSVideoUploader:
         except Exception as ex:
             print(f"Error uploading video: {ex}")
 
-        return None
\ No newline at end of file
+        return None
+
+    async def upload_tiktok_video_async(self, video_json, http_client, blob_name=None, check_existing=True):
+        """
+        Async counterpart of upload_tiktok_video_direct.
+
+        The video is downloaded with an async HTTP client and streamed chunk by chunk into a
+        resumable upload. The blocking GCS calls run in worker threads so the event loop is
+        never blocked.
+
+        Args:
+            video_json (dict): The JSON response from TikTok API containing video information
+            http_client (httpx.AsyncClient): Client used to download the video
+            blob_name (str, optional): Custom name for the uploaded file in GCS
+            check_existing (bool, optional): If True, skip videos that are already in the bucket
+
+        Returns:
+            str or None: The Google Cloud Storage URI of the uploaded video, or None on failure
+        """
+        try:
+            video_url, video_headers, blob_name, check_existing = self._video_source(
+                video_json, blob_name, check_existing
+            )
+
+            gcs_url = f"gs://{self.bucket.name}/{blob_name}"
+            if check_existing and await asyncio.to_thread(self.blob_exists, blob_name):
+                print(f"Video already in bucket: {gcs_url}")
+                return gcs_url
+
+            if not video_url:
+                print("No downloadAddr found in video JSON")
+                return None
+
+            blob_name = await self.limiter.acall(self._transfer_async, http_client, video_url, video_headers, blob_name)
+            gcs_url = f"gs://{self.bucket.name}/{blob_name}"
+
+            with self._index_lock:
+                self._known_blobs.add(blob_name)
+            print(f"Video uploaded to {gcs_url}")
+            return gcs_url
+
+        except httpx.HTTPError as he:
+            print(f"Error downloading video content: {he}")
+        except Exception as ex:
+            print(f"Error uploading video: {ex}")
+
+        return None
+
+    def _video_source(self, video_json, blob_name, check_existing):
+        """
+        Extract the download URL, headers and destination blob name from a TikTok video JSON.
+
+        Returns:
+            tuple: (video_url, video_headers, blob_name, check_existing)
+        """
+        video_info = video_json.get('itemInfo', {}).get('itemStruct', {}).get('video', {})
+        video_url = video_info.get('downloadAddr')
+        video_headers = video_json.get('$other', {}).get('videoLinkHeaders', {})
+
+        if not blob_name:
+            video_id = video_json.get('itemInfo', {}).get('itemStruct', {}).get('id')
+            if not video_id:
+                # Never reuse a placeholder blob that belongs to some other video
+                video_id = 'unknown_video'
+                check_existing = False
+            blob_name = self.video_blob_name(video_id)
+
+        return video_url, video_headers, blob_name, check_existing
+
+    def _transfer(self, video_url, video_headers, blob_name):
+        """
+        Download one video and stream it into `blob_name` (a single attempt).
+        Returns the name of the blob holding the video (see _stream_to_blob).
+        """
+        with self.http.get(video_url, headers=video_headers, stream=True, timeout=self.timeout) as resp:
+            resp.raise_for_status()
+            blob = self.bucket.blob(blob_name)
+            return self._stream_to_blob(resp, blob)
+
+    async def _transfer_async(self, http_client, video_url, video_headers, blob_name):
+        """Async counterpart of _transfer, using `http_client` for the download."""
+        async with http_client.stream("GET", video_url, headers=video_headers) as resp:
+            resp.raise_for_status()
+            blob = self.bucket.blob(blob_name)
+            writer = blob.open("wb", chunk_size=self.chunk_size, content_type='video/mp4')
+            terminated = False
+            try:
+                if self.transcoder is not None:
+                    async with self.transcoder.aspool(resp.aiter_bytes(self.CHUNK_ALIGNMENT)) as source:
+                        try:
+                            await self.transcoder.atranscode_file(
+                                source, lambda data: asyncio.to_thread(writer.write, data), self.chunk_size
+                            )
+                        except RuntimeError as e:
+                            terminated = True
+                            await asyncio.to_thread(writer.terminate)
+                            return await asyncio.to_thread(self._restart_with_original, blob, source, e)
+                else:
+                    async for chunk in resp.aiter_bytes(self.chunk_size):
+                        await asyncio.to_thread(writer.write, chunk)
+            except BaseException:
+                if not terminated:
+                    await asyncio.to_thread(writer.terminate)
+                raise
+            await asyncio.to_thread(writer.close)
+            return blob_name
+
+    def _stream_to_blob(self, resp, blob):
+        """
+        Pipe a streaming HTTP response into a blob using a resumable upload.
+
+        With a transcoder, the response is spooled to a temporary file (ffmpeg needs a
+        seekable input for MP4s whose moov atom comes last) and ffmpeg's output is uploaded
+        as it is produced. If ffmpeg fails, the original video is uploaded instead, under
+        its own unsuffixed blob name (see _restart_with_original).
+
+        Args:
+            resp (requests.Response): A response opened with stream=True
+            blob (google.cloud.storage.Blob): The destination blob
+
+        Returns:
+            str: The name of the blob holding the video
+        """
+        writer = blob.open("wb", chunk_size=self.chunk_size, content_type='video/mp4')
+        terminated = False
+        try:
+            if self.transcoder is not None:
+                with self.transcoder.spool(resp.iter_content(chunk_size=self.CHUNK_ALIGNMENT)) as source:
+                    try:
+                        self.transcoder.transcode_file(source, writer.write, self.chunk_size)
+                    except RuntimeError as e:
+                        # Discard the partial output; a failing fallback must not terminate it twice
+                        terminated = True
+                        writer.terminate()
+                        return self._restart_with_original(blob, source, e)
+            else:
+                for chunk in resp.iter_content(chunk_size=self.chunk_size):
+                    if chunk:
+                        writer.write(chunk)
+        except Exception:
+            # Cancel the resumable session so a truncated video is never committed
+            if not terminated:
+                writer.terminate()
+            raise
+        writer.close()
+        return blob.name
+
+    def original_blob_name(self, blob_name):
+        """
+        Return the name of the untranscoded video behind a transcoded blob name
+        (tikapi_videos/123_360p15_30s_crf30.mp4 -> tikapi_videos/123.mp4), or None if
+        `blob_name` does not carry the transcode profile suffix.
+        """
+        suffix = f"_{self.transcoder.name}.mp4" if self.transcoder is not None else None
+        if suffix is None or not blob_name.endswith(suffix):
+            return None
+        return blob_name[:-len(suffix)] + ".mp4"
+
+    def _restart_with_original(self, blob, source, error):
+        """
+        After a failed transcode into `blob` (whose writer the caller has already terminated),
+        upload the original video file `source` instead, so the video can still be analyzed.
+
+        The original goes to its unsuffixed blob name: the transcoded name (and the
+        annotation cache key derived from it) must only ever hold the transcoded copy.
+        Without a profile suffix to strip, the transcode error is raised instead.
+
+        Returns:
+            str: The name of the blob holding the original video
+        """
+        original_name = self.original_blob_name(blob.name)
+        if original_name is None:
+            raise error
+        print(f"Transcoding {blob.name} failed, uploading the original video to {original_name}: {error}")
+        if self.blob_exists(original_name):
+            return original_name
+
+        writer = self.bucket.blob(original_name).open("wb", chunk_size=self.chunk_size, content_type='video/mp4')
+        try:
+            with open(source, "rb") as original:
+                for chunk in iter(lambda: original.read(self.chunk_size), b""):
+                    writer.write(chunk)
+        except BaseException:
+            writer.terminate()
+            raise
+        writer.close()
+        return original_name
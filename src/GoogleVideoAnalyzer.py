@@ -1,5 +1,9 @@
 import os
+import time
+import asyncio
+import threading
 import concurrent.futures
+import numpy as np
 from google.cloud import videointelligence
 from google.cloud.videointelligence_v1.types import (
     AnnotateVideoRequest,
@@ -7,6 +11,8 @@ from google.cloud.videointelligence_v1.types import (
     LabelDetectionConfig,
     LabelDetectionMode
 )
+from .RateLimiter import default_limiter
+from .OperationPoller import OperationPoller
 # os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = os.path.join(
 #     os.path.dirname(__file__), "GoogleKey.json"
 # )
@@ -21,20 +27,87 @@ class GoogleVideoAnalyzer:
     
     Attributes:
         client (videointelligence.VideoIntelligenceServiceClient): The Google Video Intelligence API client
+        cache (SQLiteCache or None): Optional persistent cache of parsed annotation results
+        limiter (ServiceLimiter): Rate limit and retry policy for annotate_video requests
+        feature_profile (str): Name of the feature profile used when a request names none
+        profiles (dict): Feature profiles by name, see FEATURE_PROFILES
+        parse_mode (str): "summary" (default) or "geometry", see _parse_annotation_result
+        poller (OperationPoller): Waits for the annotate_video operations of batch analyses
     """
-    def __init__(self):
+    # Named sets of features to request. Object tracking and frame-level labels are the
+    # slowest and most expensive parts of an analysis, and the trend pipeline only reads
+    # segment/shot labels, object descriptions and texts.
+    FEATURE_PROFILES = {
+        "fast": {
+            "features": ["LABEL_DETECTION"],
+            "label_mode": "SHOT_MODE",
+        },
+        "standard": {
+            "features": ["LABEL_DETECTION", "OBJECT_TRACKING", "TEXT_DETECTION"],
+            "label_mode": "SHOT_MODE",
+        },
+        "full": {
+            "features": ["LABEL_DETECTION", "SHOT_CHANGE_DETECTION", "OBJECT_TRACKING",
+                         "TEXT_DETECTION", "EXPLICIT_CONTENT_DETECTION"],
+            "label_mode": "SHOT_AND_FRAME_MODE",
+        },
+    }
+    # "summary" drops per-frame geometry, which nothing in the trend pipeline reads;
+    # "geometry" keeps it as NumPy arrays
+    PARSE_MODES = ("summary", "geometry")
+    # List price in USD per analyzed minute of video, per feature, used for cost estimates
+    PRICE_PER_MINUTE = {
+        "LABEL_DETECTION": 0.10,
+        "SHOT_CHANGE_DETECTION": 0.05,
+        "OBJECT_TRACKING": 0.15,
+        "TEXT_DETECTION": 0.15,
+        "EXPLICIT_CONTENT_DETECTION": 0.10,
+    }
+
+    def __init__(self, cache=None, rate_limiter=None, feature_profile="full", profiles=None,
+                 parse_mode="summary", poller=None):
         """
         Initialize the Google Video Analyzer with a Video Intelligence client.
         
         The initialization automatically uses the Google credentials from the environment
         variables or from the GoogleKey.json file in the same directory.
+
+        Args:
+            cache (SQLiteCache, optional): Cache for parsed annotation results, keyed by
+                                           TikTok video ID and feature set. When a video
+                                           is found in the cache the API is not called.
+            rate_limiter (ServiceLimiter, optional): Shared "video_intelligence" limiter;
+                                           a default one is created if not given.
+            feature_profile (str, optional): Default feature profile: "fast", "standard",
+                                           "full" or a name from `profiles`.
+            profiles (dict, optional): Additional or overriding profiles, each a dict with
+                                           "features" (Feature names) and "label_mode".
+            parse_mode (str, optional): Default parse mode, "summary" or "geometry".
+                                           Geometry results contain NumPy arrays and are
+                                           never cached.
+            poller (OperationPoller, optional): Poller for batch operations; a default one,
+                                           whose polls go through `rate_limiter`, is created
+                                           if not given.
         
         Raises:
             google.auth.exceptions.DefaultCredentialsError: If no valid credentials are found
         """
         self.client = videointelligence.VideoIntelligenceServiceClient()
+        self.cache = cache
+        # Created on first use, because the async client binds to the running event loop
+        self.async_client = None
+        self.limiter = rate_limiter or default_limiter("video_intelligence")
+        self.profiles = {**self.FEATURE_PROFILES, **(profiles or {})}
+        self.feature_profile = feature_profile
+        self._request_config(feature_profile)  # fail fast on an unknown default profile
+        if parse_mode not in self.PARSE_MODES:
+            raise ValueError(f"Unknown parse mode '{parse_mode}', expected one of {self.PARSE_MODES}")
+        self.parse_mode = parse_mode
+        self.poller = poller or OperationPoller(limiter=self.limiter)
+        self._profile_stats = {}
+        self._stats_lock = threading.Lock()
 
-    def process_single_video(self, uri, timeout, features, video_context):
+    def process_single_video(self, uri, timeout, features, video_context, profile=None, parse_mode=None):
         """
         Process a single video and extract metadata using Google's Video Intelligence API.
         
@@ -43,6 +116,8 @@ class GoogleVideoAnalyzer:
             timeout (int): Maximum time to wait for the analysis to complete, in seconds
             features (list): List of video intelligence features to analyze
             video_context (VideoContext): Configuration for the video analysis
+            profile (str, optional): Feature profile name the latency and cost are recorded under
+            parse_mode (str, optional): "summary" or "geometry"; defaults to `parse_mode`
             
         Returns:
             dict: A dictionary containing the video URI and its analysis results
@@ -51,19 +126,16 @@ class GoogleVideoAnalyzer:
             google.api_core.exceptions.GoogleAPIError: If the API request fails
             concurrent.futures.TimeoutError: If the analysis times out
         """
-        print(f"Processing video: {uri}")
-        request = AnnotateVideoRequest(
-            input_uri=uri,
-            features=features,
-            video_context=video_context
-        )
-        operation = self.client.annotate_video(request=request)
+        start = time.perf_counter()
+        operation = self._start_annotation(uri, features, video_context)
         response = operation.result(timeout=timeout)
         annotation_result = response.annotation_results[0]
-        video_info = self._parse_annotation_result(annotation_result)
+        video_info = self._parse_annotation_result(annotation_result, features, parse_mode or self.parse_mode)
+        self._record_analysis(profile, features, annotation_result, time.perf_counter() - start)
         return {"video_uri": uri, "analysis": video_info}
 
-    def analyze_videos_in_batch(self, video_uris, timeout=600):
+    def analyze_videos_in_batch(self, video_uris, timeout=600, scheduler=None, max_workers=8, on_result=None,
+                                profile=None, parse_mode=None):
         """
         Analyze multiple videos concurrently for improved performance.
         
@@ -71,85 +143,337 @@ class GoogleVideoAnalyzer:
             video_uris (list): List of Cloud Storage URIs for videos to analyze
             timeout (int, optional): Maximum time to wait for each video analysis, in seconds.
                                      Defaults to 600 seconds (10 minutes).
+            scheduler (PipelineScheduler, optional): Shared scheduler to submit the analyses to,
+                                     under the "video_intelligence" limit. If omitted, a local
+                                     pool of at most `max_workers` threads is used.
+            max_workers (int, optional): Size of the local pool when no scheduler is given.
+            on_result (callable, optional): Called with each result dictionary as soon as
+                                     that video's analysis is available.
+            profile (str, optional): Feature profile for this batch; defaults to
+                                     `feature_profile`.
+            parse_mode (str, optional): "summary" or "geometry"; defaults to `parse_mode`.
             
         Returns:
             list: A list of dictionaries containing analysis results for each video
             
         Notes:
-            This method processes videos in parallel threads to improve performance.
-            The number of concurrent workers is equal to the number of videos being processed.
+            The annotate_video requests are sent in parallel threads, bounded by the
+            scheduler's service limit or by `max_workers`. The operations are then awaited
+            by the shared OperationPoller, so no thread blocks for the length of an analysis
+            and results are parsed in the calling thread as they complete.
+            Videos already present in the annotation cache are returned without calling the API.
         """
         if not video_uris:
             return []
 
-        features = [
-            videointelligence.Feature.LABEL_DETECTION,
-            videointelligence.Feature.SHOT_CHANGE_DETECTION,
-            videointelligence.Feature.OBJECT_TRACKING,
-            videointelligence.Feature.TEXT_DETECTION,
-            videointelligence.Feature.EXPLICIT_CONTENT_DETECTION,
-        ]
-
-        video_context = VideoContext(
-            label_detection_config=LabelDetectionConfig(
-                label_detection_mode=LabelDetectionMode.SHOT_AND_FRAME_MODE,
-                stationary_camera=False
-            )
-        )
+        profile = profile or self.feature_profile
+        parse_mode = parse_mode or self.parse_mode
+        features, video_context = self._request_config(profile)
+        batch_results, pending_uris = self._split_cached(video_uris, features, video_context, profile, parse_mode)
+        if on_result is not None:
+            for result in batch_results:
+                on_result(result)
+
+        if not pending_uris:
+            return batch_results
 
-        print(f"Analyzing {len(video_uris)} videos concurrently...")
-        batch_results = []
+        print(f"Analyzing {len(pending_uris)} videos concurrently...")
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=len(video_uris)) as executor:
-            future_to_uri = {
-                executor.submit(self.process_single_video, uri, timeout, features, video_context): uri
-                for uri in video_uris
-            }
-            for future in concurrent.futures.as_completed(future_to_uri):
-                uri = future_to_uri[future]
+        executor = None
+        if scheduler is not None:
+            submit = lambda *args: scheduler.submit("video_intelligence", *args)
+        else:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(pending_uris)))
+            submit = executor.submit
+
+        # Every operation is started up front. Workers are only held for the short
+        # annotate_video request, and the poller's single thread waits for all of them.
+        future_to_uri = {}
+        # Latency counts from submission, so it includes the start request and any rate-limiter backoff
+        started_at = {}
+        try:
+            start_futures = {}
+            for uri in pending_uris:
+                started_at[uri] = time.perf_counter()
+                start_futures[submit(self._start_annotation, uri, features, video_context)] = uri
+            for future in concurrent.futures.as_completed(start_futures):
+                uri = start_futures[future]
                 try:
-                    result = future.result()
-                    batch_results.append(result)
+                    operation = future.result()
                 except Exception as exc:
                     print(f"Video {uri} generated an exception: {exc}")
+                    continue
+                future_to_uri[self.poller.track(operation, timeout=timeout, name=uri)] = uri
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+        for future in concurrent.futures.as_completed(future_to_uri):
+            uri = future_to_uri[future]
+            try:
+                annotation_result = future.result().annotation_results[0]
+                analysis = self._parse_annotation_result(annotation_result, features, parse_mode)
+                self._record_analysis(profile, features, annotation_result, time.perf_counter() - started_at[uri])
+            except Exception as exc:
+                print(f"Video {uri} generated an exception: {exc}")
+                continue
+            result = {"video_uri": uri, "analysis": analysis}
+            batch_results.append(result)
+            if parse_mode == "summary":
+                self._store_cached_analysis(uri, features, video_context, analysis)
+            if on_result is not None:
+                on_result(result)
 
         return batch_results
 
-    def _parse_annotation_result(self, annotation_result):
+    def _start_annotation(self, uri, features, video_context):
+        """Start an annotate_video operation for `uri` and return it without waiting."""
+        print(f"Processing video: {uri}")
+        request = AnnotateVideoRequest(
+            input_uri=uri,
+            features=features,
+            video_context=video_context
+        )
+        return self.limiter.call(self.client.annotate_video, request=request)
+
+    async def process_single_video_async(self, uri, timeout, features, video_context, profile=None,
+                                         parse_mode=None):
+        """
+        Async counterpart of process_single_video, using VideoIntelligenceServiceAsyncClient.
+
+        Returns:
+            dict: A dictionary containing the video URI and its analysis results
+        """
+        if self.async_client is None:
+            self.async_client = videointelligence.VideoIntelligenceServiceAsyncClient()
+        print(f"Processing video: {uri}")
+        request = AnnotateVideoRequest(
+            input_uri=uri,
+            features=features,
+            video_context=video_context
+        )
+        start = time.perf_counter()
+        operation = await self.limiter.acall(self.async_client.annotate_video, request=request)
+        response = await operation.result(timeout=timeout)
+        annotation_result = response.annotation_results[0]
+        video_info = self._parse_annotation_result(annotation_result, features, parse_mode or self.parse_mode)
+        self._record_analysis(profile, features, annotation_result, time.perf_counter() - start)
+        return {"video_uri": uri, "analysis": video_info}
+
+    async def analyze_videos_async(self, video_uris, timeout=600, semaphore=None, profile=None, parse_mode=None):
+        """
+        Analyze multiple videos concurrently on the running event loop.
+
+        Args:
+            video_uris (list): List of Cloud Storage URIs for videos to analyze
+            timeout (int, optional): Maximum time to wait for each video analysis, in seconds.
+            semaphore (asyncio.Semaphore, optional): Limits the number of concurrent analyses.
+            profile (str, optional): Feature profile for this batch; defaults to `feature_profile`.
+            parse_mode (str, optional): "summary" or "geometry"; defaults to `parse_mode`.
+
+        Returns:
+            list: A list of dictionaries containing analysis results for each video
+        """
+        if not video_uris:
+            return []
+
+        profile = profile or self.feature_profile
+        parse_mode = parse_mode or self.parse_mode
+        features, video_context = self._request_config(profile)
+        batch_results, pending_uris = self._split_cached(video_uris, features, video_context, profile, parse_mode)
+
+        if not pending_uris:
+            return batch_results
+
+        print(f"Analyzing {len(pending_uris)} videos concurrently...")
+
+        async def analyze(uri):
+            if semaphore is None:
+                return await self.process_single_video_async(
+                    uri, timeout, features, video_context, profile, parse_mode
+                )
+            async with semaphore:
+                return await self.process_single_video_async(
+                    uri, timeout, features, video_context, profile, parse_mode
+                )
+
+        outcomes = await asyncio.gather(*(analyze(uri) for uri in pending_uris), return_exceptions=True)
+        for uri, outcome in zip(pending_uris, outcomes):
+            if isinstance(outcome, Exception):
+                print(f"Video {uri} generated an exception: {outcome}")
+                continue
+            batch_results.append(outcome)
+            if parse_mode == "summary":
+                self._store_cached_analysis(uri, features, video_context, outcome["analysis"])
+
+        return batch_results
+
+    def profile_stats(self) -> dict:
+        """
+        Return, per feature profile, the number of analyzed and cached videos, the mean
+        annotate_video latency, the analyzed video minutes and their estimated cost in USD.
+        """
+        with self._stats_lock:
+            stats = {name: dict(counters) for name, counters in self._profile_stats.items()}
+        for counters in stats.values():
+            seconds = counters.pop("latency_seconds")
+            counters["mean_latency_seconds"] = round(seconds / counters["videos"], 3) if counters["videos"] else 0.0
+            counters["video_minutes"] = round(counters["video_minutes"], 3)
+            counters["estimated_cost_usd"] = round(counters["estimated_cost_usd"], 4)
+        return stats
+
+    def _request_config(self, profile=None):
+        """
+        Return the (features, video_context) pair sent with annotate_video requests
+        for the feature profile `profile` (the default profile if None).
+
+        Raises:
+            ValueError: If the profile is unknown
+        """
+        profile = profile or self.feature_profile
+        if profile not in self.profiles:
+            raise ValueError(f"Unknown feature profile '{profile}', expected one of {sorted(self.profiles)}")
+        settings = self.profiles[profile]
+        features = [videointelligence.Feature[name] for name in settings["features"]]
+
+        video_context = VideoContext()
+        if videointelligence.Feature.LABEL_DETECTION in features:
+            video_context = VideoContext(
+                label_detection_config=LabelDetectionConfig(
+                    label_detection_mode=LabelDetectionMode[settings.get("label_mode", "SHOT_MODE")],
+                    stationary_camera=False
+                )
+            )
+        return features, video_context
+
+    def _record_analysis(self, profile, features, annotation_result, seconds):
+        """Add one analyzed video to the latency and cost counters of `profile`."""
+        segment = annotation_result.segment
+        minutes = (segment.end_time_offset - segment.start_time_offset).total_seconds() / 60
+        price = sum(self.PRICE_PER_MINUTE.get(videointelligence.Feature(f).name, 0.0) for f in features)
+        with self._stats_lock:
+            counters = self._profile_counters(profile or self.feature_profile)
+            counters["videos"] += 1
+            counters["latency_seconds"] += seconds
+            counters["video_minutes"] += minutes
+            counters["estimated_cost_usd"] += minutes * price
+
+    def _profile_counters(self, profile):
+        return self._profile_stats.setdefault(profile, {
+            "videos": 0, "cached": 0, "latency_seconds": 0.0, "video_minutes": 0.0, "estimated_cost_usd": 0.0
+        })
+
+    def _split_cached(self, video_uris, features, video_context, profile=None, parse_mode="summary"):
+        """
+        Split URIs into results served from the annotation cache and URIs still to analyze.
+        The cache holds summary results only, so geometry requests always go to the API.
+
+        Returns:
+            tuple: (cached_results, pending_uris)
+        """
+        cached_results = []
+        pending_uris = []
+        for uri in video_uris:
+            cached = None
+            if parse_mode == "summary":
+                cached = self._get_cached_analysis(uri, features, video_context)
+            if cached is not None:
+                print(f"Using cached analysis for video: {uri}")
+                cached_results.append({"video_uri": uri, "analysis": cached})
+            else:
+                pending_uris.append(uri)
+        if cached_results:
+            with self._stats_lock:
+                self._profile_counters(profile or self.feature_profile)["cached"] += len(cached_results)
+        return cached_results, pending_uris
+
+    @staticmethod
+    def _video_id_from_uri(uri):
+        """
+        Extract the TikTok video ID from a GCS URI such as gs://bucket/tikapi_videos/123.mp4.
+        """
+        return os.path.splitext(uri.rstrip("/").rsplit("/", 1)[-1])[0]
+
+    def _cache_key(self, uri, features, video_context):
+        """
+        Build the cache key for a video: its TikTok ID plus the requested feature set.
+        """
+        feature_names = sorted(videointelligence.Feature(f).name for f in features)
+        label_mode = video_context.label_detection_config.label_detection_mode.name
+        if videointelligence.Feature.LABEL_DETECTION not in features:
+            label_mode = "NO_LABELS"
+        return f"{self._video_id_from_uri(uri)}|{','.join(feature_names)}|{label_mode}"
+
+    def _get_cached_analysis(self, uri, features, video_context):
+        """Return the cached parsed analysis for `uri`, or None on a miss or without a cache."""
+        if self.cache is None:
+            return None
+        try:
+            return self.cache.get(self._cache_key(uri, features, video_context))
+        except Exception as exc:
+            print(f"Annotation cache lookup failed for {uri}: {exc}")
+            return None
+
+    def _store_cached_analysis(self, uri, features, video_context, analysis):
+        """Store a parsed analysis in the cache, if one is configured."""
+        if self.cache is None:
+            return
+        try:
+            self.cache.set(self._cache_key(uri, features, video_context), analysis)
+        except Exception as exc:
+            print(f"Annotation cache store failed for {uri}: {exc}")
+
+    def _parse_annotation_result(self, annotation_result, features=None, parse_mode="summary"):
         """
         Parse and organize the raw annotation results from the Video Intelligence API.
         
         Args:
             annotation_result (videointelligence.AnnotationResult): The raw annotation result
                                                                    from the API
+            features (list, optional): The requested features. Sections for features that
+                                       were not requested are skipped and left out of the
+                                       result. Defaults to every feature.
+            parse_mode (str, optional): "summary" keeps descriptions, confidences, time spans
+                                       and frame counts of tracked objects and texts.
+                                       "geometry" also adds their per-frame geometry as
+                                       NumPy arrays (see below).
             
         Returns:
             dict: A structured dictionary containing organized video metadata including:
                   - Shot boundaries
                   - Labels (segment, shot, frame, and category)
-                  - Tracked objects with bounding boxes
-                  - Detected text
+                  - Tracked objects, with "frame_times" (n,) and "bounding_boxes"
+                    (n, 4: left, top, right, bottom) float32 arrays in geometry mode
+                  - Detected text, whose segments get "frame_times" (n,) and "polygons"
+                    (n, 4, 2: vertex x/y) float32 arrays in geometry mode
                   - Explicit content markers
                   - Environment type inference (indoor/outdoor)
         
         Note:
             This is an internal method used to transform the complex API response
-            into a more accessible data structure.
+            into a more accessible data structure. It reads the raw protobuf message,
+            which avoids creating a wrapper object for every frame.
         """
+        if parse_mode not in self.PARSE_MODES:
+            raise ValueError(f"Unknown parse mode '{parse_mode}', expected one of {self.PARSE_MODES}")
+        geometry = parse_mode == "geometry"
+        result = type(annotation_result).pb(annotation_result)
         data = {}
+        requested = None
+        if features is not None:
+            requested = {videointelligence.Feature(f).name for f in features}
+        wants = lambda name: requested is None or name in requested
 
         # 1) Shot Annotations
-        shots_info = []
-        if annotation_result.shot_annotations:
-            for i, shot in enumerate(annotation_result.shot_annotations):
-                start_sec = shot.start_time_offset.total_seconds()
-                end_sec = shot.end_time_offset.total_seconds()
-                shots_info.append({
+        if wants("SHOT_CHANGE_DETECTION"):
+            data["shots"] = [
+                {
                     "shot_number": i + 1,
-                    "start_time": start_sec,
-                    "end_time": end_sec
-                })
-        data["shots"] = shots_info
+                    "start_time": _seconds(shot.start_time_offset),
+                    "end_time": _seconds(shot.end_time_offset)
+                }
+                for i, shot in enumerate(result.shot_annotations)
+            ]
 
         # 2) Label Annotations
         segment_labels = []
@@ -157,105 +481,69 @@ class GoogleVideoAnalyzer:
         frame_labels = []
         category_labels = []
 
-        if annotation_result.segment_label_annotations:
-            for seg_label in annotation_result.segment_label_annotations:
-                segment_labels.append(seg_label.entity.description)
-                for category in seg_label.category_entities:
-                    category_labels.append(category.description)
-        if annotation_result.shot_label_annotations:
-            for s_label in annotation_result.shot_label_annotations:
-                shot_labels.append(s_label.entity.description)
-                for category in s_label.category_entities:
-                    category_labels.append(category.description)
-        if annotation_result.frame_label_annotations:
-            for f_label in annotation_result.frame_label_annotations:
-                frame_labels.append(f_label.entity.description)
-                for category in f_label.category_entities:
-                    category_labels.append(category.description)
-
-        data["segment_labels"] = list(set(segment_labels))
-        data["shot_labels"] = list(set(shot_labels))
-        data["frame_labels"] = list(set(frame_labels))
-        data["category_labels"] = list(set(category_labels))
+        if wants("LABEL_DETECTION"):
+            for annotations, labels in ((result.segment_label_annotations, segment_labels),
+                                        (result.shot_label_annotations, shot_labels),
+                                        (result.frame_label_annotations, frame_labels)):
+                for label in annotations:
+                    labels.append(label.entity.description)
+                    category_labels.extend(category.description for category in label.category_entities)
+
+            data["segment_labels"] = list(set(segment_labels))
+            data["shot_labels"] = list(set(shot_labels))
+            data["frame_labels"] = list(set(frame_labels))
+            data["category_labels"] = list(set(category_labels))
 
         # 3) Object Tracking
-        objects_info = []
-        if annotation_result.object_annotations:
-            for obj_annotation in annotation_result.object_annotations:
-                obj_desc = obj_annotation.entity.description
-                seg_start = obj_annotation.segment.start_time_offset.total_seconds()
-                seg_end = obj_annotation.segment.end_time_offset.total_seconds()
-                frames_data = []
-                for frame in obj_annotation.frames:
-                    box = frame.normalized_bounding_box
-                    frames_data.append({
-                        "time_offset_sec": frame.time_offset.total_seconds(),
-                        "bounding_box": {
-                            "left": box.left,
-                            "top": box.top,
-                            "right": box.right,
-                            "bottom": box.bottom
-                        }
-                    })
-                objects_info.append({
-                    "object_description": obj_desc,
-                    "segment_start": seg_start,
-                    "segment_end": seg_end,
-                    "frames": frames_data
-                })
-        data["objects"] = objects_info
+        if wants("OBJECT_TRACKING"):
+            objects_info = []
+            for obj_annotation in result.object_annotations:
+                obj_info = {
+                    "object_description": obj_annotation.entity.description,
+                    "confidence": obj_annotation.confidence,
+                    "segment_start": _seconds(obj_annotation.segment.start_time_offset),
+                    "segment_end": _seconds(obj_annotation.segment.end_time_offset),
+                    "frame_count": len(obj_annotation.frames)
+                }
+                if geometry:
+                    obj_info["frame_times"], obj_info["bounding_boxes"] = self._object_geometry(obj_annotation.frames)
+                objects_info.append(obj_info)
+            data["objects"] = objects_info
 
         # 4) Text Detection
-        texts_info = []
-        if annotation_result.text_annotations:
-            for text_anno in annotation_result.text_annotations:
-                recognized_text = text_anno.text
+        if wants("TEXT_DETECTION"):
+            texts_info = []
+            for text_anno in result.text_annotations:
                 text_segments = []
                 for seg in text_anno.segments:
-                    seg_start = seg.segment.start_time_offset.total_seconds()
-                    seg_end = seg.segment.end_time_offset.total_seconds()
-                    confidence = getattr(seg, "confidence", None)
-                    frames_data = []
-                    for f in seg.frames:
-                        box = f.rotated_bounding_box
-                        poly = []
-                        if box:
-                            poly = [{"x": v.x, "y": v.y} for v in box.vertices]
-                        frames_data.append({
-                            "time_offset_sec": f.time_offset.total_seconds(),
-                            "bounding_polygon": poly
-                        })
-                    text_segments.append({
-                        "segment_start": seg_start,
-                        "segment_end": seg_end,
-                        "confidence": confidence,
-                        "frames": frames_data
-                    })
+                    segment_info = {
+                        "segment_start": _seconds(seg.segment.start_time_offset),
+                        "segment_end": _seconds(seg.segment.end_time_offset),
+                        "confidence": seg.confidence,
+                        "frame_count": len(seg.frames)
+                    }
+                    if geometry:
+                        segment_info["frame_times"], segment_info["polygons"] = self._text_geometry(seg.frames)
+                    text_segments.append(segment_info)
                 texts_info.append({
-                    "text": recognized_text,
+                    "text": text_anno.text,
                     "text_segments": text_segments
                 })
-        data["texts"] = texts_info
+            data["texts"] = texts_info
 
         # 5) Explicit Content
-        explicit_info = []
-        if annotation_result.explicit_annotation:
-            for frame in annotation_result.explicit_annotation.frames:
-                offset_sec = frame.time_offset.total_seconds()
-                likelihood_str = frame.pornography_likelihood.name
-                explicit_info.append({
-                    "time_offset_sec": offset_sec,
-                    "pornography_likelihood": likelihood_str
-                })
-        data["explicit_content"] = explicit_info
+        if wants("EXPLICIT_CONTENT_DETECTION"):
+            likelihood = videointelligence.Likelihood
+            data["explicit_content"] = [
+                {
+                    "time_offset_sec": _seconds(frame.time_offset),
+                    "pornography_likelihood": likelihood(frame.pornography_likelihood).name
+                }
+                for frame in result.explicit_annotation.frames
+            ]
 
         # 6) Environment Guess
-        all_label_strings = (
-            data["segment_labels"] +
-            data["shot_labels"] +
-            data["frame_labels"] +
-            data["category_labels"]
-        )
+        all_label_strings = segment_labels + shot_labels + frame_labels + category_labels
         label_set = {lbl.lower() for lbl in all_label_strings}
         if "outdoor" in label_set:
             data["environment_guess"] = "outdoors"
@@ -264,4 +552,34 @@ class GoogleVideoAnalyzer:
         else:
             data["environment_guess"] = None
 
-        return data
\ No newline at end of file
+        return data
+
+    @staticmethod
+    def _object_geometry(frames):
+        """Return (frame_times, bounding_boxes) arrays for the frames of one tracked object."""
+        times = np.empty(len(frames), dtype=np.float32)
+        boxes = np.empty((len(frames), 4), dtype=np.float32)
+        for i, frame in enumerate(frames):
+            box = frame.normalized_bounding_box
+            times[i] = _seconds(frame.time_offset)
+            boxes[i] = (box.left, box.top, box.right, box.bottom)
+        return times, boxes
+
+    @staticmethod
+    def _text_geometry(frames):
+        """
+        Return (frame_times, polygons) arrays for the frames of one text segment. Frames
+        without a rotated bounding box get an all-zero polygon.
+        """
+        times = np.empty(len(frames), dtype=np.float32)
+        polygons = np.zeros((len(frames), 4, 2), dtype=np.float32)
+        for i, frame in enumerate(frames):
+            times[i] = _seconds(frame.time_offset)
+            for j, vertex in enumerate(frame.rotated_bounding_box.vertices[:4]):
+                polygons[i, j] = (vertex.x, vertex.y)
+        return times, polygons
+
+
+def _seconds(duration) -> float:
+    """Convert a protobuf Duration to seconds."""
+    return duration.seconds + duration.nanos * 1e-9
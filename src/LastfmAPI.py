@@ -1,4 +1,9 @@
+import concurrent.futures
+import json
+import threading
+
 import pylast
+from .RateLimiter import default_limiter
 
 class LastfmAPI:
     """
@@ -12,14 +17,36 @@ class LastfmAPI:
         API_KEY (str): The Last.fm API key used for authentication
         API_SECRET (str): The Last.fm API secret used for authentication
         network (pylast.LastFMNetwork): The authenticated Last.fm network instance
+        limiter (ServiceLimiter): Rate limit and retry policy for Last.fm requests
+        cache (SQLiteCache or LRUCache or None): Lookup results, kept per method for `ttls`
+        ttls (dict): Time-to-live in seconds of each cached method's results
     """
-    def __init__(self, API_KEY, API_SECRET):
+    # Similar tracks and tags change slowly; charts move daily
+    DEFAULT_TTLS = {
+        "similar_tracks": 7 * 86400,
+        "track_tags": 30 * 86400,
+        "top_tracks": 86400,
+        "album_info": 7 * 86400,
+        "global_trending_tracks": 3600,
+    }
+    # Empty results may be a misspelled seed that Last.fm learns about later
+    EMPTY_TTL = 86400
+
+    def __init__(self, API_KEY, API_SECRET, rate_limiter=None, cache=None, ttls=None,
+                 pylast_cache_path=None, batch_workers=4):
         """
         Initialize the Last.fm API wrapper with the provided credentials.
         
         Args:
             API_KEY (str): Your Last.fm API key obtained from Last.fm developer dashboard
             API_SECRET (str): Your Last.fm API secret obtained from Last.fm developer dashboard
+            rate_limiter (ServiceLimiter, optional): Shared "lastfm" limiter; a default one
+                                                     is created if not given.
+            cache (SQLiteCache or LRUCache, optional): Cache for lookup results. Concurrent
+                                                     identical lookups share one request either way.
+            ttls (dict, optional): Per-method TTL overrides, keyed like DEFAULT_TTLS
+            pylast_cache_path (str, optional): Also turn on pylast's own request cache, in this file
+            batch_workers (int, optional): Threads used by the batch lookups when no submit is given
             
         Raises:
             pylast.WSError: If authentication fails due to invalid credentials
@@ -28,40 +55,201 @@ class LastfmAPI:
         self.API_KEY = API_KEY
         self.API_SECRET = API_SECRET
         self.network = pylast.LastFMNetwork(api_key=API_KEY, api_secret=API_SECRET)
+        self.limiter = rate_limiter or default_limiter("lastfm")
+        self.cache = cache
+        self.ttls = {**self.DEFAULT_TTLS, **(ttls or {})}
+        self.batch_workers = batch_workers
+        if pylast_cache_path:
+            self.network.enable_caching(pylast_cache_path)
+        self.coalesced = 0
+        # Lookups in progress, so concurrent identical lookups wait for the first one
+        self._in_flight = {}
+        self._lock = threading.Lock()
 
     def get_similar_tracks(self, song, artist, limit=5) -> tuple[str, str]:
         """Returns similar tracks based on Last.fm recommendations."""
-        track = self.network.get_track(artist, song)
-        similar_tracks = track.get_similar(limit=limit)
-        return [(t.item.title, t.item.artist.name) for t in similar_tracks]
+        return [(title, track_artist) for title, track_artist, _ in self.get_similar_tracks_scored(song, artist, limit)]
+
+    def get_similar_tracks_scored(self, song, artist, limit=5) -> list:
+        """
+        Returns similar tracks as (title, artist, match) tuples, best first, where match
+        is Last.fm's similarity score between 0 and 1.
+        """
+        def fetch():
+            track = self.network.get_track(artist, song)
+            similar_tracks = self.limiter.call(track.get_similar, limit=limit)
+            return [(t.item.title, t.item.artist.name, float(t.match or 0.0)) for t in similar_tracks]
+
+        return [tuple(track) for track in self._lookup("similar_tracks", fetch, song, artist, limit)]
 
     def get_top_tracks(self, artist_name, limit=5):
         """Returns the top tracks of a given artist."""
-        artist = self.network.get_artist(artist_name)
-        top_tracks = artist.get_top_tracks(limit=limit)
-        return [(track.item.title, track.weight) for track in top_tracks]
+        def fetch():
+            artist = self.network.get_artist(artist_name)
+            top_tracks = self.limiter.call(artist.get_top_tracks, limit=limit)
+            return [(track.item.title, track.weight) for track in top_tracks]
+
+        return [tuple(track) for track in self._lookup("top_tracks", fetch, artist_name, limit)]
 
 
     def get_album_info(self, artist, album):
         """Returns information about an album (listeners, play count, release date)."""
-        album_obj = self.network.get_album(artist, album)
-        return {
-            "Title": album_obj.get_title(),
-            "Listeners": album_obj.get_listener_count(),
-            "Play Count": album_obj.get_playcount(),
-            "Release Date": album_obj.get_wiki_published_date() or "Unknown"
-        }
+        def fetch():
+            album_obj = self.network.get_album(artist, album)
+            return {
+                "Title": self.limiter.call(album_obj.get_title),
+                "Listeners": self.limiter.call(album_obj.get_listener_count),
+                "Play Count": self.limiter.call(album_obj.get_playcount),
+                "Release Date": self.limiter.call(album_obj.get_wiki_published_date) or "Unknown"
+            }
+
+        return self._lookup("album_info", fetch, artist, album)
 
     def get_global_trending_tracks(self, limit=5):
         """Returns the top trending tracks globally on Last.fm."""
-        trending_tracks = self.network.get_top_tracks(limit=limit)
-        return [(track.item.title, track.item.artist.name) for track in trending_tracks]
+        def fetch():
+            trending_tracks = self.limiter.call(self.network.get_top_tracks, limit=limit)
+            return [(track.item.title, track.item.artist.name) for track in trending_tracks]
+
+        return [tuple(track) for track in self._lookup("global_trending_tracks", fetch, limit)]
 
     def get_track_tags(self, song, artist, limit=5):
         """Returns the top tags (genres) for a track."""
-        track = self.network.get_track(artist, song)
-        tags = track.get_top_tags(limit=limit)
-        return [tag.item.name for tag in tags]
+        def fetch():
+            track = self.network.get_track(artist, song)
+            tags = self.limiter.call(track.get_top_tags, limit=limit)
+            return [tag.item.name for tag in tags]
+
+        return self._lookup("track_tags", fetch, song, artist, limit)
+
+    def get_seed_info_batch(self, seeds, limit=5, tag_limit=5, include_tags=True, submit=None) -> dict:
+        """
+        Resolve the similar tracks (and tags) of many seed songs concurrently.
+
+        Every lookup goes through the cache and the rate limiter, so this both answers a
+        batch of seeds and pre-warms the cache for later briefs.
+
+        Args:
+            seeds (iterable): (song, artist) pairs
+            limit (int, optional): Similar tracks per seed
+            tag_limit (int, optional): Tags per seed
+            include_tags (bool, optional): Whether to look up the seeds' tags as well
+            submit (callable, optional): submit(fn, *args, **kwargs) -> Future, used to schedule
+                each lookup (for example on a shared, rate-limited pool). Defaults to a private
+                pool of `batch_workers` threads.
+
+        Returns:
+            dict: (song, artist) -> {"similar_tracks": [...], "tags": [...]}; a lookup that
+                  failed is None (the error is printed)
+        """
+        seeds = list(dict.fromkeys((song, artist) for song, artist in seeds))
+        executor = None
+        if submit is None:
+            executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(1, min(self.batch_workers, len(seeds) * 2)), thread_name_prefix="lastfm-batch"
+            )
+            submit = executor.submit
+
+        try:
+            futures = {}
+            for song, artist in seeds:
+                futures[submit(self.get_similar_tracks, song, artist, limit=limit)] = (song, artist, "similar_tracks")
+                if include_tags:
+                    futures[submit(self.get_track_tags, song, artist, limit=tag_limit)] = (song, artist, "tags")
+
+            results = {seed: {"similar_tracks": None, "tags": None} if include_tags else {"similar_tracks": None}
+                       for seed in seeds}
+            for future in concurrent.futures.as_completed(futures):
+                song, artist, field = futures[future]
+                try:
+                    results[(song, artist)][field] = future.result()
+                except Exception as e:
+                    print(f"Error looking up {field} for '{song}' by {artist}: {e}")
+            return results
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    def warm_artists(self, artists, tracks_per_artist=5, limit=5, tag_limit=5, submit=None) -> int:
+        """
+        Pre-warm the cache for popular artists: look up each artist's top tracks, then the
+        similar tracks and tags of every one of them. Returns the number of seeds resolved.
+        """
+        seeds = []
+        for artist in artists:
+            try:
+                seeds.extend((title, artist) for title, _ in self.get_top_tracks(artist, limit=tracks_per_artist))
+            except Exception as e:
+                print(f"Error looking up top tracks of {artist}: {e}")
+        results = self.get_seed_info_batch(seeds, limit=limit, tag_limit=tag_limit, submit=submit)
+        return sum(1 for info in results.values() if info["similar_tracks"] is not None)
+
+    def cache_stats(self) -> dict:
+        """
+        Return the cache's hit/miss counters and the number of coalesced lookups.
+        """
+        stats = self.cache.stats() if self.cache is not None else {"hits": 0, "misses": 0, "hit_rate": 0.0}
+        return {**stats, "coalesced": self.coalesced}
+
+    @staticmethod
+    def cache_key(method, *args) -> str:
+        """
+        Return the cache key of a lookup; song and artist names are compared case-insensitively.
+        """
+        normalized = [" ".join(arg.lower().split()) if isinstance(arg, str) else arg for arg in args]
+        return f"lastfm:{method}:{json.dumps(normalized, ensure_ascii=False)}"
+
+    def _lookup(self, method, fetch, *args):
+        """
+        Return the cached result of `method` for `args`, or call `fetch` and cache it.
+
+        Only one request is made for concurrent identical lookups: the first caller fetches,
+        the others wait for its result (or its error). Errors are not cached.
+        """
+        key = self.cache_key(method, *args)
+        if self.cache is not None:
+            try:
+                cached = self.cache.get(key)
+            except Exception as e:
+                print(f"Last.fm cache read failed: {e}")
+                cached = None
+            if cached is not None:
+                return cached
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = concurrent.futures.Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            value = fetch()
+            if self.cache is not None:
+                self._store(method, key, value)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return value
+
+    def _store(self, method, key, value):
+        """Cache a fetched result; empty results are kept for at most EMPTY_TTL."""
+        ttl = self.ttls.get(method)
+        if not value:
+            ttl = min(ttl, self.EMPTY_TTL) if ttl is not None else self.EMPTY_TTL
+        try:
+            # JSON turns tuples into lists; callers convert them back
+            self.cache.set(key, value, ttl_seconds=ttl)
+        except Exception as e:
+            print(f"Last.fm cache write failed: {e}")
 
 
 ## test the LastfmAPI class and the ability to get similar tracks
@@ -0,0 +1,221 @@
+import csv
+import os
+import sqlite3
+import threading
+import time
+
+
+class MusicIDIndex:
+    """
+    A persistent index from (song, artist) to the TikTok music ID it resolved to.
+
+    Resolving a track through TikAPI search and candidate verification is slow and uses
+    quota, while the answer rarely changes, so resolutions are kept in a local SQLite file.
+    "No match" results are cached as well (negative entries, music_id None) with their own,
+    shorter TTL so that songs which later appear on TikTok are retried.
+
+    Song and artist are normalized (case, whitespace) before lookup. The index can be
+    pre-warmed from, and dumped to, a CSV file with song, artist and music_id columns.
+
+    Attributes:
+        path (str): Location of the SQLite database file
+        ttl_seconds (float or None): Lifetime of a resolved entry (None = never expire)
+        negative_ttl_seconds (float or None): Lifetime of a "no match" entry
+        hits (int): Lookups answered with a music ID
+        negative_hits (int): Lookups answered with a cached "no match"
+        misses (int): Lookups that found nothing usable
+    """
+    COLUMNS = ("song", "artist", "music_id", "resolved_at", "expires_at")
+
+    def __init__(self, path, ttl_seconds=90 * 86400, negative_ttl_seconds=86400):
+        """
+        Open (or create) the index database.
+
+        Args:
+            path (str): Path to the SQLite file, or ":memory:"
+            ttl_seconds (float, optional): Lifetime of resolved entries, in seconds
+            negative_ttl_seconds (float, optional): Lifetime of "no match" entries, in seconds
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS music_index ("
+                " song_key TEXT NOT NULL,"
+                " artist_key TEXT NOT NULL,"
+                " song TEXT, artist TEXT,"
+                " music_id TEXT,"
+                " resolved_at REAL NOT NULL,"
+                " expires_at REAL,"
+                " PRIMARY KEY (song_key, artist_key))"
+            )
+
+    @staticmethod
+    def normalize(text) -> str:
+        """Lowercase and collapse whitespace so trivially different spellings share an entry."""
+        return " ".join(str(text or "").lower().split())
+
+    def lookup(self, song, artist):
+        """
+        Return the cached resolution for `song` by `artist`.
+
+        Returns:
+            dict or None: {"music_id": ..., "resolved_at": ...} where music_id is None for a
+                          cached "no match", or None if the pair is unknown or expired
+        """
+        key = (self.normalize(song), self.normalize(artist))
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT music_id, resolved_at, expires_at FROM music_index WHERE song_key = ? AND artist_key = ?",
+                key
+            ).fetchone()
+            if row is None or (row[2] is not None and row[2] <= now):
+                self.misses += 1
+                return None
+            if row[0] is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+        return {"music_id": row[0], "resolved_at": row[1]}
+
+    def record(self, song, artist, music_id, ttl_seconds=None):
+        """
+        Store the resolution of `song` by `artist`. Pass music_id=None to record "no match".
+
+        Args:
+            ttl_seconds (float, optional): Overrides the default TTL for this entry
+        """
+        now = time.time()
+        if ttl_seconds is None:
+            ttl_seconds = self.ttl_seconds if music_id is not None else self.negative_ttl_seconds
+        expires_at = now + ttl_seconds if ttl_seconds is not None else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO music_index"
+                " (song_key, artist_key, song, artist, music_id, resolved_at, expires_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.normalize(song), self.normalize(artist), song, artist,
+                 str(music_id) if music_id is not None else None, now, expires_at)
+            )
+
+    def delete(self, song, artist):
+        """Forget the resolution of `song` by `artist`, if any."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM music_index WHERE song_key = ? AND artist_key = ?",
+                (self.normalize(song), self.normalize(artist))
+            )
+
+    def purge_expired(self):
+        """Delete expired entries and return how many were removed."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM music_index WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            )
+        return cursor.rowcount
+
+    def import_entries(self, entries, ttl_seconds=None) -> int:
+        """
+        Bulk-load resolutions, e.g. to pre-warm the index for a catalog.
+
+        Args:
+            entries (iterable): Dicts with "song", "artist" and "music_id" keys; an empty
+                                or missing music_id records a "no match"
+            ttl_seconds (float, optional): Overrides the default TTLs for the imported entries
+
+        Returns:
+            int: Number of entries imported
+        """
+        now = time.time()
+        rows = []
+        for entry in entries:
+            song, artist = entry.get("song"), entry.get("artist")
+            if not song or not artist:
+                continue
+            music_id = entry.get("music_id") or None
+            ttl = ttl_seconds
+            if ttl is None:
+                ttl = self.ttl_seconds if music_id is not None else self.negative_ttl_seconds
+            rows.append((self.normalize(song), self.normalize(artist), song, artist,
+                         str(music_id) if music_id is not None else None,
+                         now, now + ttl if ttl is not None else None))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO music_index"
+                " (song_key, artist_key, song, artist, music_id, resolved_at, expires_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        return len(rows)
+
+    def export_entries(self, include_negative=True, include_expired=False) -> list:
+        """
+        Return every entry as a dict with song, artist, music_id, resolved_at and expires_at.
+        """
+        query = f"SELECT {', '.join(self.COLUMNS)} FROM music_index WHERE 1 = 1"
+        params = []
+        if not include_negative:
+            query += " AND music_id IS NOT NULL"
+        if not include_expired:
+            query += " AND (expires_at IS NULL OR expires_at > ?)"
+            params.append(time.time())
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY song_key, artist_key", params).fetchall()
+        return [dict(zip(self.COLUMNS, row)) for row in rows]
+
+    def import_csv(self, path, ttl_seconds=None) -> int:
+        """Bulk-load a CSV file with song, artist and music_id columns."""
+        with open(path, newline="", encoding="utf-8") as file:
+            return self.import_entries(csv.DictReader(file), ttl_seconds=ttl_seconds)
+
+    def export_csv(self, path, include_negative=True) -> int:
+        """Write the live entries to a CSV file and return how many were written."""
+        entries = self.export_entries(include_negative=include_negative)
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.DictWriter(file, fieldnames=["song", "artist", "music_id"], extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(entries)
+        return len(entries)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM music_index").fetchone()[0]
+
+    def stats(self) -> dict:
+        """
+        Return a dictionary with the lookup counters and current size.
+        """
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+            "entries": len(self),
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import or export the song -> TikTok music ID index")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("csv_path", help="CSV file with song, artist and music_id columns")
+    parser.add_argument("--db", default="cache/music_index.sqlite", help="Index database path")
+    args = parser.parse_args()
+
+    index = MusicIDIndex(args.db)
+    if args.command == "import":
+        print(f"Imported {index.import_csv(args.csv_path)} entries into {args.db}")
+    else:
+        print(f"Exported {index.export_csv(args.csv_path)} entries to {args.csv_path}")
@@ -1,49 +1,353 @@
-from openai import OpenAI
-from openai import OpenAI
+import hashlib
+import json
+import threading
+from openai import OpenAI, AsyncOpenAI
+from .TrendCompactor import TrendCompactor
+from .RateLimiter import default_limiter
+
+SYSTEM_PROMPT = (
+    "You are an expert social media marketing AI. "
+    "You analyze repeated elements found in TikTok videos and provide insights. "
+    "You then give a brief for social media creators, specifying video concepts, backgrounds, number of people, text (size, position), etc. "
+    "Here is an example brief: Slideshow med on screen captions som består av tre bilder. De två första visar nostalgi från det förflutna, och den sista visar hur det ser ut idag."
+)
+
+BRIEF_INSTRUCTIONS = (
+    "Please provide a concise summary of these repeated features, focusing on any themes, "
+    "ideas, or potential video concepts they might represent. Then, be specific and provide a detailed brief on how a creator should make the TikTok, including background, number of people, text size/position, and overall style."
+)
+
+class SummaryError(RuntimeError):
+    """
+    Raised when a summary could not be generated: the completion failed with an error that
+    is not retried, or the rate limiter's retries (or its retry budget) ran out.
+    """
+
 
 class OpenAITrendSummarizer:
     """
     Uses OpenAI's Chat API to generate natural language summaries of detected video trends.
+
+    Summaries can be cached (in memory with LRUCache or on disk with SQLiteCache), keyed on a
+    canonical hash of the prompt together with the model and sampling settings, so repeat
+    briefs for the same trends cost no LLM latency or tokens.
+
+    With a TrendCompactor, trends are deduplicated, ranked and trimmed to its token budget
+    before the prompt is built; compaction_stats records how much was trimmed.
+
+    Requests go through a ServiceLimiter (token bucket plus retries with backoff), so the
+    OpenAI clients' own retries are turned off. A request that still fails raises
+    SummaryError, so callers never mistake an error for a summary.
     """
-    def __init__(self, api_key:str, model: str = "gpt-3.5-turbo"):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, api_key:str, model: str = "gpt-3.5-turbo", cache=None,
+                 cache_ttl: float = None, temperature: float = 0.7, max_tokens: int = 300,
+                 compactor: TrendCompactor = None, rate_limiter=None):
+        self.api_key = api_key
+        self.client = OpenAI(api_key=api_key, max_retries=0)
+        self.limiter = rate_limiter or default_limiter("openai")
         self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        # Created on first use by asummarize_trends
+        self.async_client = None
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self.tokens_used = 0
+        self.tokens_saved = 0
+        # Summaries run concurrently on the scheduler's workers, so the counters are locked
+        self._stats_lock = threading.Lock()
+        self.compactor = compactor
+        self.compaction_stats = {"prompts": 0, "items_in": 0, "items_out": 0,
+                                 "prompt_tokens_before": 0, "prompt_tokens_after": 0}
 
-    def summarize_trends(self, trends: dict) -> str:
+    def summarize_trends(self, trends: dict, on_token=None) -> str:
         """
         Summarizes the detected trends into a human-readable format.
         :param trends: A dictionary with keys like "labels", "objects", "texts".
+        :param on_token: Optional callable; if given, the completion is streamed and each
+                         text delta is passed to it as soon as it arrives.
         :return: A string containing the generated summary.
+        :raises SummaryError: If the completion failed.
         """
-        prompt = self._build_prompt(trends)
+        trends = self.compact_trends(trends)
+        key = self.cache_key(trends)
+        cached = self._cache_lookup(key)
+        if cached is not None:
+            if on_token is not None:
+                on_token(cached)
+            return cached
+
         try:
             print("Using OpenAI client with model:", self.model)
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are an expert social media marketing AI. "
-                            "You analyze repeated elements found in TikTok videos and provide insights. "
-                            "You then give a brief for social media creators, specifying video concepts, backgrounds, number of people, text (size, position), etc. "
-                            "Here is an example brief: Slideshow med on screen captions som består av tre bilder. De två första visar nostalgi från det förflutna, och den sista visar hur det ser ut idag."
-                        )
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=300
+            if on_token is not None:
+                summary, tokens = self._stream_summary(trends, on_token)
+            else:
+                response = self.limiter.call(self.client.chat.completions.create, **self._completion_kwargs(trends))
+                summary = response.choices[0].message.content.strip()
+                tokens = self._total_tokens(response)
+            self._cache_store(key, summary, tokens)
+            return summary
+
+        except Exception as e:
+            print(f"OpenAI API error: {e}")
+            raise SummaryError(f"OpenAI API error: {e}") from e
+
+    async def asummarize_trends(self, trends: dict) -> str:
+        """
+        Async counterpart of summarize_trends, using the AsyncOpenAI client.
+        :param trends: A dictionary with keys like "labels", "objects", "texts".
+        :return: A string containing the generated summary.
+        :raises SummaryError: If the completion failed.
+        """
+        trends = self.compact_trends(trends)
+        key = self.cache_key(trends)
+        cached = self._cache_lookup(key)
+        if cached is not None:
+            return cached
+
+        if self.async_client is None:
+            self.async_client = AsyncOpenAI(api_key=self.api_key, max_retries=0)
+        try:
+            print("Using async OpenAI client with model:", self.model)
+            response = await self.limiter.acall(
+                self.async_client.chat.completions.create, **self._completion_kwargs(trends)
             )
             summary = response.choices[0].message.content.strip()
+            self._cache_store(key, summary, self._total_tokens(response))
             return summary
 
         except Exception as e:
             print(f"OpenAI API error: {e}")
-            return "Error generating summary."
+            raise SummaryError(f"OpenAI API error: {e}") from e
+
+    def summarize_batch(self, track_trends: list, overall_trends: dict):
+        """
+        Summarizes every track and the aggregate in a single JSON-mode completion.
+        :param track_trends: A list of (title, trends) pairs, one per track.
+        :param overall_trends: The aggregated trends of all tracks.
+        :return: A (track_summaries, overall_summary) tuple, where track_summaries follows the
+                 order of track_trends, or None if the response could not be used.
+        :raises SummaryError: If the completion failed.
+        """
+        track_trends = [(title, self.compact_trends(trends)) for title, trends in track_trends]
+        overall_trends = self.compact_trends(overall_trends)
+        kwargs = self._batch_completion_kwargs(track_trends, overall_trends)
+        key = self._hash_payload({"batch": kwargs["messages"][1]["content"], "model": self.model,
+                                  "temperature": self.temperature, "max_tokens": kwargs["max_tokens"]})
+        cached = self._cache_lookup(key)
+        if cached is not None:
+            return cached["tracks"], cached["overall"]
+
+        try:
+            print("Using OpenAI client with model:", self.model, f"(batch of {len(track_trends)} tracks)")
+            response = self.limiter.call(self.client.chat.completions.create, **kwargs)
+        except Exception as e:
+            print(f"OpenAI API error: {e}")
+            raise SummaryError(f"OpenAI API error: {e}") from e
+        parsed = self._parse_batch(response.choices[0].message.content, len(track_trends))
+
+        if parsed is None:
+            with self._stats_lock:
+                self.tokens_used += self._total_tokens(response)
+            print("Could not parse the batched summary response.")
+            return None
+        self._cache_store(key, {"tracks": parsed[0], "overall": parsed[1]}, self._total_tokens(response))
+        return parsed
+
+    @staticmethod
+    def _parse_batch(content: str, track_count: int):
+        """
+        Parses the JSON returned by a batched completion into (track_summaries, overall_summary).
+        Returns None if the JSON is malformed, or the overall brief or any track's brief is missing.
+        """
+        try:
+            data = json.loads(content)
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(data, dict) or not str(data.get("overall", "")).strip():
+            return None
+
+        by_number = {}
+        for entry in data.get("tracks", []):
+            if isinstance(entry, dict) and str(entry.get("brief", "")).strip():
+                try:
+                    by_number[int(entry.get("track"))] = str(entry["brief"]).strip()
+                except (TypeError, ValueError):
+                    continue
+        if any(i + 1 not in by_number for i in range(track_count)):
+            return None
+        return [by_number[i + 1] for i in range(track_count)], str(data["overall"]).strip()
+
+    def _batch_completion_kwargs(self, track_trends: list, overall_trends: dict) -> dict:
+        """
+        Builds a JSON-mode chat completion request covering all tracks and the aggregate.
+        """
+        lines = [
+            "We have identified recurring features from TikTok videos for several songs. "
+            "Each section lists the features for one song; the last section combines all of them.\n"
+        ]
+        for number, (title, trends) in enumerate(track_trends, start=1):
+            lines.append(f"### Track {number}: {title}")
+            lines.extend(self._feature_lines(trends))
+            lines.append("")
+        lines.append("### Overall")
+        lines.extend(self._feature_lines(overall_trends))
+        lines.append("")
+        lines.append(f"For each track section and for the overall section: {BRIEF_INSTRUCTIONS}")
+        lines.append(
+            'Respond with a JSON object of the form {"tracks": [{"track": <track number>, "brief": "<text>"}], '
+            '"overall": "<text>"}, with one entry in "tracks" for every track section.'
+        )
+        return dict(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": "\n".join(lines)}
+            ],
+            response_format={"type": "json_object"},
+            temperature=self.temperature,
+            max_tokens=self.max_tokens * (len(track_trends) + 1)
+        )
+
+    def compact_trends(self, trends: dict) -> dict:
+        """
+        Applies the compactor (if any) to `trends`, budgeting the full prompt it will produce,
+        and prints how much was trimmed.
+        """
+        if self.compactor is None or not trends:
+            return trends
+        compacted, report = self.compactor.compact(
+            trends, render=lambda t: SYSTEM_PROMPT + "\n" + self._build_prompt(t)
+        )
+        with self._stats_lock:
+            stats = self.compaction_stats
+            stats["prompts"] += 1
+            stats["items_in"] += report["items_in"]
+            stats["items_out"] += report["items_out"]
+            stats["prompt_tokens_before"] += report["tokens_before"]
+            stats["prompt_tokens_after"] += report["tokens_after"]
+        print(
+            f"Compacted trends: {report['items_in']} -> {report['items_out']} items "
+            f"({report['duplicates_removed']} duplicates, {report['truncated']} truncated, "
+            f"{report['dropped']} dropped), prompt {report['tokens_before']} -> {report['tokens_after']} tokens"
+        )
+        return compacted
+
+    def cache_key(self, trends: dict) -> str:
+        """
+        Returns the cache key for `trends`: a hash of the prompt built from the trends with
+        categories and items sorted and deduplicated, plus the model and sampling settings.
+        """
+        normalized = {
+            category: sorted({str(item).strip() for item in items if str(item).strip()})
+            for category, items in sorted(trends.items())
+        }
+        return self._hash_payload({
+            "prompt": self._build_prompt(normalized),
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+        })
+
+    @staticmethod
+    def _hash_payload(payload: dict) -> str:
+        """
+        Returns a stable cache key for a JSON-serializable request description.
+        """
+        encoded = json.dumps(payload, sort_keys=True).encode("utf-8")
+        return "summary:" + hashlib.sha256(encoded).hexdigest()
+
+    def cache_stats(self) -> dict:
+        """
+        Returns cache hit/miss counters together with the tokens spent and saved.
+        """
+        stats = self.cache.stats() if self.cache is not None else {"hits": 0, "misses": 0, "hit_rate": 0.0}
+        with self._stats_lock:
+            stats["tokens_used"] = self.tokens_used
+            stats["tokens_saved"] = self.tokens_saved
+        return stats
+
+    def _cache_lookup(self, key: str):
+        """
+        Returns the cached summary for `key`, or None.
+        """
+        if self.cache is None:
+            return None
+        try:
+            entry = self.cache.get(key)
+        except Exception as e:
+            print(f"Summary cache lookup failed: {e}")
+            return None
+        if entry is None:
+            return None
+        print("Using cached summary")
+        with self._stats_lock:
+            self.tokens_saved += entry.get("tokens", 0)
+        return entry["summary"]
+
+    def _cache_store(self, key: str, summary: str, tokens: int):
+        """
+        Records token usage and stores a freshly generated summary.
+        """
+        with self._stats_lock:
+            self.tokens_used += tokens
+        if self.cache is None or not summary:
+            return
+        try:
+            self.cache.set(key, {"summary": summary, "tokens": tokens}, ttl_seconds=self.cache_ttl)
+        except Exception as e:
+            print(f"Summary cache store failed: {e}")
+
+    @staticmethod
+    def _total_tokens(response) -> int:
+        """
+        Returns the total token count reported for a completion, or 0 if it is unavailable.
+        """
+        usage = getattr(response, "usage", None)
+        return getattr(usage, "total_tokens", 0) or 0
+
+    def _stream_summary(self, trends: dict, on_token):
+        """
+        Requests the summary with stream=True, forwarding each delta to `on_token`.
+        Returns a (summary, total_tokens) tuple.
+        """
+        stream = self.limiter.call(
+            self.client.chat.completions.create,
+            stream=True, stream_options={"include_usage": True}, **self._completion_kwargs(trends)
+        )
+        parts = []
+        tokens = 0
+        for chunk in stream:
+            if getattr(chunk, "usage", None):
+                tokens = self._total_tokens(chunk)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                on_token(delta)
+        return "".join(parts).strip(), tokens
+
+    def _completion_kwargs(self, trends: dict) -> dict:
+        """
+        Builds the keyword arguments for a chat completion request summarizing `trends`.
+        """
+        prompt = self._build_prompt(trends)
+        return dict(
+            model=self.model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": SYSTEM_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            temperature=self.temperature,
+            max_tokens=self.max_tokens
+        )
 
     def _build_prompt(self, trends: dict) -> str:
         """
@@ -52,6 +356,16 @@ class OpenAITrendSummarizer:
         lines = [
             "We have identified the following recurring features from multiple TikTok videos:\n"
         ]
+        lines.extend(self._feature_lines(trends))
+        lines.append("\n" + BRIEF_INSTRUCTIONS)
+        return "\n".join(lines)
+
+    @staticmethod
+    def _feature_lines(trends: dict) -> list:
+        """
+        Formats one "Category: item, item" line per trend category.
+        """
+        lines = []
         for category, items in trends.items():
             readable_cat = category.replace("_", " ").title()
             if items:
@@ -59,8 +373,4 @@ class OpenAITrendSummarizer:
             else:
                 line = f"{readable_cat}: (No items found)"
             lines.append(line)
-        lines.append(
-            "\nPlease provide a concise summary of these repeated features, focusing on any themes, "
-            "ideas, or potential video concepts they might represent. Then, be specific and provide a detailed brief on how a creator should make the TikTok, including background, number of people, text size/position, and overall style."
-        )
-        return "\n".join(lines)
+        return lines
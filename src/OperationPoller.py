@@ -0,0 +1,150 @@
+import concurrent.futures
+import heapq
+import itertools
+import threading
+import time
+
+from .RateLimiter import is_retryable
+
+
+class OperationPoller:
+    """
+    Waits for many long-running operations (e.g. annotate_video) from one background thread.
+
+    Blocking in operation.result() pins a thread per operation for its whole lifetime,
+    which for Video Intelligence can be minutes. Instead, operations are handed to track()
+    right after they are started, and a single thread polls each of them with exponential
+    backoff, resolving a Future with the operation's response (or error) once it is done.
+    The number of threads stays the same however many operations are in flight.
+
+    Attributes:
+        initial_delay (float): Seconds before an operation is polled for the first time
+        multiplier (float): Growth of the delay between two polls of the same operation
+        max_delay (float): Longest delay between two polls
+        limiter (ServiceLimiter or None): Rate limit applied to the poll requests
+        counters (dict): tracked, polls, completed, failed and timed_out
+    """
+    def __init__(self, initial_delay: float = 2.0, multiplier: float = 1.5, max_delay: float = 15.0,
+                 limiter=None):
+        self.initial_delay = initial_delay
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        self.limiter = limiter
+        self.counters = {"tracked": 0, "polls": 0, "completed": 0, "failed": 0, "timed_out": 0}
+        # Heap of (next poll time, sequence, entry); the sequence breaks ties between entries
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def track(self, operation, timeout: float = None, name: str = None) -> concurrent.futures.Future:
+        """
+        Start polling `operation` and return a Future for its response.
+
+        Args:
+            operation (google.api_core.operation.Operation): A started long-running operation
+            timeout (float, optional): Seconds after which the operation is cancelled and the
+                                       Future fails with concurrent.futures.TimeoutError
+            name (str, optional): Name shown by pending(); defaults to the operation's name
+
+        Returns:
+            concurrent.futures.Future: Resolves to operation.result()
+        """
+        now = time.monotonic()
+        entry = {
+            "operation": operation,
+            "future": concurrent.futures.Future(),
+            "name": name or getattr(getattr(operation, "operation", None), "name", None) or repr(operation),
+            "delay": self.initial_delay,
+            "deadline": now + timeout if timeout is not None else None,
+        }
+        entry["future"].set_running_or_notify_cancel()
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("OperationPoller has been shut down")
+            self.counters["tracked"] += 1
+            self._schedule(entry, now + self.initial_delay)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="operation-poller", daemon=True)
+                self._thread.start()
+        return entry["future"]
+
+    def pending(self) -> list:
+        """Return the names of the operations that are still being polled."""
+        with self._condition:
+            return [entry["name"] for _, _, entry in self._heap]
+
+    def stats(self) -> dict:
+        """Return the polling counters and the number of operations in flight."""
+        with self._condition:
+            return {**self.counters, "in_flight": len(self._heap)}
+
+    def shutdown(self):
+        """Stop polling. Operations still in flight have their Futures failed."""
+        with self._condition:
+            self._stopped = True
+            remaining = [entry for _, _, entry in self._heap]
+            self._heap.clear()
+            self._condition.notify_all()
+        for entry in remaining:
+            entry["future"].set_exception(RuntimeError("OperationPoller has been shut down"))
+
+    def _schedule(self, entry, when):
+        heapq.heappush(self._heap, (when, next(self._sequence), entry))
+        self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped and (not self._heap or self._heap[0][0] > time.monotonic()):
+                    self._condition.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                if self._stopped:
+                    return
+                _, _, entry = heapq.heappop(self._heap)
+            self._poll(entry)
+
+    def _poll(self, entry):
+        """Poll one operation and resolve, fail or reschedule it."""
+        operation, future = entry["operation"], entry["future"]
+        try:
+            self._count("polls")
+            done = self.limiter.call(operation.done) if self.limiter is not None else operation.done()
+            if done:
+                try:
+                    future.set_result(operation.result())
+                    self._count("completed")
+                except Exception as exc:
+                    future.set_exception(exc)
+                    self._count("failed")
+                return
+        except Exception as exc:
+            if not is_retryable(exc):
+                future.set_exception(exc)
+                self._count("failed")
+                return
+            print(f"Polling {entry['name']} failed ({exc}), retrying")
+
+        now = time.monotonic()
+        if entry["deadline"] is not None and now >= entry["deadline"]:
+            self._count("timed_out")
+            try:
+                operation.cancel()
+            except Exception:
+                pass
+            future.set_exception(concurrent.futures.TimeoutError(f"Operation {entry['name']} timed out"))
+            return
+
+        next_poll = now + entry["delay"]
+        if entry["deadline"] is not None:
+            next_poll = min(next_poll, entry["deadline"])
+        entry["delay"] = min(self.max_delay, entry["delay"] * self.multiplier)
+        with self._condition:
+            if self._stopped:
+                future.set_exception(RuntimeError("OperationPoller has been shut down"))
+                return
+            self._schedule(entry, next_poll)
+
+    def _count(self, counter):
+        with self._condition:
+            self.counters[counter] += 1
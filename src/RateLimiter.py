@@ -0,0 +1,271 @@
+import asyncio
+import random
+import threading
+import time
+
+# HTTP statuses worth retrying: throttling and transient server errors
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+THROTTLE_STATUS = {429}
+# Last.fm web service errors: 11 service offline, 16 temporarily unavailable, 29 rate limit exceeded
+RETRYABLE_LASTFM_STATUS = {"11", "16", "29"}
+# Exception class names raised by the client libraries for throttling and transient failures
+RETRYABLE_EXCEPTION_NAMES = {
+    "RateLimitError", "APIConnectionError", "APITimeoutError", "InternalServerError",
+    "TooManyRequests", "ServiceUnavailable", "GatewayTimeout",
+    "DeadlineExceeded", "ConnectionError", "Timeout", "ConnectTimeout", "ReadTimeout",
+    "TransportError", "NetworkError", "ChunkedEncodingError",
+}
+
+
+def _status_of(exc):
+    """Return the HTTP status carried by an exception from any of our client libraries, if any."""
+    for attribute in ("status_code", "code"):
+        status = getattr(exc, attribute, None)
+        if isinstance(status, int):
+            return status
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_throttled(exc) -> bool:
+    """Whether `exc` means the service asked us to slow down."""
+    if _status_of(exc) in THROTTLE_STATUS:
+        return True
+    if str(getattr(exc, "status", "")) == "29":
+        return True
+    return type(exc).__name__ in ("RateLimitError", "TooManyRequests")
+
+
+def is_retryable(exc) -> bool:
+    """
+    Whether `exc` is a throttling or transient error that a later attempt may not hit.
+    Client errors such as bad requests or authentication failures are not retried.
+    """
+    status = _status_of(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    if str(getattr(exc, "status", "")) in RETRYABLE_LASTFM_STATUS:
+        return True
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    return any(cls.__name__ in RETRYABLE_EXCEPTION_NAMES for cls in type(exc).__mro__)
+
+
+def _retry_after(exc):
+    """Return the server's Retry-After delay in seconds, if the exception carries one."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        value = headers.get("Retry-After") or headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket: `rate` tokens per second, holding at most `burst`.
+
+    reserve() takes a token immediately and returns how long the caller must wait before
+    using it, so the same bucket serves blocking threads and asyncio tasks alike.
+    """
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token and return the number of seconds to wait before it is valid."""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> float:
+        """Block until a token is available and return the time spent waiting."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of the traffic, so a failing service is not hammered
+    with retry storms: every request deposits `ratio` tokens and every retry spends one.
+    `min_retries` tokens are available up front so low-traffic services can still retry.
+    """
+    def __init__(self, ratio: float = 0.2, min_retries: int = 10):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self._balance = float(min_retries)
+        self._max_balance = float(min_retries) + 100 * ratio
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self._balance = min(self._max_balance, self._balance + self.ratio)
+
+    def try_spend(self) -> bool:
+        """Spend one retry if the budget allows it."""
+        with self._lock:
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+
+class ServiceLimiter:
+    """
+    Rate limiting and retries for the calls to one external service.
+
+    Every attempt first takes a token from the service's bucket. Retryable failures
+    (throttling, 5xx, timeouts, connection errors) are retried with full-jitter exponential
+    backoff, honoring Retry-After when the server sends it, for at most `max_retries`
+    attempts and only while the shared retry budget allows. Anything else is raised at once.
+
+    Attributes:
+        name (str): Service name used in log lines and stats
+        counters (dict): calls, throttled (waited for a token), throttle_wait_seconds,
+                         rate_limited (429-style responses), retries, budget_exhausted
+                         and failures (errors raised to the caller)
+    """
+    def __init__(self, name: str, rate: float = None, burst: float = None, max_retries: int = 3,
+                 base_delay: float = 0.5, max_delay: float = 20.0,
+                 retry_budget_ratio: float = 0.2, min_retries: int = 10):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = RetryBudget(retry_budget_ratio, min_retries)
+        self.counters = {"calls": 0, "throttled": 0, "throttle_wait_seconds": 0.0, "rate_limited": 0,
+                         "retries": 0, "budget_exhausted": 0, "failures": 0}
+        self._lock = threading.Lock()
+
+    def call(self, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` under the rate limit, retrying transient failures."""
+        self._count("calls")
+        self.budget.record_request()
+        attempt = 0
+        while True:
+            self._wait_for_token(time.sleep)
+            try:
+                return fn(*args, **kwargs)
+            except Exception as exc:
+                delay = self._retry_delay(exc, attempt)
+                if delay is None:
+                    raise
+            attempt += 1
+            time.sleep(delay)
+
+    async def acall(self, fn, *args, **kwargs):
+        """Async counterpart of call() for coroutine functions."""
+        self._count("calls")
+        self.budget.record_request()
+        attempt = 0
+        while True:
+            wait = self.bucket.reserve() if self.bucket else 0.0
+            if wait > 0:
+                self._record_wait(wait)
+                await asyncio.sleep(wait)
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as exc:
+                delay = self._retry_delay(exc, attempt)
+                if delay is None:
+                    raise
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        """Return a copy of the throttling and retry counters."""
+        with self._lock:
+            stats = dict(self.counters)
+        stats["throttle_wait_seconds"] = round(stats["throttle_wait_seconds"], 3)
+        return stats
+
+    def _wait_for_token(self, sleep):
+        if self.bucket is None:
+            return
+        wait = self.bucket.reserve()
+        if wait > 0:
+            self._record_wait(wait)
+            sleep(wait)
+
+    def _retry_delay(self, exc, attempt):
+        """
+        Decide whether to retry after `exc`. Returns the backoff delay, or None to give up.
+        """
+        if is_throttled(exc):
+            self._count("rate_limited")
+        if not is_retryable(exc) or attempt >= self.max_retries:
+            self._count("failures")
+            return None
+        if not self.budget.try_spend():
+            self._count("budget_exhausted")
+            self._count("failures")
+            return None
+        self._count("retries")
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        print(f"{self.name}: {type(exc).__name__} ({exc}), retrying in {delay:.2f}s "
+              f"(attempt {attempt + 2}/{self.max_retries + 1})")
+        return delay
+
+    def _record_wait(self, wait):
+        with self._lock:
+            self.counters["throttled"] += 1
+            self.counters["throttle_wait_seconds"] += wait
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+
+def default_limiter(service: str) -> ServiceLimiter:
+    """Return a stand-alone limiter for `service` with the default settings."""
+    return ServiceLimiter(service, **RateLimiterRegistry.DEFAULT_SETTINGS.get(service, {}))
+
+
+class RateLimiterRegistry:
+    """
+    One ServiceLimiter per external service, built from the `rate_limits` section of
+    config.yaml. Settings under `default` apply to every service and are overridden by
+    the service's own section.
+    """
+    DEFAULT_SETTINGS = {
+        "lastfm": {"rate": 5, "burst": 5},
+        "tikapi": {"rate": 10, "burst": 10},
+        "gcs": {"rate": 50, "burst": 50},
+        "video_intelligence": {"rate": 5, "burst": 10},
+        "openai": {"rate": 3, "burst": 5},
+    }
+
+    def __init__(self, settings: dict = None):
+        settings = dict(settings or {})
+        defaults = settings.pop("default", None) or {}
+        self._limiters = {}
+        for service in set(self.DEFAULT_SETTINGS) | set(settings):
+            options = dict(self.DEFAULT_SETTINGS.get(service, {}))
+            options.update(defaults)
+            options.update(settings.get(service) or {})
+            self._limiters[service] = ServiceLimiter(service, **options)
+
+    def get(self, service: str) -> ServiceLimiter:
+        """Return the limiter for `service`, creating an unthrottled one for unknown services."""
+        if service not in self._limiters:
+            self._limiters[service] = ServiceLimiter(service)
+        return self._limiters[service]
+
+    def stats(self) -> dict:
+        """Return the counters of every service."""
+        return {service: limiter.stats() for service, limiter in sorted(self._limiters.items())}
@@ -0,0 +1,135 @@
+import collections
+import concurrent.futures
+import threading
+
+
+class PipelineScheduler:
+    """
+    A shared, bounded executor for every stage of the brief pipeline.
+
+    All calls to external services are submitted here under a service name
+    ("tikapi", "gcs", "video_intelligence", "openai", ...). Each service has its own
+    concurrency limit, and the total number of I/O threads is the sum of those limits,
+    so the thread count stays fixed no matter how many briefs or videos are in flight.
+    Tasks that exceed a service's limit wait in a per-service queue instead of
+    occupying a worker thread.
+
+    Per-track orchestration (which itself waits on service calls) runs on a separate,
+    smaller pool so that it can never starve the I/O workers it depends on.
+
+    Attributes:
+        limits (dict): Maximum number of concurrent calls per service
+        max_tracks (int): Maximum number of tracks processed concurrently
+    """
+    DEFAULT_LIMITS = {
+        "lastfm": 4,
+        "tikapi": 4,
+        "gcs": 8,
+        "video_intelligence": 8,
+        "openai": 4,
+    }
+
+    def __init__(self, limits: dict = None, max_tracks: int = 4):
+        """
+        Initialize the scheduler and its worker pools.
+
+        Args:
+            limits (dict, optional): Per-service concurrency limits, merged over DEFAULT_LIMITS.
+            max_tracks (int, optional): Number of tracks that may be processed at the same time.
+        """
+        self.limits = dict(self.DEFAULT_LIMITS)
+        self.limits.update(limits or {})
+        self.max_tracks = max_tracks
+
+        self._lock = threading.Lock()
+        self._pending = {service: collections.deque() for service in self.limits}
+        self._running = {service: 0 for service in self.limits}
+        self._submitted = {service: 0 for service in self.limits}
+        self._peak = {service: 0 for service in self.limits}
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=sum(self.limits.values()), thread_name_prefix="pipeline-io"
+        )
+        self._track_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_tracks, thread_name_prefix="pipeline-track"
+        )
+
+    def submit(self, service: str, fn, *args, **kwargs) -> concurrent.futures.Future:
+        """
+        Schedule `fn(*args, **kwargs)` as a call to `service`.
+
+        Args:
+            service (str): Name of the external service the call talks to
+            fn (callable): The function to run
+
+        Returns:
+            concurrent.futures.Future: Resolves to the return value of `fn`
+
+        Raises:
+            ValueError: If `service` has no configured limit
+        """
+        if service not in self.limits:
+            raise ValueError(f"Unknown service '{service}', expected one of {sorted(self.limits)}")
+        future = concurrent.futures.Future()
+        with self._lock:
+            self._pending[service].append((future, fn, args, kwargs))
+            self._submitted[service] += 1
+        self._dispatch(service)
+        return future
+
+    def call(self, service: str, fn, *args, **kwargs):
+        """
+        Run `fn` under the limit for `service` and wait for its result.
+        """
+        return self.submit(service, fn, *args, **kwargs).result()
+
+    def submit_track(self, fn, *args, **kwargs) -> concurrent.futures.Future:
+        """
+        Schedule a per-track orchestration function on the track pool.
+        """
+        return self._track_executor.submit(fn, *args, **kwargs)
+
+    def stats(self) -> dict:
+        """
+        Return per-service counters: submitted, running, queued and peak concurrency.
+        """
+        with self._lock:
+            return {
+                service: {
+                    "limit": self.limits[service],
+                    "submitted": self._submitted[service],
+                    "running": self._running[service],
+                    "queued": len(self._pending[service]),
+                    "peak": self._peak[service],
+                }
+                for service in self.limits
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Stop both worker pools."""
+        self._track_executor.shutdown(wait=wait)
+        self._executor.shutdown(wait=wait)
+
+    def _dispatch(self, service):
+        """Hand queued tasks for `service` to the I/O pool while it is under its limit."""
+        with self._lock:
+            while self._running[service] < self.limits[service] and self._pending[service]:
+                task = self._pending[service].popleft()
+                self._running[service] += 1
+                self._peak[service] = max(self._peak[service], self._running[service])
+                self._executor.submit(self._run, service, *task)
+
+    def _run(self, service, future, fn, args, kwargs):
+        """Execute a task, resolve its future and free the service slot."""
+        try:
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException as exc:
+                    future.set_exception(exc)
+                else:
+                    future.set_result(result)
+        finally:
+            with self._lock:
+                self._running[service] -= 1
+            self._dispatch(service)
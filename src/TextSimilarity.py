@@ -0,0 +1,251 @@
+import re
+import zlib
+import numpy as np
+
+
+def normalize_text(text) -> str:
+    """
+    Lowercase `text` and collapse runs of whitespace.
+    """
+    return " ".join(str(text).lower().split())
+
+
+def char_ngrams(text, n: int = 3) -> list:
+    """
+    Return the character n-grams of the normalized text, padded with a space on both
+    sides so that word boundaries count. Empty text has no n-grams.
+    """
+    normalized = normalize_text(text)
+    if not normalized:
+        return []
+    padded = f" {normalized} "
+    if len(padded) <= n:
+        return [padded]
+    return [padded[i:i + n] for i in range(len(padded) - n + 1)]
+
+
+class NgramVectorizer:
+    """
+    Turns strings into hashed character n-gram count vectors for fast fuzzy matching.
+
+    Each text becomes one L2-normalized row of a NumPy matrix, so comparing one query
+    against many candidates (or many against many) is a single matrix product instead
+    of a SequenceMatcher call per pair. Scores are cosine similarities in [0, 1].
+
+    Attributes:
+        n (int): Length of the character n-grams
+        dimensions (int): Size of the hashed feature space
+    """
+    def __init__(self, n: int = 3, dimensions: int = 4096):
+        self.n = n
+        self.dimensions = dimensions
+
+    def transform(self, texts) -> np.ndarray:
+        """
+        Return a (len(texts), dimensions) float32 matrix of normalized n-gram counts.
+        Texts without any n-grams get an all-zero row.
+        """
+        texts = list(texts)
+        rows, columns = [], []
+        for row, text in enumerate(texts):
+            for gram in char_ngrams(text, self.n):
+                rows.append(row)
+                columns.append(zlib.crc32(gram.encode("utf-8")) % self.dimensions)
+
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        if rows:
+            np.add.at(matrix, (np.asarray(rows), np.asarray(columns)), 1.0)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def similarity_matrix(self, texts_a, texts_b) -> np.ndarray:
+        """
+        Return the (len(texts_a), len(texts_b)) matrix of cosine similarities.
+        """
+        return self.transform(texts_a) @ self.transform(texts_b).T
+
+    def scores(self, query, candidates) -> np.ndarray:
+        """
+        Return the similarity of `query` to each of `candidates` as a 1-D array.
+        """
+        candidates = list(candidates)
+        if not candidates:
+            return np.zeros(0, dtype=np.float32)
+        return self.similarity_matrix([query], candidates)[0]
+
+    def similarity(self, a, b) -> float:
+        """
+        Return the similarity of two strings.
+        """
+        return float(self.similarity_matrix([a], [b])[0, 0])
+
+
+def canonical_text(text) -> str:
+    """
+    Normalize `text` and drop punctuation and symbols (e.g. the "@" of a handle or the
+    "#" of a hashtag), so that OCR variants differing only in those compare equal. Text
+    made only of symbols is returned normalized.
+    """
+    normalized = normalize_text(text)
+    stripped = " ".join(_SYMBOLS.sub(" ", normalized).split())
+    return stripped or normalized
+
+
+_SYMBOLS = re.compile(r"[^\w\s]|_", re.UNICODE)
+# Mersenne prime modulus of the MinHash permutations; (a * x + b) stays below 2 ** 64
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+class TextClusterer:
+    """
+    Groups near-duplicate strings, such as the OCR variants "@user", "@usr" and "user"
+    of one handle, with character n-gram MinHash and locality-sensitive hashing.
+
+    Texts are first reduced to their canonical form, so exact variants collapse for
+    free. Each distinct canonical text gets a MinHash signature of `num_perm` values,
+    computed for many texts at once with NumPy. The signature is split into `bands`
+    bands, and texts sharing a band land in the same bucket; only those candidates are
+    compared, by the exact Jaccard similarity of their n-gram sets, and pairs at or above
+    `threshold` are merged with union-find. Every text is paired with the first member of
+    each of its buckets only, so the number of comparisons grows linearly with the number
+    of texts rather than quadratically.
+
+    Attributes:
+        threshold (float): Minimum Jaccard similarity of two texts' n-grams to merge them
+        n (int): Length of the character n-grams
+        num_perm (int): Number of MinHash permutations
+        bands (int): Number of LSH bands; num_perm must be a multiple of it
+    """
+    def __init__(self, threshold: float = 0.5, n: int = 2, num_perm: int = 120, bands: int = 40,
+                 seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.n = n
+        self.num_perm = num_perm
+        self.bands = bands
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    @classmethod
+    def from_settings(cls, settings):
+        """
+        Build a clusterer from the `text_clustering` section of config.yaml, or return None
+        when the section is missing or disabled.
+        """
+        if not settings or not settings.get("enabled", True):
+            return None
+        return cls(**{key: value for key, value in settings.items() if key != "enabled"})
+
+    def clusters(self, texts) -> list:
+        """
+        Group the distinct `texts` into clusters of near-duplicates.
+
+        Returns:
+            list: One list of texts per cluster, largest cluster first. The first text of a
+                  cluster is its representative: its most frequent member in `texts`, the
+                  first seen among equally frequent ones.
+        """
+        counts = {}
+        for text in texts:
+            text = str(text)
+            counts[text] = counts.get(text, 0) + 1
+
+        # Exact canonical duplicates share one entry; only the canonical forms are hashed
+        keys = {}
+        members = [keys.setdefault(canonical_text(text), len(keys)) for text in counts]
+        canonical = list(keys)
+        gram_sets = [set(char_ngrams(text, self.n)) for text in canonical]
+
+        parent = list(range(len(canonical)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, j in self._candidate_pairs(gram_sets):
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j and self._jaccard(gram_sets[i], gram_sets[j]) >= self.threshold:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+
+        groups = {}
+        for text, key in zip(counts, members):
+            groups.setdefault(find(key), []).append(text)
+        clusters = [sorted(group, key=lambda text: -counts[text]) for group in groups.values()]
+        clusters.sort(key=lambda group: -sum(counts[text] for text in group))
+        return clusters
+
+    def representatives(self, texts) -> dict:
+        """
+        Return a mapping of every distinct text in `texts` to its cluster's representative.
+        """
+        return {text: group[0] for group in self.clusters(texts) for text in group}
+
+    def signatures(self, gram_sets) -> np.ndarray:
+        """
+        Return the (len(gram_sets), num_perm) uint32 MinHash signatures of n-gram sets.
+        Empty sets get the maximum value everywhere.
+        """
+        signatures = np.full((len(gram_sets), self.num_perm), _MERSENNE_PRIME, dtype=np.uint32)
+        # Each distinct n-gram is hashed and permuted once; texts then gather their rows
+        vocabulary = {}
+        ids = np.fromiter(
+            (vocabulary.setdefault(gram, len(vocabulary)) for grams in gram_sets for gram in grams),
+            dtype=np.int64
+        )
+        if not vocabulary:
+            return signatures
+        hashes = np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in vocabulary),
+                             dtype=np.uint64, count=len(vocabulary))
+        permuted = ((hashes[:, None] * self._a + self._b) % _MERSENNE_PRIME).astype(np.uint32)
+
+        lengths = np.fromiter((len(grams) for grams in gram_sets), dtype=np.int64, count=len(gram_sets))
+        ends = np.cumsum(lengths)
+        # A block of texts at a time bounds the gathered (grams, num_perm) matrix
+        block = 4096
+        for start in range(0, len(gram_sets), block):
+            stop = min(start + block, len(gram_sets))
+            present = start + np.flatnonzero(lengths[start:stop])
+            if not len(present):
+                continue
+            first = ends[start] - lengths[start]
+            gathered = permuted[ids[first:ends[stop - 1]]]
+            offsets = ends[present] - lengths[present] - first
+            signatures[present] = np.minimum.reduceat(gathered, offsets, axis=0)
+        return signatures
+
+    def _candidate_pairs(self, gram_sets):
+        """
+        Return the (i, j) index pairs, i < j, of texts sharing at least one LSH bucket.
+        """
+        if len(gram_sets) < 2:
+            return []
+        signatures = self.signatures(gram_sets)
+        empty = np.asarray([not grams for grams in gram_sets])
+        rows = self.num_perm // self.bands
+        pairs = []
+        for band in range(self.bands):
+            # The band's values are mixed into one 64-bit key; a rare collision only adds a
+            # candidate pair, which is then rejected by the exact comparison
+            bucket = np.zeros(len(gram_sets), dtype=np.uint64)
+            for column in signatures[:, band * rows:(band + 1) * rows].T:
+                bucket = (bucket ^ column.astype(np.uint64)) * np.uint64(0x9E3779B97F4A7C15)
+            order = np.argsort(bucket, kind="stable")
+            # Pair every text with the first (lowest-index) text of its bucket
+            starts = np.flatnonzero(np.r_[True, bucket[order][1:] != bucket[order][:-1]])
+            first = np.repeat(order[starts], np.diff(np.r_[starts, len(order)]))
+            keep = (first != order) & ~empty[order]
+            pairs.append(first[keep] * len(gram_sets) + order[keep])
+        pairs = np.unique(np.concatenate(pairs))
+        return zip((pairs // len(gram_sets)).tolist(), (pairs % len(gram_sets)).tolist())
+
+    @staticmethod
+    def _jaccard(a: set, b: set) -> float:
+        if not a or not b:
+            return 0.0
+        intersection = len(a & b)
+        return intersection / (len(a) + len(b) - intersection)
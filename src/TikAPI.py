@@ -1,5 +1,10 @@
-from difflib import SequenceMatcher
+import concurrent.futures
+import threading
+import numpy as np
 from tikapi import TikAPI, ValidationException, ResponseException
+from .Cache import LRUCache
+from .TextSimilarity import NgramVectorizer
+from .RateLimiter import default_limiter
 
 class TikAPIWrapper:
     """
@@ -13,33 +18,75 @@ class TikAPIWrapper:
     Attributes:
         api_key (str): The TikTok API authentication key
         api (TikAPI): The initialized TikAPI client instance
+        verify_workers (int): Candidates verified concurrently by find_matching_song
+        music_cache: Videos fetched per music ID, reused by later fetch_music_videos calls,
+                     and the title/author, search hits and plays seen for each search candidate
+        match_stats (dict): How many tracks were matched from search metadata alone, how many
+                     verification requests were made and how many were saved compared with
+                     checking candidates one by one in search order
+        limiter (ServiceLimiter): Rate limit and retry policy for TikAPI requests
     """
-    def __init__(self, key:str):
+    def __init__(self, key:str, verify_workers:int = 8, music_cache=None, rate_limiter=None):
         """
         Initialize the TikTok API wrapper with the provided API key.
         
         Args:
             key (str): The TikTok API authentication key obtained from tikapi.io
                        Used to authenticate all requests to the TikTok API.
+            verify_workers (int, optional): Maximum number of candidate music IDs verified
+                       at the same time when no executor is supplied.
+            music_cache (optional): LRUCache or SQLiteCache for per-music-ID videos.
+                       Defaults to an in-memory cache with a 15 minute TTL.
+            rate_limiter (ServiceLimiter, optional): Shared "tikapi" limiter; a default one
+                       is created if not given.
                        
         """
         self.api_key = key
         self.api = TikAPI(self.api_key)
+        self.verify_workers = verify_workers
+        self.music_cache = music_cache if music_cache is not None else LRUCache(ttl_seconds=900, max_entries=1024)
+        self.vectorizer = NgramVectorizer()
+        self.limiter = rate_limiter or default_limiter("tikapi")
+        self.match_stats = {"tracks": 0, "resolved_from_search": 0, "verification_calls": 0, "api_calls_saved": 0}
+        self._stats_lock = threading.Lock()
 
     def _similarity(self, a, b):
         """Helper method for fuzzy matching."""
-        return SequenceMatcher(None, a.lower(), b.lower()).ratio()
+        return self.vectorizer.similarity(a, b)
+
+    def rank_candidates(self, user_title, user_artist, music_ids):
+        """
+        Score every candidate's known title and author against the user's song in one
+        vectorized pass.
+
+        Returns:
+            list: (music_id, title_score, author_score) tuples, best first. Candidates whose
+                  search metadata is unknown score 0 and keep their relative order.
+        """
+        music_ids = list(music_ids)
+        if not music_ids:
+            return []
+        metadata = [self.music_cache.get(f"candidate:{music_id}") or {} for music_id in music_ids]
+        title_scores = self.vectorizer.scores(user_title, [meta.get("title", "") for meta in metadata])
+        author_scores = self.vectorizer.scores(user_artist, [meta.get("author", "") for meta in metadata])
+        # Stable sort, so ties keep search order
+        order = np.argsort(-(title_scores + author_scores), kind="stable")
+        return [(music_ids[i], float(title_scores[i]), float(author_scores[i])) for i in order]
 
     def search_music(self, user_title, user_artist, max_results=50, early_stop=True):
         """
         Searches TikTok for the user_title (in the 'general' category).
         Returns either:
           - [best_match_id] if an early-stop match is found,
-          - OR up to max_results music IDs.
+          - OR up to max_results music IDs, ranked by how well their title and
+            author match the user's song.
+        The title/author of each candidate is kept for find_matching_song, and the number
+        of search hits using it and their plays for candidate_presence.
         """
         try:
-            response = self.api.public.search(category="general", query=user_title)
-            music_ids = set()
+            response = self.limiter.call(self.api.public.search, category="general", query=user_title)
+            music_ids = {}
+            candidates = {}
             best_match_id = None
 
             while response and len(music_ids) < max_results:
@@ -61,7 +108,20 @@ class TikAPIWrapper:
                     if not found_music_id:
                         continue
 
-                    music_ids.add(found_music_id)
+                    if found_music_id not in music_ids:
+                        music_ids[found_music_id] = len(music_ids)
+                        candidates[found_music_id] = {
+                            "title": found_title, "author": found_author, "position": music_ids[found_music_id],
+                            "videos": 0, "plays": 0,
+                        }
+                    # Every hit is a video using the sound, which gauges the sound's presence
+                    candidate = candidates[found_music_id]
+                    candidate["videos"] += 1
+                    try:
+                        candidate["plays"] += int((item.get("stats") or {}).get("playCount") or 0)
+                    except (TypeError, ValueError):
+                        pass
+                    self.music_cache.set(f"candidate:{found_music_id}", candidate)
 
                     # If early_stop=True, try an on-the-fly match
                     if early_stop:
@@ -75,19 +135,30 @@ class TikAPIWrapper:
 
                 next_cursor = data.get('nextCursor')
                 if next_cursor:
-                    response = response.next_items()
+                    response = self.limiter.call(response.next_items)
                 else:
                     break
 
-            # Return either the single match or the whole set
+            # Return either the single match or every candidate, best first
             if best_match_id:
                 return [best_match_id]
-            return list(music_ids)
+            return [music_id for music_id, _, _ in self.rank_candidates(user_title, user_artist, music_ids)]
 
         except (ValidationException, ResponseException) as e:
             print(f"API Error searching music: {e}")
             return []
 
+    def candidate_presence(self, music_id):
+        """
+        Return how present a candidate of the last search_music call is on TikTok, from the
+        search results alone (no request is made).
+
+        Returns:
+            dict: {"videos": search hits using the sound, "plays": their total play count}
+        """
+        candidate = self.music_cache.get(f"candidate:{music_id}") or {}
+        return {"videos": candidate.get("videos", 0), "plays": candidate.get("plays", 0)}
+
     def _is_good_enough(self, user_title, user_artist, found_title, found_author):
         """
         Check if the found title & author are 'good enough' to stop searching.
@@ -108,35 +179,128 @@ class TikAPIWrapper:
             return True
         return False
 
-    def find_matching_song(self, user_title, user_artist, music_ids, similarity_threshold=0.7):
+    def find_matching_song(self, user_title, user_artist, music_ids, similarity_threshold=0.7, submit=None):
         """
-        If multiple IDs came back, check each one's 'title'/'author'
-        by fetching some videos for that music ID.
+        If multiple IDs came back, check each one's 'title'/'author'.
+
+        The title/author kept by search_music are scored first; when the best candidate
+        clears the threshold it is returned without any further request. Otherwise
+        candidates are verified by fetching some of their videos, concurrently. Results are
+        taken in ranked order, so the best-ranked matching candidate wins even if a lower
+        ranked one answers first. Once it is known, candidates that have not started yet are
+        cancelled and the ones in flight are ignored.
+
+        Args:
+            submit (callable, optional): submit(fn, *args) -> Future, used to schedule each
+                verification (for example on a shared, rate-limited pool). Defaults to a
+                private pool of `verify_workers` threads.
         """
-        for music_id in music_ids:
-            videos = self.fetch_music_videos(music_id, limit=5)
-            for video in videos:
-                song = video.get("music", {})
-                title = song.get("title", "")
-                author = song.get("authorName", "")
+        ranked = self.rank_candidates(user_title, user_artist, music_ids)
+        if not ranked:
+            print("No exact match found among multiple IDs.")
+            return None
 
-                # If both the title & author are fairly similar to user inputs
-                if (self._similarity(user_title, title) > similarity_threshold and
-                    self._similarity(user_artist, author) > similarity_threshold):
-                    print(f"Match found: {title} by {author}, Music ID: {music_id}")
-                    return music_id
+        best_id, title_score, author_score = ranked[0]
+        if title_score > similarity_threshold and author_score > similarity_threshold:
+            print(f"Match found from search results, Music ID: {best_id}")
+            self._record_match(best_id, len(ranked), verifications=0)
+            return best_id
 
-        print("No exact match found among multiple IDs.")
+        music_ids = [music_id for music_id, _, _ in ranked]
+        verifications = []
+        found = threading.Event()
+        executor = None
+        if submit is None:
+            executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(self.verify_workers, len(music_ids)), thread_name_prefix="tikapi-verify"
+            )
+            submit = executor.submit
+
+        futures = [
+            submit(self._verify_candidate, user_title, user_artist, music_id, similarity_threshold, found, verifications)
+            for music_id in music_ids
+        ]
+        match = None
+        try:
+            for future in futures:
+                try:
+                    match = future.result()
+                except Exception as e:
+                    print(f"Error verifying music candidate: {e}")
+                    continue
+                if match:
+                    found.set()
+                    break
+        finally:
+            for future in futures:
+                future.cancel()
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+        if match is None:
+            print("No exact match found among multiple IDs.")
+        self._record_match(match, len(ranked), verifications=len(verifications))
+        return match
+
+    def _verify_candidate(self, user_title, user_artist, music_id, similarity_threshold, found, verifications):
+        """
+        Fetch a few videos for `music_id` and return it if their music matches the user's
+        title and artist, otherwise None. Skips the request once another candidate matched.
+        """
+        if found.is_set():
+            return None
+        verifications.append(music_id)
+        videos = self.fetch_music_videos(music_id, limit=5)
+        if not videos:
+            return None
+        songs = [video.get("music", {}) for video in videos]
+        title_scores = self.vectorizer.scores(user_title, [song.get("title", "") for song in songs])
+        author_scores = self.vectorizer.scores(user_artist, [song.get("authorName", "") for song in songs])
+
+        # If both the title & author of any video are fairly similar to user inputs
+        matches = np.flatnonzero((title_scores > similarity_threshold) & (author_scores > similarity_threshold))
+        if matches.size:
+            song = songs[matches[0]]
+            print(f"Match found: {song.get('title', '')} by {song.get('authorName', '')}, Music ID: {music_id}")
+            return music_id
         return None
 
+    def _record_match(self, match, candidate_count, verifications):
+        """
+        Update match_stats. The baseline is the old serial walk in search order, which
+        fetched every candidate up to and including the match.
+        """
+        baseline = candidate_count
+        if match is not None:
+            position = (self.music_cache.get(f"candidate:{match}") or {}).get("position")
+            if position is not None:
+                baseline = min(position + 1, candidate_count)
+        saved = baseline - verifications
+        with self._stats_lock:
+            self.match_stats["tracks"] += 1
+            self.match_stats["verification_calls"] += verifications
+            self.match_stats["api_calls_saved"] += saved
+            if match is not None and verifications == 0:
+                self.match_stats["resolved_from_search"] += 1
+        print(f"Candidate verification: {verifications} TikAPI calls, {saved} saved")
+
     def fetch_music_videos(self, music_id, limit=10):
         """
         Retrieves up to 'limit' videos that use the given music_id.
+        Results are cached per music ID, so a later call for the same or a smaller
+        limit (e.g. after find_matching_song verified the ID) needs no API request.
         """
+        cached = self.music_cache.get(f"music:{music_id}")
+        # A cached list serves any limit it covers, or every limit if TikTok had no more videos
+        if cached is not None and (cached["limit"] >= limit or len(cached["videos"]) < cached["limit"]):
+            return cached["videos"][:limit]
+
         try:
-            response = self.api.public.music(id=music_id, count=limit)
+            response = self.limiter.call(self.api.public.music, id=music_id, count=limit)
             if response.status_code == 200:
-                return response.json().get("itemList", [])
+                videos = response.json().get("itemList", [])
+                self.music_cache.set(f"music:{music_id}", {"videos": videos, "limit": limit})
+                return videos
             else:
                 print(f"Music fetch error: HTTP {response.status_code}")
         except (ValidationException, ResponseException) as e:
@@ -149,7 +313,7 @@ class TikAPIWrapper:
         the downloadAddr and headers needed to request it
         """
         try:
-            response = self.api.public.video(id=video_id)
+            response = self.limiter.call(self.api.public.video, id=video_id)
             print(response.json())
             return response.json()
         except (ValidationException, ResponseException) as e:
@@ -0,0 +1,161 @@
+import re
+
+try:
+    import tiktoken
+except ImportError:  # optional, the estimate below is used instead
+    tiktoken = None
+
+# Words, numbers and single punctuation marks; long words are charged per 4 characters,
+# which tracks BPE tokenizers closely enough for budgeting
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def _estimate_tokens(text: str) -> int:
+    return sum(max(1, (len(piece) + 3) // 4) for piece in _TOKEN_PATTERN.findall(text))
+
+
+class TrendCompactor:
+    """
+    Shrinks trend dictionaries before they are turned into an LLM prompt.
+
+    Aggregated trends repeat items once per track and OCR text can be long and noisy, so
+    each category is normalized (whitespace collapsed, long items truncated), deduplicated
+    case-insensitively and ranked by how often the item occurred, i.e. by how many tracks
+    share it. Items are then admitted in rank order until the rendered prompt reaches
+    `max_prompt_tokens`, counted with a local tokenizer (tiktoken when it is installed,
+    otherwise a word/punctuation estimate).
+
+    Attributes:
+        max_prompt_tokens (int or None): Token budget for the rendered prompt (None = unlimited)
+        max_item_chars (int or None): Longest item kept before truncation (None = no truncation)
+        max_items_per_category (int or None): Items kept per category after ranking
+    """
+    def __init__(self, max_prompt_tokens: int = 1500, max_item_chars: int = 80,
+                 max_items_per_category: int = None, model: str = "gpt-3.5-turbo"):
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_item_chars = max_item_chars
+        self.max_items_per_category = max_items_per_category
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(model)
+            except Exception as e:
+                print(f"tiktoken unavailable for {model}, estimating tokens instead: {e}")
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Returns the number of tokens in `text`.
+        """
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        return _estimate_tokens(text)
+
+    def normalize(self, item) -> str:
+        """
+        Collapses whitespace and truncates `item` to `max_item_chars`.
+        """
+        text = " ".join(str(item).split())
+        if self.max_item_chars and len(text) > self.max_item_chars:
+            text = text[:self.max_item_chars - 1].rstrip() + "…"
+        return text
+
+    def compact(self, trends: dict, render=None):
+        """
+        Deduplicates, ranks, truncates and budgets `trends`.
+
+        Args:
+            trends (dict): Category name -> list of items, possibly with repeats
+            render (callable, optional): Turns a trends dictionary into the prompt text whose
+                size is budgeted. Defaults to one "category: items" line per category.
+
+        Returns:
+            tuple: (compacted_trends, report) where report counts items_in, items_out,
+                   duplicates_removed, truncated, dropped and the prompt tokens_before/tokens_after
+        """
+        render = render or self._render
+        report = {"items_in": 0, "items_out": 0, "duplicates_removed": 0,
+                  "truncated": 0, "dropped": 0, "tokens_before": self.count_tokens(render(trends))}
+
+        ranked = {}
+        for category, items in trends.items():
+            counts = {}
+            display = {}
+            for item in items:
+                report["items_in"] += 1
+                text = self.normalize(item)
+                if not text:
+                    report["dropped"] += 1
+                    continue
+                if len(text) < len(" ".join(str(item).split())):
+                    report["truncated"] += 1
+                key = text.casefold()
+                if key in counts:
+                    counts[key] += 1
+                    report["duplicates_removed"] += 1
+                else:
+                    counts[key] = 1
+                    display[key] = text
+            # sorted() is stable, so equally frequent items keep their first-seen order
+            order = sorted(counts, key=lambda key: -counts[key])
+            if self.max_items_per_category is not None:
+                report["dropped"] += len(order[self.max_items_per_category:])
+                order = order[:self.max_items_per_category]
+            ranked[category] = [(display[key], counts[key]) for key in order]
+
+        selected = self._select_within_budget(ranked, render)
+        compacted = {category: [text for text, _ in ranked[category] if (category, text) in selected]
+                     for category in ranked}
+
+        kept = sum(len(items) for items in compacted.values())
+        report["dropped"] += sum(len(items) for items in ranked.values()) - kept
+        report["items_out"] = kept
+        report["tokens_after"] = self.count_tokens(render(compacted))
+        return compacted, report
+
+    def _select_within_budget(self, ranked: dict, render) -> set:
+        """
+        Admits items across all categories by frequency, then rank, until the budget is spent.
+        Returns the set of (category, item) pairs that fit.
+        """
+        candidates = [
+            (-count, rank, index, category, text)
+            for index, (category, items) in enumerate(ranked.items())
+            for rank, (text, count) in enumerate(items)
+        ]
+        candidates.sort()
+        if self.max_prompt_tokens is None:
+            return {(category, text) for *_, category, text in candidates}
+
+        # Greedy pass on per-item estimates, then cut the tail where the real prompt fits
+        remaining = self.max_prompt_tokens - self.count_tokens(render({category: [] for category in ranked}))
+        admitted = []
+        for *_, category, text in candidates:
+            cost = self.count_tokens(text) + 1
+            if cost <= remaining:
+                admitted.append((category, text))
+                remaining -= cost
+
+        def rendered(pairs):
+            chosen = set(pairs)
+            return render({category: [text for text, _ in items if (category, text) in chosen]
+                           for category, items in ranked.items()})
+
+        def fits(length):
+            return self.count_tokens(rendered(admitted[:length])) <= self.max_prompt_tokens
+
+        if fits(len(admitted)):
+            return set(admitted)
+        # The prompt grows with every admitted item, so the longest prefix that fits is
+        # found by bisection: O(log n) tokenizer calls instead of one per dropped item
+        low, high = 0, len(admitted) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if fits(middle):
+                low = middle
+            else:
+                high = middle - 1
+        return set(admitted[:low])
+
+    @staticmethod
+    def _render(trends: dict) -> str:
+        return "\n".join(f"{category}: {', '.join(items)}" for category, items in trends.items())
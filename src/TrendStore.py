@@ -0,0 +1,231 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from .CompareFeatures import CATEGORIES
+
+GLOBAL_SCOPE = "global"
+
+
+class TrendStore:
+    """
+    Persistent, time-decayed frequency tables of the features seen in analyzed videos.
+
+    Every analyzed video is folded in once, incrementing the score of each of its labels,
+    objects and texts in two scopes: its sound ("sound:<music id>") and the global scope.
+    Scores decay exponentially with a configurable half-life, so a feature's score is the
+    number of videos containing it, with recent videos weighing more. Each scope also keeps
+    the decayed number of videos, and a feature's support is its score divided by that.
+
+    Decay is applied lazily: each row stores its score at `updated_at`, and both updates and
+    queries scale it by 0.5 ** (age / half_life). Queries are therefore a single pass over
+    the features of the requested scopes, and cost no API calls.
+
+    Features and scopes whose decayed score fell below `purge_min_score` are purged every
+    `purge_every` add_videos calls, so the store stays bounded by what is still trending.
+
+    Attributes:
+        path (str): Location of the SQLite database file
+        half_life_seconds (float): Time after which a video counts half as much
+        purge_min_score (float): Decayed score below which purge() forgets a feature or scope
+        purge_every (int or None): add_videos calls between automatic purges (None = never)
+    """
+    def __init__(self, path, half_life_days=7.0, purge_min_score=0.01, purge_every=100):
+        """
+        Open (or create) the store.
+
+        Args:
+            path (str): Path to the SQLite file, or ":memory:"
+            half_life_days (float, optional): Half-life of a video's contribution, in days
+            purge_min_score (float, optional): Threshold of the automatic purges
+            purge_every (int, optional): add_videos calls between automatic purges;
+                                         None or 0 disables them
+        """
+        self.path = path
+        self.half_life_seconds = half_life_days * 86400
+        self.purge_min_score = purge_min_score
+        self.purge_every = purge_every
+        self._lock = threading.Lock()
+        self._batches = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.create_function("decay", 1, self._decay, deterministic=True)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS trend_features ("
+                " scope TEXT NOT NULL, category TEXT NOT NULL, feature TEXT NOT NULL,"
+                " score REAL NOT NULL, videos INTEGER NOT NULL, updated_at REAL NOT NULL,"
+                " PRIMARY KEY (scope, category, feature))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS trend_scopes ("
+                " scope TEXT PRIMARY KEY, score REAL NOT NULL, videos INTEGER NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS trend_videos ("
+                " scope TEXT NOT NULL, video_id TEXT NOT NULL, observed_at REAL NOT NULL,"
+                " PRIMARY KEY (scope, video_id))"
+            )
+
+    @staticmethod
+    def sound_scope(sound) -> str:
+        """Return the scope name of a TikTok sound (music ID)."""
+        return f"sound:{sound}"
+
+    def add_video(self, features, sound=None, video_id=None, observed_at=None) -> bool:
+        """
+        Fold one video's features into its sound's scope and the global scope.
+
+        Args:
+            features (dict): "labels", "objects" and "texts" lists, as compared by CompareFeatures
+            sound (str, optional): Music ID of the video's sound
+            video_id (str, optional): If given, a video already folded into a scope is skipped
+            observed_at (float, optional): Unix time of the observation; defaults to now
+
+        Returns:
+            bool: Whether the video was added to at least one scope
+        """
+        now = observed_at if observed_at is not None else time.time()
+        scopes = [GLOBAL_SCOPE] + ([self.sound_scope(sound)] if sound is not None else [])
+        # A feature counts once per video, however often it was detected
+        items = {(category, item) for category in CATEGORIES for item in features.get(category) or []}
+        added = False
+        with self._lock, self._conn:
+            for scope in scopes:
+                if video_id is not None:
+                    inserted = self._conn.execute(
+                        "INSERT OR IGNORE INTO trend_videos (scope, video_id, observed_at) VALUES (?, ?, ?)",
+                        (scope, str(video_id), now)
+                    ).rowcount
+                    if not inserted:
+                        continue
+                added = True
+                self._conn.execute(
+                    "INSERT INTO trend_scopes (scope, score, videos, updated_at) VALUES (?, 1, 1, ?)"
+                    " ON CONFLICT (scope) DO UPDATE SET"
+                    " score = score * decay(excluded.updated_at - updated_at) + 1,"
+                    " videos = videos + 1, updated_at = excluded.updated_at",
+                    (scope, now)
+                )
+                self._conn.executemany(
+                    "INSERT INTO trend_features (scope, category, feature, score, videos, updated_at)"
+                    " VALUES (?, ?, ?, 1, 1, ?)"
+                    " ON CONFLICT (scope, category, feature) DO UPDATE SET"
+                    " score = score * decay(excluded.updated_at - updated_at) + 1,"
+                    " videos = videos + 1, updated_at = excluded.updated_at",
+                    [(scope, category, item, now) for category, item in items]
+                )
+        return added
+
+    def add_videos(self, video_features, sound=None, video_ids=None, observed_at=None) -> int:
+        """
+        Fold several videos of one sound into the store and return how many were new.
+        Every `purge_every` calls, decayed features and scopes are purged.
+        """
+        video_ids = list(video_ids) if video_ids is not None else [None] * len(video_features)
+        added = sum(
+            self.add_video(features, sound=sound, video_id=video_id, observed_at=observed_at)
+            for features, video_id in zip(video_features, video_ids)
+        )
+        with self._lock:
+            self._batches += 1
+            due = bool(self.purge_every) and self._batches % self.purge_every == 0
+        if due:
+            self.purge(self.purge_min_score, now=observed_at)
+        return added
+
+    def video_weight(self, sounds=None, now=None) -> float:
+        """
+        Return the decayed number of videos in the global scope, or in the given sounds' scopes.
+        """
+        scopes = self._scopes(sounds)
+        now = now if now is not None else time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT SUM(score * decay(? - updated_at)) FROM trend_scopes"
+                f" WHERE scope IN ({','.join('?' * len(scopes))})",
+                [now, *scopes]
+            ).fetchone()
+        return row[0] or 0.0
+
+    def trends(self, sounds=None, min_support=0.0, limit=None, now=None) -> dict:
+        """
+        Return the currently trending features.
+
+        Args:
+            sounds (list, optional): Music IDs whose scopes are merged, e.g. all similar
+                                     sounds of a brief. Defaults to the global scope.
+            min_support (float, optional): Minimum decayed fraction of videos containing a feature
+            limit (int, optional): Maximum number of trends per category
+            now (float, optional): Unix time the decay is computed at; defaults to now
+
+        Returns:
+            dict: label_trends, object_trends and text_trends, each a list of
+                  {"feature", "videos", "score", "support"} ranked by score, where videos
+                  is the undecayed number of videos containing the feature
+        """
+        scopes = self._scopes(sounds)
+        now = now if now is not None else time.time()
+        weight = self.video_weight(sounds, now=now)
+        ranked = {key: [] for key in CATEGORIES.values()}
+        if weight <= 0:
+            return ranked
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT category, feature, SUM(score * decay(? - updated_at)) AS decayed, SUM(videos)"
+                f" FROM trend_features WHERE scope IN ({','.join('?' * len(scopes))})"
+                " GROUP BY category, feature HAVING decayed >= ? ORDER BY category, decayed DESC, feature",
+                [now, *scopes, min_support * weight - 1e-9]
+            ).fetchall()
+        for category, feature, score, videos in rows:
+            trends = ranked[CATEGORIES[category]]
+            if limit is None or len(trends) < limit:
+                trends.append({"feature": feature, "videos": videos, "score": score, "support": score / weight})
+        return ranked
+
+    def purge(self, min_score=0.01, now=None) -> int:
+        """
+        Delete features whose decayed score fell below `min_score` and return how many were
+        removed. Scopes below `min_score` (whose features are all gone as well, since no
+        feature outweighs its scope) and video IDs older than ten half-lives, which no
+        longer carry weight, are forgotten too.
+        """
+        now = now if now is not None else time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM trend_features WHERE score * decay(? - updated_at) < ?", (now, min_score)
+            )
+            self._conn.execute(
+                "DELETE FROM trend_scopes WHERE score * decay(? - updated_at) < ?", (now, min_score)
+            )
+            self._conn.execute(
+                "DELETE FROM trend_videos WHERE observed_at < ?", (now - 10 * self.half_life_seconds,)
+            )
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        """Return the number of scopes, features and folded videos."""
+        with self._lock:
+            return {
+                "scopes": self._conn.execute("SELECT COUNT(*) FROM trend_scopes").fetchone()[0],
+                "features": self._conn.execute("SELECT COUNT(*) FROM trend_features").fetchone()[0],
+                "videos": self._conn.execute(
+                    "SELECT COUNT(*) FROM trend_videos WHERE scope = ?", (GLOBAL_SCOPE,)
+                ).fetchone()[0],
+            }
+
+    def _scopes(self, sounds):
+        if sounds is None:
+            return [GLOBAL_SCOPE]
+        if isinstance(sounds, str):
+            sounds = [sounds]
+        return [self.sound_scope(sound) for sound in dict.fromkeys(sounds)]
+
+    def _decay(self, age_seconds):
+        """Weight of an observation `age_seconds` old (clamped so the future never weighs more)."""
+        return math.pow(0.5, max(0.0, age_seconds) / self.half_life_seconds)
@@ -0,0 +1,204 @@
+import asyncio
+import contextlib
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+
+class VideoTranscoder:
+    """
+    Downsamples (and optionally trims) videos with a local ffmpeg process on their way from
+    the TikTok CDN to GCS.
+
+    Video Intelligence time scales with duration and resolution, so analyzing a 360p, 15 fps
+    copy of the first N seconds is much cheaper than analyzing the original. The download is
+    spooled to a temporary file first: MP4s whose moov atom is at the end of the file (common
+    for TikTok downloads) cannot be demuxed from a non-seekable pipe. ffmpeg's output is
+    written to the upload as it is produced; it is fragmented MP4, which can be written to a
+    non-seekable stream.
+
+    The profile name becomes part of the blob name (and with it the annotation cache key),
+    so videos processed with different profiles are never mixed up.
+
+    Attributes:
+        height (int): Output height in pixels; the width keeps the aspect ratio
+        fps (int or None): Output frame rate (None keeps the source rate)
+        max_seconds (float or None): Only the first `max_seconds` are kept (None = whole video)
+        crf (int): x264 constant rate factor; higher is smaller and lower quality
+        keep_audio (bool): Whether the audio track is kept (no analyzed feature uses it)
+        name (str): Profile name used in blob names
+        spool_dir (str or None): Directory for the spooled downloads (None = system temp dir)
+    """
+    def __init__(self, height=360, fps=15, max_seconds=None, crf=30, preset="veryfast",
+                 keep_audio=False, ffmpeg_path="ffmpeg", name=None, spool_dir=None):
+        self.height = height
+        self.fps = fps
+        self.max_seconds = max_seconds
+        self.crf = crf
+        self.preset = preset
+        self.keep_audio = keep_audio
+        self.ffmpeg_path = ffmpeg_path
+        self.spool_dir = spool_dir
+        self.name = name or self._profile_name()
+
+    @classmethod
+    def from_settings(cls, settings):
+        """
+        Build a transcoder from the `pipeline.transcode` section of config.yaml.
+
+        Returns:
+            VideoTranscoder or None: None if the section is missing or disabled, or if
+                                     ffmpeg cannot be found (videos are then uploaded as is)
+        """
+        settings = dict(settings or {})
+        if not settings.pop('enabled', False):
+            return None
+        transcoder = cls(**settings)
+        if not transcoder.available():
+            print(f"ffmpeg not found at '{transcoder.ffmpeg_path}', uploading videos without transcoding")
+            return None
+        return transcoder
+
+    def available(self):
+        """Whether the ffmpeg executable can be found."""
+        return shutil.which(self.ffmpeg_path) is not None
+
+    def command(self, source):
+        """Return the ffmpeg command line, reading the file `source` and writing to stdout."""
+        filters = [f"scale=-2:{self.height}"]
+        if self.fps:
+            filters.append(f"fps={self.fps}")
+        command = [self.ffmpeg_path, "-hide_banner", "-loglevel", "error", "-i", source]
+        if self.max_seconds:
+            command += ["-t", str(self.max_seconds)]
+        command += ["-vf", ",".join(filters), "-c:v", "libx264", "-preset", self.preset, "-crf", str(self.crf)]
+        command += ["-c:a", "aac", "-b:a", "64k"] if self.keep_audio else ["-an"]
+        command += ["-movflags", "frag_keyframe+empty_moov", "-f", "mp4", "pipe:1"]
+        return command
+
+    @contextlib.contextmanager
+    def spool(self, chunks):
+        """
+        Write a stream of bytes to a temporary file and yield its path.
+        The file is removed when the block exits.
+
+        Args:
+            chunks (iterable): Source video chunks, e.g. resp.iter_content(...)
+        """
+        fd, path = tempfile.mkstemp(prefix="transcode-", suffix=".mp4", dir=self.spool_dir)
+        try:
+            with os.fdopen(fd, "wb") as spooled:
+                for chunk in chunks:
+                    if chunk:
+                        spooled.write(chunk)
+            yield path
+        finally:
+            self._remove(path)
+
+    @contextlib.asynccontextmanager
+    async def aspool(self, chunks):
+        """
+        Async counterpart of spool().
+
+        Args:
+            chunks (async iterable): Source video chunks, e.g. resp.aiter_bytes(...)
+        """
+        fd, path = tempfile.mkstemp(prefix="transcode-", suffix=".mp4", dir=self.spool_dir)
+        try:
+            with os.fdopen(fd, "wb") as spooled:
+                async for chunk in chunks:
+                    if chunk:
+                        await asyncio.to_thread(spooled.write, chunk)
+            yield path
+        finally:
+            self._remove(path)
+
+    def transcode_file(self, source, write, chunk_size=256 * 1024):
+        """
+        Transcode the video file `source`, passing the output to `write` as it is produced.
+
+        Args:
+            source (str): Path of the input video, e.g. one yielded by spool()
+            write (callable): Called with each output chunk
+            chunk_size (int, optional): Size of the output reads
+
+        Returns:
+            int: The number of output bytes written
+
+        Raises:
+            RuntimeError: If ffmpeg fails; the output written so far must then be discarded
+        """
+        process = subprocess.Popen(
+            self.command(source), stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        stderr = []
+        drainer = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+        drainer.start()
+
+        written = 0
+        try:
+            while True:
+                data = process.stdout.read(chunk_size)
+                if not data:
+                    break
+                write(data)
+                written += len(data)
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            returncode = process.wait()
+            drainer.join()
+
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg exited with {returncode}: {self._stderr_tail(stderr)}")
+        return written
+
+    async def atranscode_file(self, source, write, chunk_size=256 * 1024):
+        """Async counterpart of transcode_file(); `write` is awaited with each output chunk."""
+        process = await asyncio.create_subprocess_exec(
+            *self.command(source), stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        drainer = asyncio.create_task(process.stderr.read())
+        written = 0
+        try:
+            while True:
+                data = await process.stdout.read(chunk_size)
+                if not data:
+                    break
+                await write(data)
+                written += len(data)
+        except BaseException:
+            if process.returncode is None:
+                process.kill()
+            raise
+        finally:
+            returncode = await process.wait()
+            stderr = await drainer
+
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg exited with {returncode}: {self._stderr_tail([stderr])}")
+        return written
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"Could not remove spooled video {path}: {e}")
+
+    def _profile_name(self):
+        name = f"{self.height}p"
+        if self.fps:
+            name += f"{self.fps}"
+        if self.max_seconds:
+            name += f"_{self.max_seconds:g}s"
+        return f"{name}_crf{self.crf}" + ("_audio" if self.keep_audio else "")
+
+    @staticmethod
+    def _stderr_tail(parts):
+        text = b"".join(part for part in parts if part).decode("utf-8", "replace").strip()
+        return text[-500:] or "no error output"
@@ -1,15 +1,106 @@
-from .GoogleVideoAnalyzer import GoogleVideoAnalyzer
-from .LastfmAPI import LastfmAPI
-from .TikAPI import TikAPIWrapper
-from .GoogleCloud import GCSVideoUploader
 from .CompareFeatures import CompareFeatures
-from .OpenAITrend import OpenAITrendSummarizer
+from .Cache import SQLiteCache, LRUCache
+from .Scheduler import PipelineScheduler
+from .MusicIndex import MusicIDIndex
+from .RateLimiter import RateLimiterRegistry
+from .VideoTranscoder import VideoTranscoder
+from .TrendStore import TrendStore
+from .TextSimilarity import TextClusterer
 import concurrent.futures
+import math
+import threading
+
+
+def emit_event(on_event, event: str, **data):
+    """
+    Deliver a pipeline milestone to an `on_event(event, data)` hook, if one was given.
+    Errors raised by the hook are printed and never interrupt the pipeline.
+    """
+    if on_event is None:
+        return
+    try:
+        on_event(event, data)
+    except Exception as e:
+        print(f"Event hook failed for '{event}': {e}")
+
+
+# Similar tracks fetched from Last.fm, tracks sent through upload and analysis, and
+# videos using a candidate's sound (search hits, or its first page) that count as full presence
+DEFAULT_EXPANSION = {"candidates": 10, "track_budget": 3, "probe_videos": 10}
+
+
+def candidate_score(match, videos, plays, probe_videos) -> float:
+    """
+    Score a similar track for the expensive stages of the pipeline.
+
+    Last.fm's match (0..1) and the sound's TikTok popularity (log10 of the total plays of
+    its probed videos, where a billion plays counts as 1) are averaged, then scaled by the
+    fraction of `probe_videos` that exist. Tracks without videos score 0.
+    """
+    if not videos:
+        return 0.0
+    presence = min(1.0, videos / max(1, probe_videos))
+    popularity = min(1.0, math.log10(1 + max(0, plays)) / 9)
+    return presence * ((match or 0.0) + popularity) / 2
+
+
+def track_event_hook(on_event, song: str, artist: str):
+    """
+    Wrap `on_event` so that every event it receives is tagged with the track's song and artist.
+    """
+    if on_event is None:
+        return None
+    return lambda event, data: on_event(event, {"song": song, "artist": artist, **data})
+
+
+class lazy_client:
+    """
+    Decorator for a method that builds one of a finder's API clients. The client is
+    built on first access (so its SDK is only imported then) and stored on the
+    instance, so later accesses are plain attribute lookups. Assigning the attribute
+    replaces the client without building it.
+    """
+    def __init__(self, build):
+        self.build = build
+        self.name = build.__name__
+        self.__doc__ = build.__doc__
+        self._lock = threading.Lock()
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        # Concurrent first accesses (e.g. from scheduler workers) build a single client
+        with self._lock:
+            if self.name not in instance.__dict__:
+                instance.__dict__[self.name] = self.build(instance)
+        return instance.__dict__[self.name]
+
+    @staticmethod
+    def is_built(instance, name) -> bool:
+        """Return whether the client `name` of `instance` has been built (or assigned)."""
+        return name in instance.__dict__
 
 
 class ViralMusicFinder:
     def __init__(self, music_key:str, music_secret:str, LLM_key:str, 
-                 tiktok_key:str, google_json:str, bucket_name:str):
+                 tiktok_key:str, google_json:str, bucket_name:str,
+                 annotation_cache:SQLiteCache = None,
+                 summary_cache = None,
+                 scheduler:PipelineScheduler = None,
+                 summary_mode:str = "concurrent",
+                 prompt_budget:dict = None,
+                 music_index:MusicIDIndex = None,
+                 rate_limits:dict = None,
+                 http_timeouts:dict = None,
+                 transcode:dict = None,
+                 analysis:dict = None,
+                 trend_store:TrendStore = None,
+                 text_clustering:dict = None,
+                 lastfm:dict = None,
+                 expansion:dict = None):
 
         self.music_key = music_key
         self.music_secret = music_secret
@@ -18,19 +109,109 @@ class ViralMusicFinder:
         self.google_json = google_json
         self.bucket_name = bucket_name
 
-        self.music_api = LastfmAPI(music_key, music_secret)
-        self.tiktok_api = TikAPIWrapper(key=self.tiktok_key)
-        self.Uploader = GCSVideoUploader(self.google_json, bucket_name=self.bucket_name)
-        self.Analyzer = GoogleVideoAnalyzer()  # multi-threaded analysis
-        self.Comparator = CompareFeatures(threshold=0.5)
-        self.Summarizer = OpenAITrendSummarizer(api_key=LLM_key, model="gpt-3.5-turbo")
+        # Token buckets and retry policies shared by every client talking to the same service
+        self.rate_limiters = RateLimiterRegistry(rate_limits)
+        # One bounded scheduler shared by every brief this finder processes
+        self.scheduler = scheduler or PipelineScheduler()
+
+        # music_api, tiktok_api, Uploader, Analyzer and Summarizer are built on first use
+        # from these options, so starting the app imports none of their SDKs
+        self._client_options = {
+            "annotation_cache": annotation_cache, "summary_cache": summary_cache, "prompt_budget": prompt_budget,
+            "http_timeouts": http_timeouts, "transcode": transcode, "analysis": analysis, "lastfm": lastfm,
+        }
+        # Every analyzed video is folded into the trend store (if any), and trends are then
+        # queried from its time-decayed per-sound tables instead of the few videos at hand
+        self.trend_store = trend_store
+        # Near-duplicate OCR texts ("@user", "@usr", "user") are merged into one feature
+        self.Comparator = CompareFeatures(
+            threshold=0.5, store=trend_store, text_clusterer=TextClusterer.from_settings(text_clustering)
+        )
+        # "concurrent": one summary call per track, started as soon as that track is done
+        # "batched": a single JSON completion for all tracks and the overall brief
+        self.summary_mode = summary_mode
+        # Persistent song/artist -> TikTok music ID resolutions, consulted before any search
+        self.music_index = music_index
+        # How many similar tracks are probed and how many get the full upload/analysis
+        self.expansion = {**DEFAULT_EXPANSION, **(expansion or {})}
+
+    @lazy_client
+    def music_api(self):
+        """Last.fm client; `lastfm` holds the lookup cache and its per-method TTLs."""
+        from .LastfmAPI import LastfmAPI
+        return LastfmAPI(self.music_key, self.music_secret, rate_limiter=self.rate_limiters.get("lastfm"),
+                         **(self._client_options["lastfm"] or {}))
+
+    @lazy_client
+    def tiktok_api(self):
+        """TikAPI client."""
+        from .TikAPI import TikAPIWrapper
+        return TikAPIWrapper(key=self.tiktok_key, rate_limiter=self.rate_limiters.get("tikapi"))
+
+    @lazy_client
+    def Uploader(self):
+        """GCS uploader with one pooled download connection per concurrent GCS transfer."""
+        from .GoogleCloud import GCSVideoUploader
+        return GCSVideoUploader(
+            self.google_json, bucket_name=self.bucket_name, rate_limiter=self.rate_limiters.get("gcs"),
+            pool_size=self.scheduler.limits["gcs"],
+            transcoder=VideoTranscoder.from_settings(self._client_options["transcode"]),
+            **(self._client_options["http_timeouts"] or {})
+        )
+
+    @lazy_client
+    def Analyzer(self):
+        """Multi-threaded Video Intelligence analyzer; `analysis` selects the default feature profile."""
+        from .GoogleVideoAnalyzer import GoogleVideoAnalyzer
+        return GoogleVideoAnalyzer(
+            cache=self._client_options["annotation_cache"], rate_limiter=self.rate_limiters.get("video_intelligence"),
+            **(self._client_options["analysis"] or {})
+        )
+
+    @lazy_client
+    def Summarizer(self):
+        """OpenAI summarizer; trends are deduplicated and trimmed to a token budget before each prompt."""
+        from .OpenAITrend import OpenAITrendSummarizer
+        from .TrendCompactor import TrendCompactor
+        return OpenAITrendSummarizer(
+            api_key=self.LLM_key, model="gpt-3.5-turbo", cache=self._client_options["summary_cache"],
+            compactor=TrendCompactor(**(self._client_options["prompt_budget"] or {})),
+            rate_limiter=self.rate_limiters.get("openai")
+        )
 
-    def find_tiktoks(self, song: str = None, artist: str = None) -> list:
+    def find_tiktoks(self, song: str = None, artist: str = None, on_event=None,
+                     summary_mode: str = None, feature_profile: str = None,
+                     track_budget: int = None, candidates: int = None) -> list:
+        """
+        Generate a brief for `song` by `artist` from the TikTok trends of similar tracks.
+
+        Args:
+            song (str): The input song
+            artist (str): The input song's artist
+            on_event (callable, optional): Hook called as on_event(event, data) at each
+                pipeline milestone: similar_tracks, tiktok_match, video_uploaded,
+                analysis_done, summary_token, track_summary and summary.
+            summary_mode (str, optional): "concurrent" or "batched"; overrides the
+                finder's default for this request.
+            feature_profile (str, optional): Video Intelligence feature profile ("fast",
+                "standard", "full", ...); overrides the analyzer's default for this request.
+            track_budget (int, optional): How many of the best-ranked similar tracks are
+                uploaded and analyzed; overrides expansion["track_budget"].
+            candidates (int, optional): How many similar tracks are fetched from Last.fm and
+                probed on TikTok; overrides expansion["candidates"].
+
+        Returns:
+            list: The lines of the brief
+        """
         # Initialize an empty list to hold each line of the output
         output_lines = []
 
-        # 1. Get similar tracks from Last.fm
-        similar_tracks = self.music_api.get_similar_tracks(song=song, artist=artist, limit=3)
+        track_budget, candidates = self._expansion_limits(self.expansion, track_budget, candidates)
+
+        # 1. Get similar tracks from Last.fm, with their match scores
+        similar_tracks = self.scheduler.call(
+            "lastfm", self.music_api.get_similar_tracks_scored, song=song, artist=artist, limit=candidates
+        )
         if not similar_tracks:
             print("No similar tracks found...")
             return [
@@ -38,46 +219,65 @@ class ViralMusicFinder:
                 f"no similar tracks found for {song} by {artist}"
             ]
 
-        output_lines.append(f"Found {len(similar_tracks)} similar tracks.")
+        emit_event(on_event, "similar_tracks", tracks=[[title, track_artist] for title, track_artist, _ in similar_tracks])
+
+        summary_mode = summary_mode or self.summary_mode
+        if summary_mode not in ("concurrent", "batched"):
+            raise ValueError(f"Unknown summary mode '{summary_mode}', expected 'concurrent' or 'batched'")
+        if feature_profile is not None and feature_profile not in self.Analyzer.profiles:
+            raise ValueError(f"Unknown feature profile '{feature_profile}', "
+                             f"expected one of {sorted(self.Analyzer.profiles)}")
+
+        # 2. Probe every candidate's TikTok presence cheaply and keep the best `track_budget`
+        ranked, failures = self.rank_similar_tracks(similar_tracks, on_event=on_event)
+        selected = {(track["song"], track["artist"]): track for track in ranked[:track_budget]}
+        output_lines.extend(self._selection_lines(similar_tracks, selected))
+        for track_info, exc in failures:
+            error_line = f"Track {track_info} generated an exception: {exc}"
+            print(error_line)
+            output_lines.append(error_line)
 
-        # Process each similar track concurrently
+        # Process each selected track concurrently, collecting results as each finishes.
+        # Summaries run outside the tracks' upload/analysis path, on the OpenAI limit.
         results = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=len(similar_tracks)) as executor:
-            future_to_track = {
-                executor.submit(self.process_similar_track, track_song, track_artist): (track_song, track_artist)
-                for track_song, track_artist in similar_tracks
-            }
-        for future in concurrent.futures.as_completed(future_to_track):
-            track_info = future_to_track[future]
-            try:
-                result = future.result()
-                if result:
-                    results.append(result)
-            except Exception as exc:
+        summary_futures = []
+        for track_info, result, exc in self.iter_track_results(list(selected), on_event=on_event, summarize=False,
+                                                               feature_profile=feature_profile,
+                                                               probes=selected):
+            if exc is not None:
                 error_line = f"Track {track_info} generated an exception: {exc}"
                 print(error_line)
                 output_lines.append(error_line)
-
-        # Append summaries for each track
-        for res in results:
-            header = f"=== Summary for '{res['song']}' by {res['artist']} ==="
-            output_lines.append(header)
-            # Assuming res['summary'] is a string that may contain multiple lines,
-            # split them so each line is a separate element.
-            summary_lines = res['summary'].splitlines()
-            output_lines.extend(summary_lines)
+            elif result:
+                results.append(result)
+                if summary_mode == "concurrent":
+                    summary_futures.append(self._submit_track_summary(result, on_event))
 
         # Aggregate trends from all similar tracks
-        aggregated_trends = {}
-        for res in results:
-            trends = res.get("trends")
-            if trends:
-                for key, items in trends.items():
-                    aggregated_trends.setdefault(key, []).extend(items)
+        aggregated_trends = self._aggregate_trends(results, self.Comparator)
+
+        overall_summary = None
+        if summary_mode == "batched" and results:
+            overall_summary = self._summarize_batch(results, aggregated_trends, on_event)
+            if overall_summary is None:
+                print("Falling back to one summary call per track.")
+                summary_futures = [self._submit_track_summary(res, on_event) for res in results]
+
+        overall_future = None
+        if overall_summary is None and aggregated_trends:
+            overall_future = self._submit_summary(aggregated_trends, on_event)
+
+        for future in summary_futures:
+            future.result()
+
+        # Append summaries for each track
+        output_lines.extend(self._summary_lines(results))
 
         # Summarize trends if available
         if aggregated_trends:
-            overall_summary = self.Summarizer.summarize_trends(aggregated_trends)
+            if overall_future is not None:
+                overall_summary = overall_future.result()
+            emit_event(on_event, "summary", summary=overall_summary)
             output_lines.append(overall_summary)
         else:
             output_lines.append("No trends available")
@@ -85,29 +285,109 @@ class ViralMusicFinder:
         return output_lines
 
 
-    def process_similar_track(self, song: str, artist: str, video_limit=4):
+    def rank_similar_tracks(self, similar_tracks, probe_videos: int = None, on_event=None) -> tuple:
+        """
+        Rank similar tracks by how much a full upload and analysis is worth.
+
+        Each track is probed with at most one TikAPI request, on the track pool under the
+        TikAPI limit (see _probe_track). Candidates are not verified here; only the tracks
+        selected afterwards pay for verification, reusing the probe's search results.
+
+        Args:
+            similar_tracks (list): (song, artist, match) tuples from Last.fm
+            probe_videos (int, optional): Videos fetched per sound; defaults to expansion["probe_videos"]
+            on_event (callable, optional): Receives a track_candidates event with the ranking
+
+        Returns:
+            tuple: (ranked, failures) where ranked lists {"song", "artist", "match", "music_id",
+                   "music_list", "videos", "plays", "score"} for every track with a TikTok sound
+                   and videos, best first, and failures lists ((song, artist), exception) of
+                   failed probes. music_list is None when music_id is already verified (indexed),
+                   otherwise it holds the search results music_id was ranked first in.
         """
-         Search for the song on TikTok.
+        probe_videos = probe_videos or self.expansion["probe_videos"]
+        futures = [
+            self.scheduler.submit_track(self._probe_track, title, track_artist, match, probe_videos)
+            for title, track_artist, match in similar_tracks
+        ]
+        probed, failures = [], []
+        for (title, track_artist, _), future in zip(similar_tracks, futures):
+            try:
+                probed.append(future.result())
+            except Exception as exc:
+                failures.append(((title, track_artist), exc))
+
+        ranked = sorted((track for track in probed if track["music_id"] and track["videos"]),
+                        key=lambda track: -track["score"])
+        for track in ranked:
+            print(f"Candidate '{track['song']}' by {track['artist']}: score {track['score']:.2f} "
+                  f"(match {track['match']:.2f}, {track['videos']} videos, {track['plays']} plays)")
+        emit_event(on_event, "track_candidates", candidates=ranked)
+        return ranked, failures
+
+    def iter_track_results(self, similar_tracks, on_event=None, summarize=True, feature_profile=None,
+                           probes=None):
+        """
+        Process similar tracks on the shared scheduler and yield each one as soon as it is done.
+
+        Args:
+            similar_tracks (list): (song, artist) tuples
+            on_event (callable, optional): Pipeline event hook, see find_tiktoks
+            summarize (bool, optional): Whether each track also summarizes its own trends
+            feature_profile (str, optional): Feature profile for the video analyses
+            probes (dict, optional): (song, artist) -> probe from rank_similar_tracks, whose
+                verified music ID or search results are reused
+
+        Yields:
+            tuple: (track_info, result, exception) where exactly one of result/exception
+                   is meaningful; result may be None when the track produced no trends.
+        """
+        future_to_track = {
+            self.scheduler.submit_track(
+                self.process_similar_track, track_song, track_artist,
+                on_event=on_event, summarize=summarize, feature_profile=feature_profile,
+                **self._probe_resolution((probes or {}).get((track_song, track_artist)))
+            ): (track_song, track_artist)
+            for track_song, track_artist in similar_tracks
+        }
+        for future in concurrent.futures.as_completed(future_to_track):
+            track_info = future_to_track[future]
+            try:
+                yield track_info, future.result(), None
+            except Exception as exc:
+                yield track_info, None, exc
+
+    def process_similar_track(self, song: str, artist: str, video_limit=4, on_event=None, summarize=True,
+                              feature_profile=None, music_id=None, music_list=None):
+        """
+         Search for the song on TikTok (unless its `music_id` is already known) and verify
+         the match (among `music_list`, when the search was already made).
          Fetch its videos.
-         Analyze and compare video features.
-         Generate a trend summary for the track.
+         Analyze and compare video features (with `feature_profile`, if given).
+         Generate a trend summary for the track (skipped, leaving "summary" as None,
+         when `summarize` is False).
+         Milestones are reported to `on_event`, tagged with the song and artist.
         """
         print(f"\nProcessing similar track: '{song}' by {artist}")
+        on_event = track_event_hook(on_event, song, artist)
         # 1. Search music on TikTok & find a matching track
-        music_list = self.tiktok_api.search_music(song, artist)
-        matched_song = self.tiktok_api.find_matching_song(song, artist, music_list)
+        matched_song = music_id or self._resolve_music_id(song, artist, music_list=music_list)
         if not matched_song:
             print(f"No matching song found on TikTok for '{song}' by {artist}.")
             return None
+        emit_event(on_event, "tiktok_match", music_id=matched_song)
 
         # 2. Fetch top TikTok videos for this track
-        music_videos = self.tiktok_api.fetch_music_videos(matched_song, limit=3)
+        music_videos = self.scheduler.call("tikapi", self.tiktok_api.fetch_music_videos, matched_song, limit=3)
         if not music_videos:
             print(f"No videos found for '{song}' by {artist}.")
             return None
 
         # 3. Analyze and process the videos for this track
-        trends, summary = self.analyze_and_process_videos_for_track(music_videos, n=video_limit)
+        trends, summary = self.analyze_and_process_videos_for_track(
+            music_videos, n=video_limit, on_event=on_event, summarize=summarize,
+            feature_profile=feature_profile, sound=matched_song
+        )
         if not trends:
             print(f"Could not detect trends for '{song}' by {artist}.")
             return None
@@ -115,57 +395,273 @@ class ViralMusicFinder:
         return {
             "song": song,
             "artist": artist,
+            "music_id": matched_song,
             "trends": trends,
             "summary": summary
         }
 
-    def analyze_and_process_videos_for_track(self, videos, n=4):
+    def analyze_and_process_videos_for_track(self, videos, n=4, on_event=None, summarize=True,
+                                             feature_profile=None, sound=None):
         """
-        Multithread the upload of up to `n` TikTok videos.
+        Upload up to `n` TikTok videos through the shared scheduler.
         Collect GCS URIs.
-        Analyze the videos
+        Analyze the videos with `feature_profile` (the analyzer's default if None).
         Process the analysis into feature dictionaries.
-        Compare features to detect trends and summarize with OpenAI.
-        Returns tuple (trends, summary).
+        Compare features to detect trends and summarize with OpenAI. With a trend store and
+        the track's `sound` (music ID), the videos are folded into the store and the trends
+        come from the sound's rolling history.
+        Reports video_uploaded, analysis_done and track_summary events to `on_event`.
+        Returns tuple (trends, summary); summary is None when `summarize` is False.
         """
         if not videos:
             print("No videos found for analysis.")
             return None, None
 
-        gcs_uris = []
-
-        def process_video_upload(video):
-            video_id = video.get("id")
-            if not video_id:
-                print("Video missing ID, skipping.")
-                return None
-            print(f"Uploading Video (ID: {video_id})")
-            video_json = self.tiktok_api.get_video_metadata(video_id)
-            if not video_json:
-                print(f"No metadata found for video {video_id}.")
-                return None
-            gcs_url = self.Uploader.upload_tiktok_video_direct(video_json)
-            if not gcs_url:
-                print(f"Unable to upload video {video_id} to GCS.")
-                return None
-            return gcs_url
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=n) as executor:
-            future_to_video = {
-                executor.submit(process_video_upload, video): video for video in videos[:n]
-            }
-            for future in concurrent.futures.as_completed(future_to_video):
-                gcs_url = future.result()
-                if gcs_url:
-                    gcs_uris.append(gcs_url)
+        gcs_uris = self._upload_videos(videos[:n], on_event=on_event)
 
         if not gcs_uris:
             print("No GCS URIs to analyze.")
             return None, None
 
 
-        batch_results = self.Analyzer.analyze_videos_in_batch(video_uris=gcs_uris, timeout=600)
+        batch_results = self.Analyzer.analyze_videos_in_batch(
+            video_uris=gcs_uris, timeout=600, scheduler=self.scheduler,
+            on_result=lambda result: emit_event(on_event, "analysis_done", video_uri=result["video_uri"]),
+            profile=feature_profile
+        )
 
+        video_features = self._video_features(batch_results)
+
+        if len(video_features) > 1:
+            sounds = self._record_trends(self.trend_store, self.Comparator, batch_results, video_features, sound)
+            trends = self._detect_trends(self.Comparator, video_features, sounds)
+            if not summarize:
+                return trends, None
+            summary = self._submit_summary(trends, on_event).result()
+            emit_event(on_event, "track_summary", summary=summary)
+            return trends, summary
+        else:
+            print("Only 1 or0 videos processed; skipping trend comparison.")
+            return None, None
+
+    def throttle_stats(self) -> dict:
+        """
+        Return the rate limiting and retry counters of every external service.
+        """
+        return self.rate_limiters.stats()
+
+    def analysis_stats(self) -> dict:
+        """
+        Return the video analysis latency and estimated cost per feature profile
+        (empty until the analyzer has been used).
+        """
+        if not lazy_client.is_built(self, "Analyzer"):
+            return {}
+        return self.Analyzer.profile_stats()
+
+    def lastfm_stats(self) -> dict:
+        """
+        Return the Last.fm cache and coalescing counters (empty until Last.fm has been used).
+        """
+        if not lazy_client.is_built(self, "music_api"):
+            return {}
+        return self.music_api.cache_stats()
+
+    @staticmethod
+    def _expansion_limits(expansion, track_budget=None, candidates=None):
+        """
+        Return the (track_budget, candidates) of a request, falling back to the finder's
+        `expansion` settings. At least `track_budget` candidates are always fetched.
+
+        Raises:
+            ValueError: If either is below 1
+        """
+        track_budget = track_budget if track_budget is not None else expansion["track_budget"]
+        candidates = candidates if candidates is not None else expansion["candidates"]
+        if track_budget < 1 or candidates < 1:
+            raise ValueError(f"track_budget and candidates must be at least 1, got {track_budget} and {candidates}")
+        return track_budget, max(candidates, track_budget)
+
+    def _probe_track(self, song, artist, match, probe_videos):
+        """
+        Gauge a similar track's TikTok presence with at most one TikAPI request.
+
+        A track in the music index fetches the first page of its sound's videos (reused by
+        the processing stage if it is selected). Any other track is searched once and scored
+        from the search hits on its best-ranked candidate, which is left unverified.
+        Returns the candidate dictionary ranked by rank_similar_tracks.
+        """
+        if self.music_index is not None:
+            entry = self.music_index.lookup(song, artist)
+            if entry is not None:
+                videos = []
+                if entry["music_id"]:
+                    videos = self.scheduler.call(
+                        "tikapi", self.tiktok_api.fetch_music_videos, entry["music_id"], limit=probe_videos
+                    )
+                return self._candidate(song, artist, match, entry["music_id"], None,
+                                       *self._page_presence(videos), probe_videos)
+
+        music_list = self.scheduler.call("tikapi", self.tiktok_api.search_music, song, artist)
+        return self._search_candidate(self.tiktok_api, song, artist, match, music_list, probe_videos)
+
+    @staticmethod
+    def _search_candidate(tiktok_api, song, artist, match, music_list, probe_videos):
+        """Build the candidate dictionary of a searched track from its best search result."""
+        if not music_list:
+            return ViralMusicFinder._candidate(song, artist, match, None, music_list, 0, 0, probe_videos)
+        presence = tiktok_api.candidate_presence(music_list[0])
+        return ViralMusicFinder._candidate(song, artist, match, music_list[0], music_list,
+                                           presence["videos"], presence["plays"], probe_videos)
+
+    @staticmethod
+    def _page_presence(videos):
+        """Return the (video count, total plays) of a page of a sound's videos."""
+        videos = videos or []
+        plays = 0
+        for video in videos:
+            try:
+                plays += int((video.get("stats") or {}).get("playCount") or 0)
+            except (TypeError, ValueError):
+                pass
+        return len(videos), plays
+
+    @staticmethod
+    def _candidate(song, artist, match, music_id, music_list, videos, plays, probe_videos):
+        """Summarize a probed track: its sound, video count, total plays and candidate_score."""
+        return {
+            "song": song,
+            "artist": artist,
+            "match": match,
+            "music_id": music_id,
+            "music_list": music_list,
+            "videos": videos,
+            "plays": plays,
+            "score": candidate_score(match, videos, plays, probe_videos),
+        }
+
+    @staticmethod
+    def _probe_resolution(probe):
+        """
+        Return the process_similar_track arguments that reuse a probe: its music ID when it
+        is verified, otherwise the search results to verify.
+        """
+        if probe is None:
+            return {}
+        if probe["music_list"] is None:
+            return {"music_id": probe["music_id"]}
+        return {"music_list": probe["music_list"]}
+
+    def _resolve_music_id(self, song, artist, music_list=None):
+        """
+        Return the TikTok music ID for `song` by `artist`, or None if there is no match.
+        The music index is consulted first; fresh resolutions (and "no match" results for
+        searches that did return candidates) are recorded in it. When the search results
+        `music_list` are given (by a probe), both the index and the search are skipped.
+        """
+        if music_list is None and self.music_index is not None:
+            entry = self.music_index.lookup(song, artist)
+            if entry is not None:
+                print(f"Music ID for '{song}' by {artist} found in index: {entry['music_id']}")
+                return entry["music_id"]
+
+        if music_list is None:
+            music_list = self.scheduler.call("tikapi", self.tiktok_api.search_music, song, artist)
+        # Candidates are verified in parallel, each verification under the TikAPI limit
+        matched_song = self.tiktok_api.find_matching_song(
+            song, artist, music_list,
+            submit=lambda fn, *args: self.scheduler.submit("tikapi", fn, *args)
+        )
+        # An empty search may be an API error, so only searches with candidates are cached
+        if self.music_index is not None and (matched_song or music_list):
+            self.music_index.record(song, artist, matched_song)
+        return matched_song
+
+    def _submit_summary(self, trends, on_event=None):
+        """
+        Submit a summary call under the OpenAI limit, streaming tokens to `on_event` when it is set.
+        Returns a future resolving to the summary.
+        """
+        if on_event is None:
+            return self.scheduler.submit("openai", self.Summarizer.summarize_trends, trends)
+        return self.scheduler.submit(
+            "openai", self.Summarizer.summarize_trends, trends,
+            on_token=lambda token: emit_event(on_event, "summary_token", token=token)
+        )
+
+    def _submit_track_summary(self, result, on_event=None):
+        """
+        Start summarizing one finished track. The summary is stored in result["summary"]
+        and a track_summary event is emitted as soon as it is available.
+
+        Both happen inside the submitted call, so once the returned future is done
+        result["summary"] is set (a done callback may still be running at that point).
+        A failed summary (SummaryError) is raised from the future, failing the brief.
+        """
+        track_hook = track_event_hook(on_event, result["song"], result["artist"])
+        summary_kwargs = {}
+        if track_hook is not None:
+            summary_kwargs["on_token"] = lambda token: emit_event(track_hook, "summary_token", token=token)
+
+        def summarize():
+            try:
+                result["summary"] = self.Summarizer.summarize_trends(result["trends"], **summary_kwargs)
+            except Exception as e:
+                print(f"Error generating summary for '{result['song']}' by {result['artist']}: {e}")
+                raise
+            emit_event(track_hook, "track_summary", summary=result["summary"])
+            return result["summary"]
+
+        return self.scheduler.submit("openai", summarize)
+
+    def _summarize_batch(self, results, aggregated_trends, on_event=None):
+        """
+        Summarize every track and the aggregate in one completion.
+        Fills in result["summary"] for each track and returns the overall summary,
+        or None if the batched response was unusable.
+        """
+        track_trends = [(f"'{res['song']}' by {res['artist']}", res["trends"]) for res in results]
+        batch = self.scheduler.call("openai", self.Summarizer.summarize_batch, track_trends, aggregated_trends)
+        if batch is None:
+            return None
+        track_summaries, overall_summary = batch
+        for res, summary in zip(results, track_summaries):
+            res["summary"] = summary
+            emit_event(track_event_hook(on_event, res["song"], res["artist"]), "track_summary", summary=summary)
+        return overall_summary
+
+    @staticmethod
+    def _record_trends(trend_store, comparator, batch_results, video_features, sound):
+        """
+        Fold a track's analyzed videos into `trend_store` (texts merged by `comparator`).
+
+        Returns:
+            list or None: The sounds to query trends for, or None to compare the videos directly
+        """
+        if trend_store is None or sound is None:
+            return None
+        from .GoogleVideoAnalyzer import GoogleVideoAnalyzer
+        video_ids = [GoogleVideoAnalyzer._video_id_from_uri(result["video_uri"]) for result in batch_results]
+        trend_store.add_videos(comparator.merge_texts(video_features), sound=sound, video_ids=video_ids)
+        return [sound]
+
+    @staticmethod
+    def _detect_trends(comparator, video_features, sounds=None):
+        """
+        Compare per-video features (or query the trend store for `sounds`) and print the
+        detected trends for a track.
+        """
+        trends = comparator.detect_trends(video_features, sounds=sounds)
+        print("\nDetected Trends for this track:")
+        for category, items in trends.items():
+            print(f" - {category}: {items}")
+        return trends
+
+    @staticmethod
+    def _video_features(batch_results):
+        """
+        Reduce raw analysis results to the labels/objects/texts dictionaries compared across videos.
+        """
         video_features = []
         for result_obj in batch_results:
             video_analysis = result_obj["analysis"]
@@ -178,27 +674,219 @@ class ViralMusicFinder:
                 "texts": texts_list
             }
             video_features.append(feature_dict)
+        return video_features
 
-        if len(video_features) > 1:
-            trends = self.Comparator.detect_trends(video_features)
-            print("\nDetected Trends for this track:")
-            for category, items in trends.items():
-                print(f" - {category}: {items}")
-            summary = self.Summarizer.summarize_trends(trends)
-            return trends, summary
-        else:
-            print("Only 1 or0 videos processed; skipping trend comparison.")
-            return None, None
+    @staticmethod
+    def _selection_lines(similar_tracks, selected):
+        """
+        Report how many similar tracks were found and how many of them are analyzed.
+        """
+        return [
+            f"Found {len(similar_tracks)} similar tracks.",
+            f"Analyzing the {len(selected)} with the most TikTok presence.",
+        ]
+
+    @staticmethod
+    def _summary_lines(results):
+        """
+        Format the per-track summaries as output lines, one header per track.
+        """
+        lines = []
+        for res in results:
+            header = f"=== Summary for '{res['song']}' by {res['artist']} ==="
+            lines.append(header)
+            # Assuming res['summary'] is a string that may contain multiple lines,
+            # split them so each line is a separate element.
+            lines.extend(res['summary'].splitlines())
+        return lines
+
+    @staticmethod
+    def _aggregate_trends(results, comparator=None):
+        """
+        Merge the trend lists of all processed tracks into one dictionary. With a trend
+        store, the trends across all of the tracks' sounds are queried from it instead.
+        """
+        sounds = [res["music_id"] for res in results if res.get("music_id") is not None]
+        if comparator is not None and comparator.store is not None and sounds:
+            trends = comparator.detect_trends(sounds=sounds)
+            return trends if any(trends.values()) else {}
+        aggregated_trends = {}
+        for res in results:
+            trends = res.get("trends")
+            if trends:
+                for key, items in trends.items():
+                    aggregated_trends.setdefault(key, []).extend(items)
+        return aggregated_trends
 
-def load_config_and_initialize():
+    def _upload_videos(self, videos, on_event=None):
+        """
+        Upload videos to GCS as a small state machine over the shared scheduler:
+        existence check (gcs) -> metadata fetch (tikapi) -> streaming upload (gcs).
+        Each step is submitted under its own service limit, so no per-track pool is needed.
+
+        Returns:
+            list: GCS URIs of the videos that are available in the bucket
+        """
+        gcs_uris = []
+        stages = {}
+        for video in videos:
+            video_id = video.get("id")
+            if not video_id:
+                print("Video missing ID, skipping.")
+                continue
+            future = self.scheduler.submit("gcs", self.Uploader.existing_video_uri, video_id)
+            stages[future] = ("exists", video_id)
+
+        while stages:
+            done, _ = concurrent.futures.wait(stages, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                stage, video_id = stages.pop(future)
+                try:
+                    value = future.result()
+                except Exception as exc:
+                    print(f"Video {video_id} failed during {stage}: {exc}")
+                    continue
+
+                if stage == "exists":
+                    if value:
+                        # Videos uploaded by an earlier brief need neither metadata nor a re-upload
+                        print(f"Video {video_id} already uploaded, skipping.")
+                        gcs_uris.append(value)
+                        emit_event(on_event, "video_uploaded", video_id=video_id, gcs_uri=value, reused=True)
+                        continue
+                    print(f"Uploading Video (ID: {video_id})")
+                    next_future = self.scheduler.submit("tikapi", self.tiktok_api.get_video_metadata, video_id)
+                    stages[next_future] = ("metadata", video_id)
+                elif stage == "metadata":
+                    if not value:
+                        print(f"No metadata found for video {video_id}.")
+                        continue
+                    next_future = self.scheduler.submit(
+                        "gcs", self.Uploader.upload_tiktok_video_direct, value, check_existing=False
+                    )
+                    stages[next_future] = ("upload", video_id)
+                elif value:
+                    gcs_uris.append(value)
+                    emit_event(on_event, "video_uploaded", video_id=video_id, gcs_uri=value, reused=False)
+                else:
+                    print(f"Unable to upload video {video_id} to GCS.")
+
+        return gcs_uris
+
+def _build_cache(settings, base_dir, table):
+    """
+    Build a cache from a `cache.<name>` section of config.yaml.
+
+    Args:
+        settings (dict or None): The section, with enabled, backend ("sqlite" or "memory"),
+                                 path, ttl_seconds and max_entries keys
+        base_dir (str): Directory that relative paths are resolved against
+        table (str): SQLite table name for this cache
+
+    Returns:
+        SQLiteCache, LRUCache or None: None if the section is missing or disabled
+    """
+    settings = settings or {}
+    if not settings or not settings.get('enabled', True):
+        return None
+    if settings.get('backend', 'sqlite') == 'memory':
+        return LRUCache(
+            ttl_seconds=settings.get('ttl_seconds'),
+            max_entries=settings.get('max_entries', 1024)
+        )
+    if not settings.get('path'):
+        return None
+    import os
+    cache_path = settings['path']
+    if not os.path.isabs(cache_path):
+        cache_path = os.path.join(base_dir, cache_path)
+    return SQLiteCache(
+        cache_path,
+        ttl_seconds=settings.get('ttl_seconds'),
+        max_entries=settings.get('max_entries'),
+        table=table
+    )
+
+def _build_music_index(settings, base_dir):
+    """
+    Build the song -> music ID index from the `cache.music_index` section of config.yaml.
+
+    Returns:
+        MusicIDIndex or None: None if the section is missing, disabled or has no path
+    """
+    settings = settings or {}
+    if not settings.get('enabled', True) or not settings.get('path'):
+        return None
+    import os
+    index_path = settings['path']
+    if not os.path.isabs(index_path):
+        index_path = os.path.join(base_dir, index_path)
+    return MusicIDIndex(
+        index_path,
+        ttl_seconds=settings.get('ttl_seconds', 90 * 86400),
+        negative_ttl_seconds=settings.get('negative_ttl_seconds', 86400)
+    )
+
+
+def _build_trend_store(settings, base_dir):
+    """
+    Build the persistent trend store from the `cache.trend_store` section of config.yaml.
+
+    Returns:
+        TrendStore or None: None if the section is missing, disabled or has no path
+    """
+    settings = settings or {}
+    if not settings.get('enabled', True) or not settings.get('path'):
+        return None
+    import os
+    store_path = settings['path']
+    if not os.path.isabs(store_path):
+        store_path = os.path.join(base_dir, store_path)
+    return TrendStore(
+        store_path,
+        half_life_days=settings.get('half_life_days', 7.0),
+        purge_min_score=settings.get('purge_min_score', 0.01),
+        purge_every=settings.get('purge_every', 100)
+    )
+
+
+def _build_lastfm_options(settings, base_dir):
+    """
+    Build the LastfmAPI cache options from the `cache.lastfm` section of config.yaml:
+    the lookup cache (see _build_cache), per-method `ttls` and an optional
+    `pylast_cache_path` for pylast's own request cache.
+
+    Returns:
+        dict: Keyword arguments for LastfmAPI (empty if the section is missing or disabled)
+    """
+    settings = settings or {}
+    if not settings or not settings.get('enabled', True):
+        return {}
+    import os
+    options = {"cache": _build_cache(settings, base_dir, table="lastfm"), "ttls": settings.get('ttls')}
+    pylast_cache_path = settings.get('pylast_cache_path')
+    if pylast_cache_path:
+        if not os.path.isabs(pylast_cache_path):
+            pylast_cache_path = os.path.join(base_dir, pylast_cache_path)
+        os.makedirs(os.path.dirname(pylast_cache_path), exist_ok=True)
+        options["pylast_cache_path"] = pylast_cache_path
+    return options
+
+
+def load_config_and_initialize(async_mode: bool = False):
     """
     Load configuration from YAML file and initialize the ViralMusicFinder.
     
     This method handles loading the configuration, environment variables,
     and initializing the ViralMusicFinder with the appropriate credentials.
+
+    Args:
+        async_mode (bool, optional): If True, return an AsyncViralMusicFinder instead,
+                                     using the same credentials and concurrency limits.
     
     Returns:
         ViralMusicFinder: An initialized instance of the ViralMusicFinder class
+                          (or AsyncViralMusicFinder when async_mode is True)
         
     Raises:
         FileNotFoundError: If the configuration file cannot be found
@@ -276,20 +964,56 @@ def load_config_and_initialize():
     # Verify the Google JSON file exists
     if not os.path.exists(google_json):
         raise FileNotFoundError(f"Google credentials file not found at: {google_json}")
+
+    pipeline_config = config.get('pipeline', {}) or {}
+
+    # Optional caches for parsed video annotations and LLM summaries
+    cache_config = config.get('cache', {}) or {}
+    annotation_cache = _build_cache(cache_config.get('annotations'), base_dir, table="annotations")
+    summary_cache = _build_cache(cache_config.get('summaries'), base_dir, table="summaries")
+    music_index = _build_music_index(cache_config.get('music_index'), base_dir)
     
     print("Configuration loaded successfully.")
-    print(f"Initializing ViralMusicFinder with credentials...")
-    
-    # Initialize the ViralMusicFinder with loaded credentials
-    finder = ViralMusicFinder(
+
+    credentials = dict(
         music_key=lastfm_key,
         music_secret=lastfm_secret,
         LLM_key=openai_key,
         tiktok_key=tikapi_key,
         google_json=google_json,
-        bucket_name=bucket_name
+        bucket_name=bucket_name,
+        annotation_cache=annotation_cache,
+        summary_cache=summary_cache,
+        prompt_budget=config.get('prompt_budget'),
+        music_index=music_index,
+        rate_limits=config.get('rate_limits'),
+        http_timeouts=pipeline_config.get('http_timeouts'),
+        transcode=pipeline_config.get('transcode'),
+        analysis=config.get('analysis'),
+        trend_store=_build_trend_store(cache_config.get('trend_store'), base_dir),
+        text_clustering=config.get('text_clustering'),
+        lastfm=_build_lastfm_options(cache_config.get('lastfm'), base_dir),
+        expansion=pipeline_config.get('expansion')
+    )
+
+    summary_mode = pipeline_config.get('summary_mode', 'concurrent')
+
+    if async_mode:
+        from .AsyncViralMusicFinder import AsyncViralMusicFinder
+        print(f"Initializing AsyncViralMusicFinder with credentials...")
+        return AsyncViralMusicFinder(limits=pipeline_config.get('concurrency'), **credentials)
+
+    print(f"Initializing ViralMusicFinder with credentials...")
+
+    # Shared scheduler with per-service concurrency limits
+    scheduler = PipelineScheduler(
+        limits=pipeline_config.get('concurrency'),
+        max_tracks=pipeline_config.get('max_tracks', 4)
     )
     
+    # Initialize the ViralMusicFinder with loaded credentials
+    finder = ViralMusicFinder(scheduler=scheduler, summary_mode=summary_mode, **credentials)
+    
     return finder
 
 # if __name__ == "__main__":
@@ -1,45 +1,89 @@
 """
 Parasition Music Analysis Tools - Discover viral music trends and content opportunities.
+
+Modules, classes and functions are imported on first access (PEP 562), so importing the
+package does not pull in the Google Cloud, OpenAI, Last.fm or TikAPI SDKs. Import what
+you need by name (`from src import ViralMusicFinder`); `from src import *` still imports
+everything.
 """
+import importlib
+import sys
+import types
 
-# Explicitly import each module
-from . import ViralMusicFinder
-from . import LastfmAPI
-from . import TikAPI
-from . import GoogleCloud
-from . import GoogleVideoAnalyzer
-from . import OpenAITrend
-from . import CompareFeatures
-
-# Make specific classes and functions available directly
-from .ViralMusicFinder import ViralMusicFinder, load_config_and_initialize
-from .LastfmAPI import LastfmAPI
-from .TikAPI import TikAPIWrapper
-from .GoogleCloud import GCSVideoUploader
-from .GoogleVideoAnalyzer import GoogleVideoAnalyzer
-from .OpenAITrend import OpenAITrendSummarizer
-from .CompareFeatures import CompareFeatures
+# Name -> (module, attribute) of every class and function available directly
+_EXPORTS = {
+    'ViralMusicFinder': ('ViralMusicFinder', 'ViralMusicFinder'),
+    'load_config_and_initialize': ('ViralMusicFinder', 'load_config_and_initialize'),
+    'AsyncViralMusicFinder': ('AsyncViralMusicFinder', 'AsyncViralMusicFinder'),
+    'LastfmAPI': ('LastfmAPI', 'LastfmAPI'),
+    'TikAPIWrapper': ('TikAPI', 'TikAPIWrapper'),
+    'GCSVideoUploader': ('GoogleCloud', 'GCSVideoUploader'),
+    'GoogleVideoAnalyzer': ('GoogleVideoAnalyzer', 'GoogleVideoAnalyzer'),
+    'OpenAITrendSummarizer': ('OpenAITrend', 'OpenAITrendSummarizer'),
+    'SummaryError': ('OpenAITrend', 'SummaryError'),
+    'CompareFeatures': ('CompareFeatures', 'CompareFeatures'),
+    'FeatureIncidence': ('CompareFeatures', 'FeatureIncidence'),
+    'SQLiteCache': ('Cache', 'SQLiteCache'),
+    'LRUCache': ('Cache', 'LRUCache'),
+    'PipelineScheduler': ('Scheduler', 'PipelineScheduler'),
+    'TrendCompactor': ('TrendCompactor', 'TrendCompactor'),
+    'NgramVectorizer': ('TextSimilarity', 'NgramVectorizer'),
+    'TextClusterer': ('TextSimilarity', 'TextClusterer'),
+    'MusicIDIndex': ('MusicIndex', 'MusicIDIndex'),
+    'RateLimiterRegistry': ('RateLimiter', 'RateLimiterRegistry'),
+    'ServiceLimiter': ('RateLimiter', 'ServiceLimiter'),
+    'VideoTranscoder': ('VideoTranscoder', 'VideoTranscoder'),
+    'OperationPoller': ('OperationPoller', 'OperationPoller'),
+    'TrendStore': ('TrendStore', 'TrendStore'),
+}
 
-# Define what's available with "from src import *"
-__all__ = [
-    # Classes
-    'ViralMusicFinder',
-    'LastfmAPI', 
-    'TikAPIWrapper', 
-    'GCSVideoUploader', 
-    'GoogleVideoAnalyzer', 
-    'OpenAITrendSummarizer', 
-    'CompareFeatures',
-    
-    # Functions
-    'load_config_and_initialize',
-    
-    # Modules
+_MODULES = [
     'ViralMusicFinder',
+    'AsyncViralMusicFinder',
     'LastfmAPI',
     'TikAPI',
     'GoogleCloud',
     'GoogleVideoAnalyzer',
     'OpenAITrend',
-    'CompareFeatures'
-]
\ No newline at end of file
+    'CompareFeatures',
+    'Cache',
+    'Scheduler',
+    'TrendCompactor',
+    'TextSimilarity',
+    'MusicIndex',
+    'RateLimiter',
+    'VideoTranscoder',
+    'OperationPoller',
+    'TrendStore',
+]
+
+# Define what's available with "from src import *"
+__all__ = list(_EXPORTS) + [module for module in _MODULES if module not in _EXPORTS]
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        module_name, attribute = _EXPORTS[name]
+        value = getattr(importlib.import_module(f"{__name__}.{module_name}"), attribute)
+    elif name in _MODULES:
+        value = importlib.import_module(f"{__name__}.{name}")
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+class _Package(types.ModuleType):
+    def __setattr__(self, name, value):
+        # Importing a submodule binds it on the package; where a class has the same name
+        # as its module (src.ViralMusicFinder), the class is what the package exports
+        if isinstance(value, types.ModuleType) and name in _EXPORTS and name not in self.__dict__:
+            return
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
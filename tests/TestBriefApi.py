@@ -1,6 +1,10 @@
 import os
 import sys
 import json
+import sqlite3
+import tempfile
+import time
+import threading
 import requests
 import unittest
 from unittest.mock import patch, MagicMock
@@ -10,7 +14,9 @@ parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(parent_dir)
 
 # Import the Flask app and dependencies
+import web.web
 from web.web import app, generate_brief
+from jobs import BriefJobStore, BriefJobQueue
 
 class TestBriefAPI(unittest.TestCase):
     """Test cases for the brief generation API endpoints"""
@@ -78,6 +84,16 @@ class TestBriefAPI(unittest.TestCase):
         self.assertIn('brief', data)
         self.assertEqual(data['brief'], "Please provide both song and artist")
     
+    def test_get_brief_pipeline_failure(self):
+        """The synchronous endpoint still reports pipeline failures as the brief"""
+        finder = MagicMock()
+        finder.find_tiktoks.side_effect = RuntimeError("TikAPI down")
+        with patch('web.web.music_finder', finder):
+            response = self.app.get('/get-brief?song=billie+jean&artist=michael+jackson')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['brief'], "Error generating brief: TikAPI down")
+
     def test_get_brief_invalid_json(self):
         """Test brief generation with invalid JSON"""
         response = self.app.post(
@@ -91,6 +107,245 @@ class TestBriefAPI(unittest.TestCase):
         self.assertIn('error', data)
 
 
+class TestBriefJobs(unittest.TestCase):
+    """Test cases for the asynchronous /briefs job endpoints"""
+
+    def setUp(self):
+        """Use an in-memory job store for each test"""
+        self.app = app.test_client()
+        self.app.testing = True
+        self.original_queue = web.web.job_queue
+        web.web.job_queue = BriefJobQueue(
+            BriefJobStore(":memory:"),
+            runner=lambda data, on_event: web.web.generate_brief(data, on_event=on_event)
+        )
+
+    def tearDown(self):
+        web.web.job_queue.shutdown()
+        web.web.job_queue = self.original_queue
+
+    def wait_for_job(self, job_id, timeout=5):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            data = json.loads(self.app.get(f'/briefs/{job_id}').data)
+            if data['status'] in ('done', 'failed'):
+                return data
+            time.sleep(0.01)
+        self.fail(f"Job {job_id} did not finish")
+
+    @patch('web.web.generate_brief')
+    def test_job_lifecycle(self, mock_generate_brief):
+        """A job is accepted with 202 and its brief can be polled"""
+        mock_generate_brief.return_value = "This is a test brief for Billie jean"
+
+        response = self.app.post(
+            '/briefs',
+            data=json.dumps({'song': 'billie jean', 'artist': 'micheal jackson'}),
+            content_type='application/json'
+        )
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.headers['Location'], f"/briefs/{data['job_id']}")
+
+        job = self.wait_for_job(data['job_id'])
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['brief'], "This is a test brief for Billie jean")
+
+    @patch('web.web.generate_brief')
+    def test_identical_requests_coalesce(self, mock_generate_brief):
+        """A second identical request joins the job already in flight"""
+        release = threading.Event()
+        mock_generate_brief.side_effect = lambda data, on_event=None: release.wait(5) and "brief"
+
+        first = json.loads(self.app.post('/briefs', json={'song': 'Billie Jean', 'artist': 'Michael Jackson'}).data)
+        second = json.loads(self.app.post('/briefs', json={'song': 'billie  jean', 'artist': 'michael jackson'}).data)
+        release.set()
+
+        self.assertEqual(first['job_id'], second['job_id'])
+        self.assertFalse(first['coalesced'])
+        self.assertTrue(second['coalesced'])
+        self.assertEqual(self.wait_for_job(first['job_id'])['brief'], "brief")
+        self.assertEqual(mock_generate_brief.call_count, 1)
+
+    @patch('web.web.generate_brief')
+    def test_failed_job(self, mock_generate_brief):
+        """Exceptions in the pipeline mark the job as failed"""
+        mock_generate_brief.side_effect = RuntimeError("TikAPI down")
+        data = json.loads(self.app.post('/briefs', json={'song': 'a', 'artist': 'b'}).data)
+
+        job = self.wait_for_job(data['job_id'])
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error'], "TikAPI down")
+
+    def test_pipeline_failure_fails_job(self):
+        """A failing finder marks the job as failed instead of storing the error as its brief"""
+        finder = MagicMock()
+        finder.find_tiktoks.side_effect = RuntimeError("TikAPI down")
+        with patch('web.web.music_finder', finder):
+            data = json.loads(self.app.post('/briefs', json={'song': 'a', 'artist': 'b'}).data)
+            job = self.wait_for_job(data['job_id'])
+
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error'], "TikAPI down")
+        self.assertIsNone(job['brief'])
+
+    @patch('web.web.music_finder', None)
+    def test_uninitialized_finder_fails_job(self):
+        """Without a finder the job fails with an explicit error"""
+        data = json.loads(self.app.post('/briefs', json={'song': 'a', 'artist': 'b'}).data)
+
+        job = self.wait_for_job(data['job_id'])
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error'], "ViralMusicFinder is not initialized")
+
+    @patch('web.web.generate_brief')
+    def test_progress_from_events(self, mock_generate_brief):
+        """Pipeline events are recorded as job progress"""
+        def fake_brief(data, on_event=None):
+            on_event("tiktok_match", {"song": "Beat It", "artist": "Michael Jackson", "music_id": "1"})
+            job = web.web.job_queue.store.find_active("a|b")
+            self.progress_seen = job["progress"]
+            return "brief"
+        mock_generate_brief.side_effect = fake_brief
+
+        data = json.loads(self.app.post('/briefs', json={'song': 'a', 'artist': 'b'}).data)
+        self.wait_for_job(data['job_id'])
+        self.assertEqual(self.progress_seen, "Matched 'Beat It' by Michael Jackson on TikTok")
+
+    @patch('web.web.generate_brief')
+    def test_options_reach_the_pipeline(self, mock_generate_brief):
+        """feature_profile and track_budget are passed through and separate otherwise identical jobs"""
+        release = threading.Event()
+        mock_generate_brief.side_effect = lambda data, on_event=None: release.wait(5) and "brief"
+
+        plain = json.loads(self.app.post('/briefs', json={'song': 'a', 'artist': 'b'}).data)
+        fast = json.loads(self.app.post('/briefs', json={'song': 'a', 'artist': 'b', 'feature_profile': 'fast',
+                                                         'track_budget': '2'}).data)
+        fast_again = json.loads(self.app.post('/briefs', json={'song': 'A', 'artist': 'b', 'feature_profile': 'fast',
+                                                               'track_budget': 2}).data)
+        release.set()
+        self.wait_for_job(plain['job_id'])
+        self.wait_for_job(fast['job_id'])
+
+        self.assertNotEqual(plain['job_id'], fast['job_id'])
+        self.assertEqual(fast['job_id'], fast_again['job_id'])
+        requests_seen = [call.args[0] for call in mock_generate_brief.call_args_list]
+        self.assertIn({"song": "a", "artist": "b", "feature_profile": "fast", "track_budget": 2}, requests_seen)
+        self.assertIn({"song": "a", "artist": "b", "feature_profile": None, "track_budget": None}, requests_seen)
+
+    @patch('web.web.generate_brief')
+    def test_invalid_options(self, mock_generate_brief):
+        """Malformed options are rejected by every endpoint before the pipeline runs"""
+        for options in ({'track_budget': 'many'}, {'track_budget': 0}, {'feature_profile': ['fast']}):
+            response = self.app.post('/briefs', json={'song': 'a', 'artist': 'b', **options})
+            self.assertEqual(response.status_code, 400)
+            response = self.app.post('/get-brief', json={'song': 'a', 'artist': 'b', **options})
+            self.assertEqual(response.status_code, 400)
+        for url in ('/get-brief', '/get-brief/stream'):
+            response = self.app.get(f'{url}?song=a&artist=b&track_budget=abc')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(json.loads(response.data)["error"], "track_budget must be an integer")
+        mock_generate_brief.assert_not_called()
+
+    def test_missing_fields_and_unknown_job(self):
+        """Incomplete requests are rejected and unknown jobs return 404"""
+        response = self.app.post('/briefs', json={'song': 'billie jean'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.app.get('/briefs/does-not-exist').status_code, 404)
+
+
+class TestBriefJobStore(unittest.TestCase):
+    """Test recovery of interrupted jobs in a job database shared by several workers"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "jobs.sqlite")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_new_worker_keeps_live_jobs(self):
+        """Opening the database in another worker does not fail jobs that are still running"""
+        first = BriefJobStore(self.path)
+        job = first.create("a", "b", "a|b")
+        first.update(job["id"], status="running")
+
+        second = BriefJobStore(self.path)
+        self.assertEqual(second.get(job["id"])["status"], "running")
+        self.assertEqual(second.find_active("a|b")["id"], job["id"])
+        first.close()
+        second.close()
+
+    def test_jobs_of_dead_workers_are_recovered(self):
+        """Unfinished jobs are failed once their owner's lease expires, as are jobs without an owner"""
+        crashed = BriefJobStore(self.path, lease=60)
+        job = crashed.create("a", "b", "a|b")
+        crashed._closed.set()
+        with sqlite3.connect(self.path) as conn:
+            conn.execute("UPDATE job_owners SET heartbeat_at = heartbeat_at - 120")
+            conn.execute("INSERT INTO jobs (id, status) VALUES ('legacy', 'running')")
+
+        survivor = BriefJobStore(self.path, lease=60)
+        recovered = survivor.get(job["id"])
+        self.assertEqual(recovered["status"], "failed")
+        self.assertEqual(recovered["error"], "Interrupted by a server restart")
+        self.assertEqual(survivor.get("legacy")["status"], "failed")
+        self.assertEqual(survivor.recover_interrupted(), 0)
+        survivor.close()
+
+    def test_heartbeat_renews_the_lease(self):
+        """A live store keeps renewing its lease from the background thread"""
+        store = BriefJobStore(self.path, lease=0.15)
+        job = store.create("a", "b", "a|b")
+        time.sleep(0.3)
+
+        other = BriefJobStore(self.path, lease=0.15)
+        self.assertEqual(other.get(job["id"])["status"], "queued")
+        store.close()
+        other.close()
+
+
+class TestBriefStream(unittest.TestCase):
+    """Test cases for the server-sent-events brief endpoint"""
+
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+
+    @patch('web.web.generate_brief')
+    def test_events_are_streamed(self, mock_generate_brief):
+        """Every pipeline event is forwarded, followed by the final brief"""
+        def fake_brief(data, on_event=None):
+            on_event("similar_tracks", {"tracks": [["Beat It", "Michael Jackson"]]})
+            on_event("summary_token", {"token": "Dance"})
+            return "Dance brief"
+        mock_generate_brief.side_effect = fake_brief
+
+        response = self.app.get('/get-brief/stream?song=billie+jean&artist=michael+jackson')
+        body = response.get_data(as_text=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/event-stream'))
+        events = [block.split("\n") for block in body.strip().split("\n\n")]
+        self.assertEqual([lines[0] for lines in events],
+                         ["event: similar_tracks", "event: summary_token", "event: brief"])
+        self.assertEqual(json.loads(events[-1][1][len("data: "):]), {"brief": "Dance brief"})
+
+    def test_pipeline_failure_is_an_error_event(self):
+        """A failing finder ends the stream with an error event"""
+        finder = MagicMock()
+        finder.find_tiktoks.side_effect = RuntimeError("TikAPI down")
+        with patch('web.web.music_finder', finder):
+            body = self.app.get('/get-brief/stream?song=billie+jean&artist=michael+jackson').get_data(as_text=True)
+
+        self.assertEqual(body, 'event: error\ndata: {"error": "TikAPI down"}\n\n')
+
+    def test_missing_parameters(self):
+        """Both song and artist are required"""
+        response = self.app.get('/get-brief/stream?song=billie+jean')
+        self.assertEqual(response.status_code, 400)
+
+
 class TestLiveAPI(unittest.TestCase):
     """Integration tests against the running API server"""
     
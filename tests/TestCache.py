@@ -0,0 +1,104 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from google.cloud import videointelligence
+
+# Add parent directory to path to import from src
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from src.Cache import SQLiteCache
+from src.GoogleVideoAnalyzer import GoogleVideoAnalyzer
+from src.OperationPoller import OperationPoller
+from src.RateLimiter import ServiceLimiter
+
+
+class TestSQLiteCache(unittest.TestCase):
+    """Test cases for the persistent SQLite cache"""
+
+    def test_round_trip_and_counters(self):
+        """Values survive a round trip and hits/misses are counted"""
+        cache = SQLiteCache(":memory:")
+        self.assertIsNone(cache.get("missing"))
+        cache.set("key", {"labels": ["Dance"]})
+        self.assertEqual(cache.get("key"), {"labels": ["Dance"]})
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_ttl_expiry(self):
+        """Expired entries are treated as misses"""
+        cache = SQLiteCache(":memory:", ttl_seconds=0.01)
+        cache.set("key", "value")
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("key"))
+
+    def test_size_bounded_eviction(self):
+        """The least recently used entry is evicted once max_entries is exceeded"""
+        cache = SQLiteCache(":memory:", max_entries=2)
+        cache.set("a", 1)
+        time.sleep(0.001)
+        cache.set("b", 2)
+        time.sleep(0.001)
+        cache.get("a")
+        time.sleep(0.001)
+        cache.set("c", 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+
+    def test_caches_sharing_a_file_are_isolated(self):
+        """Eviction, TTL expiry and clear only touch the cache's own table"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.sqlite")
+            small = SQLiteCache(path, ttl_seconds=0.01, max_entries=1, table="small")
+            large = SQLiteCache(path, max_entries=10, table="large")
+            for key in ("a", "b", "c"):
+                large.set(key, key)
+            time.sleep(0.02)
+            small.set("x", 1)
+            time.sleep(0.001)
+            small.set("y", 2)
+
+            self.assertEqual(len(small), 1)
+            self.assertEqual(len(large), 3)
+            small.clear()
+            self.assertEqual([large.get(key) for key in ("a", "b", "c")], ["a", "b", "c"])
+
+
+class TestAnnotationCache(unittest.TestCase):
+    """Test that GoogleVideoAnalyzer bypasses the API on a cache hit"""
+
+    def setUp(self):
+        self.analyzer = GoogleVideoAnalyzer.__new__(GoogleVideoAnalyzer)
+        self.analyzer.client = MagicMock()
+        self.analyzer.cache = SQLiteCache(":memory:")
+        self.analyzer.limiter = ServiceLimiter("video_intelligence")
+        self.analyzer.profiles = dict(GoogleVideoAnalyzer.FEATURE_PROFILES)
+        self.analyzer.feature_profile = "full"
+        self.analyzer.parse_mode = "summary"
+        self.analyzer.poller = OperationPoller(initial_delay=0.0)
+        self.analyzer._profile_stats = {}
+        self.analyzer._stats_lock = threading.Lock()
+
+    def test_cache_hit_skips_api(self):
+        """A second batch for the same video does not call annotate_video"""
+        response = videointelligence.AnnotateVideoResponse(annotation_results=[{
+            "segment_label_annotations": [{"entity": {"description": "Dance"}}],
+        }])
+        self.analyzer.client.annotate_video.return_value.result.return_value = response
+
+        first = self.analyzer.analyze_videos_in_batch(["gs://bucket/tikapi_videos/123.mp4"])
+        second = self.analyzer.analyze_videos_in_batch(["gs://other/tikapi_videos/123.mp4"])
+
+        self.assertEqual(self.analyzer.client.annotate_video.call_count, 1)
+        self.assertEqual(first[0]["analysis"]["segment_labels"], ["Dance"])
+        self.assertEqual(second[0]["analysis"], first[0]["analysis"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import random
+import sys
+import time
+import unittest
+
+import numpy as np
+
+# Add parent directory to path to import from src
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from src.CompareFeatures import CompareFeatures, FeatureIncidence
+from src.TextSimilarity import TextClusterer, canonical_text
+
+
+class TestFeatureIncidence(unittest.TestCase):
+    """Test the video x feature incidence matrix"""
+
+    def test_document_frequency_counts_videos(self):
+        """A feature repeated within one video counts once"""
+        incidence = FeatureIncidence([
+            {"objects": ["person"] * 10, "labels": ["Dance"]},
+            {"objects": ["person", "hat"], "labels": []},
+        ])
+        person = incidence.vocabulary.index(("objects", "person"))
+        self.assertEqual(incidence.document_frequency[person], 2)
+        self.assertEqual(incidence.occurrences[person], 11)
+        np.testing.assert_array_equal(incidence.to_dense().sum(axis=1), [2, 2])
+
+    def test_shared_vocabulary_keeps_categories_apart(self):
+        """The same string as a label and as a text is two features"""
+        incidence = FeatureIncidence([{"labels": ["Hat"], "texts": ["Hat"]}])
+        self.assertEqual(incidence.vocabulary, [("labels", "Hat"), ("texts", "Hat")])
+
+    def test_empty(self):
+        """Videos without features produce empty rankings"""
+        ranked = FeatureIncidence([{}, {"labels": []}]).ranked()
+        self.assertEqual(ranked, {"labels": [], "objects": [], "texts": []})
+
+
+class TestCompareFeatures(unittest.TestCase):
+    """Test trend detection across videos"""
+
+    def test_repeated_object_is_not_a_trend(self):
+        """An object tracked many times in a single video does not reach the threshold"""
+        videos = [{"objects": ["car"] * 10}, {"objects": ["person"]}, {"objects": ["person"]}, {"objects": []}]
+        self.assertEqual(CompareFeatures(threshold=0.5).detect_trends(videos)["object_trends"], ["person"])
+
+    def test_trends_are_ranked_with_support(self):
+        """Trends are ordered by the number of videos containing them"""
+        videos = [
+            {"labels": ["Dance", "Smile"], "texts": ["@mj"]},
+            {"labels": ["Smile"], "texts": ["@mj"]},
+            {"labels": ["Smile", "Dance"], "texts": []},
+            {"labels": ["Car"], "texts": []},
+        ]
+        ranked = CompareFeatures(threshold=0.5).rank_trends(videos)
+
+        self.assertEqual([trend["feature"] for trend in ranked["label_trends"]], ["Smile", "Dance"])
+        self.assertEqual(ranked["label_trends"][0]["support"], 0.75)
+        self.assertEqual(ranked["text_trends"], [{"feature": "@mj", "videos": 2, "occurrences": 2, "support": 0.5}])
+        self.assertEqual(ranked["object_trends"], [])
+
+    def test_no_videos(self):
+        self.assertEqual(CompareFeatures().detect_trends([]), {})
+
+    def test_thousands_of_videos(self):
+        """Thousands of videos with a large vocabulary are compared quickly"""
+        videos = [
+            {
+                "labels": [f"label {(v * 7 + i) % 500}" for i in range(20)] + ["Dance"],
+                "objects": [f"object {(v + i) % 200}" for i in range(15)],
+                "texts": [f"caption {v}"],
+            }
+            for v in range(5000)
+        ]
+        start = time.perf_counter()
+        trends = CompareFeatures(threshold=0.5).detect_trends(videos)
+        self.assertLess(time.perf_counter() - start, 2.0)
+        self.assertEqual(trends["label_trends"], ["Dance"])
+        self.assertEqual(trends["text_trends"], [])
+
+
+class TestTextClusterer(unittest.TestCase):
+    """Test MinHash/LSH clustering of noisy OCR texts"""
+
+    def test_canonical_text(self):
+        self.assertEqual(canonical_text("  @User_Name!! "), "user name")
+        self.assertEqual(canonical_text("!!"), "!!")
+
+    def test_variants_share_a_representative(self):
+        """OCR variants of one handle or caption form one cluster named after the most frequent variant"""
+        texts = ["@user", "@usr", "user", "@user", "Follow for part 2", "follow for part2", "cat", "car"]
+        clusters = TextClusterer().clusters(texts)
+
+        self.assertEqual(clusters[0], ["@user", "@usr", "user"])
+        self.assertIn(["Follow for part 2", "follow for part2"], clusters)
+        self.assertIn(["cat"], clusters)
+        self.assertIn(["car"], clusters)
+
+    def test_thousands_of_texts(self):
+        """Thousands of noisy strings are clustered quickly and without merging distinct captions"""
+        rng = random.Random(0)
+        alphabet = "abcdefghijklmnopqrstuvwxyz "
+        captions = ["".join(rng.choice(alphabet) for _ in range(rng.randint(12, 40))) for _ in range(1000)]
+        variants = []
+        for caption in captions:
+            typos = [rng.randrange(len(caption)) for _ in range(4)]
+            variants.append([caption] + [caption[:i] + rng.choice(alphabet[:-1]) + caption[i + 1:] for i in typos])
+
+        start = time.perf_counter()
+        representatives = TextClusterer().representatives(text for group in variants for text in group)
+        self.assertLess(time.perf_counter() - start, 2.0)
+        self.assertEqual(len(set(representatives.values())), len(captions))
+        for group in variants:
+            self.assertEqual({representatives[text] for text in group}, {representatives[group[0]]})
+
+
+class TestCompareFeaturesTextClustering(unittest.TestCase):
+    """Test that near-duplicate texts count as one trend"""
+
+    def test_variants_form_one_trend(self):
+        videos = [{"texts": ["@user"]}, {"texts": ["@usr"]}, {"texts": ["user", "@user"]}, {"texts": ["hello"]}, {}]
+        self.assertEqual(CompareFeatures(threshold=0.6).detect_trends(videos)["text_trends"], [])
+
+        comparator = CompareFeatures(threshold=0.6, text_clusterer=TextClusterer())
+        ranked = comparator.rank_trends(videos)["text_trends"]
+        self.assertEqual(ranked, [{"feature": "@user", "videos": 3, "occurrences": 4, "support": 0.6}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,447 @@
+import asyncio
+import os
+import subprocess
+import tempfile
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add parent directory to path to import from src
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from src.GoogleCloud import GCSVideoUploader
+from src.RateLimiter import ServiceLimiter
+from src.VideoTranscoder import VideoTranscoder
+import httpx
+
+VIDEO_BYTES = os.urandom(3 * 1024 * 1024 + 123)
+
+
+class FakeVideoHandler(BaseHTTPRequestHandler):
+    """Serves VIDEO_BYTES for any GET request, like the TikTok CDN would"""
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(len(VIDEO_BYTES)))
+        self.end_headers()
+        self.wfile.write(VIDEO_BYTES)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class KeepAliveVideoHandler(FakeVideoHandler):
+    """Like FakeVideoHandler, but keeps connections open and records each new one"""
+    protocol_version = "HTTP/1.1"
+    connections = []
+
+    def setup(self):
+        super().setup()
+        KeepAliveVideoHandler.connections.append(self.client_address)
+
+
+class StalledVideoHandler(FakeVideoHandler):
+    """Sends the headers and a first chunk, then stops responding"""
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(VIDEO_BYTES)))
+        self.end_headers()
+        self.wfile.write(VIDEO_BYTES[:1024])
+        self.wfile.flush()
+        time.sleep(2)
+
+
+def serve(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/video.mp4"
+
+
+class FakeWriter:
+    """Records every write so the test can check how much was buffered at once"""
+
+    def __init__(self, blob):
+        self.blob = blob
+        self.max_write = 0
+
+    def write(self, data):
+        self.max_write = max(self.max_write, len(data))
+        self.blob.data.extend(data)
+
+    def close(self):
+        self.blob.closed = True
+
+    def terminate(self):
+        # Like a cancelled resumable session, which cannot be cancelled again
+        if self.blob.terminated:
+            raise ValueError("upload already terminated")
+        self.blob.terminated = True
+
+
+class FakeBlob:
+    def __init__(self, name):
+        self.name = name
+        self.data = bytearray()
+        self.closed = False
+        self.terminated = False
+        self.writer = None
+
+    def exists(self):
+        return self.closed
+
+    def open(self, mode, chunk_size=None, content_type=None):
+        # A new resumable upload starts from scratch, as in GCS
+        self.open_args = (mode, chunk_size, content_type)
+        self.data = bytearray()
+        self.writer = FakeWriter(self)
+        return self.writer
+
+
+class FakeBucket:
+    def __init__(self, name):
+        self.name = name
+        self.blobs = {}
+
+    def blob(self, name):
+        return self.blobs.setdefault(name, FakeBlob(name))
+
+
+class FakeStorageClient:
+    def __init__(self, names):
+        self.names = names
+        self.list_calls = 0
+
+    def list_blobs(self, bucket_name, prefix=None):
+        self.list_calls += 1
+        return [FakeBlob(name) for name in self.names if name.startswith(prefix or "")]
+
+
+def make_uploader(existing=()):
+    """Build an uploader around fake GCS objects without touching credentials"""
+    uploader = GCSVideoUploader.__new__(GCSVideoUploader)
+    uploader.bucket_name = "test-bucket"
+    uploader.bucket = FakeBucket("test-bucket")
+    uploader.storage_client = FakeStorageClient(list(existing))
+    uploader.chunk_size = GCSVideoUploader._align_chunk_size(256 * 1024)
+    uploader._known_blobs = set()
+    uploader._index_lock = threading.Lock()
+    uploader.index_hits = 0
+    uploader.index_misses = 0
+    uploader.limiter = ServiceLimiter("gcs", base_delay=0.01)
+    uploader.http = GCSVideoUploader._build_session(4)
+    uploader.timeout = (5.0, 5.0)
+    uploader.transcoder = None
+    return uploader
+
+
+class TestStreamingUpload(unittest.TestCase):
+    """Test that TikTok videos are streamed into GCS in bounded chunks"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeVideoHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.video_url = f"http://127.0.0.1:{cls.server.server_address[1]}/video.mp4"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.uploader = make_uploader()
+
+    def video_json(self, url):
+        return {
+            "itemInfo": {"itemStruct": {"id": "42", "video": {"downloadAddr": url}}},
+            "$other": {"videoLinkHeaders": {}},
+        }
+
+    def test_upload_streams_in_chunks(self):
+        """The whole body arrives in GCS and no single write exceeds the chunk size"""
+        gcs_url = self.uploader.upload_tiktok_video_direct(self.video_json(self.video_url))
+
+        blob = self.uploader.bucket.blobs["tikapi_videos/42.mp4"]
+        self.assertEqual(gcs_url, "gs://test-bucket/tikapi_videos/42.mp4")
+        self.assertEqual(bytes(blob.data), VIDEO_BYTES)
+        self.assertTrue(blob.closed)
+        self.assertEqual(blob.open_args, ("wb", 256 * 1024, "video/mp4"))
+        self.assertLessEqual(blob.writer.max_write, self.uploader.chunk_size)
+
+    def test_chunk_size_is_aligned(self):
+        """Chunk sizes are rounded up to a multiple of 256 KiB"""
+        self.assertEqual(GCSVideoUploader._align_chunk_size(1), 256 * 1024)
+        self.assertEqual(GCSVideoUploader._align_chunk_size(300 * 1024), 512 * 1024)
+
+    def test_missing_download_addr(self):
+        """No upload is attempted without a download URL"""
+        self.assertIsNone(self.uploader.upload_tiktok_video_direct(self.video_json(None)))
+        self.assertTrue(all(blob.writer is None for blob in self.uploader.bucket.blobs.values()))
+
+    def test_existing_blob_is_not_reuploaded(self):
+        """A second upload of the same video is skipped and counted as a hit"""
+        first = self.uploader.upload_tiktok_video_direct(self.video_json(self.video_url))
+        second = self.uploader.upload_tiktok_video_direct(self.video_json("http://127.0.0.1:1/unreachable"))
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.uploader.get_index_stats()["hits"], 1)
+        self.assertEqual(self.uploader.get_index_stats()["misses"], 1)
+
+
+class TestDownloadSession(unittest.TestCase):
+    """Test the pooled download session and its timeouts"""
+
+    def video_json(self, video_id, url):
+        return {
+            "itemInfo": {"itemStruct": {"id": video_id, "video": {"downloadAddr": url}}},
+            "$other": {"videoLinkHeaders": {}},
+        }
+
+    def test_connections_are_reused(self):
+        """Consecutive downloads from one host share a keep-alive connection"""
+        server, url = serve(KeepAliveVideoHandler)
+        KeepAliveVideoHandler.connections.clear()
+        uploader = make_uploader()
+        try:
+            for video_id in ("1", "2", "3"):
+                self.assertIsNotNone(uploader.upload_tiktok_video_direct(self.video_json(video_id, url)))
+        finally:
+            uploader.close()
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(len(KeepAliveVideoHandler.connections), 1)
+
+    def test_stalled_download_times_out(self):
+        """A CDN that stops sending is abandoned after the read timeout"""
+        server, url = serve(StalledVideoHandler)
+        uploader = make_uploader()
+        uploader.limiter = ServiceLimiter("gcs", max_retries=0)
+        uploader.timeout = (1.0, 0.2)
+        start = time.monotonic()
+        try:
+            self.assertIsNone(uploader.upload_tiktok_video_direct(self.video_json("7", url)))
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertLess(time.monotonic() - start, 1.5)
+        self.assertTrue(uploader.bucket.blobs["tikapi_videos/7.mp4"].terminated)
+
+
+class CopyTranscoder(VideoTranscoder):
+    """
+    Runs a Python process that copies its input file to stdout (or fails) in place of ffmpeg.
+    Like ffmpeg with a non-faststart MP4, it seeks to the end of the input before reading it.
+    """
+
+    def __init__(self, exit_code=0, **kwargs):
+        super().__init__(**kwargs)
+        self.exit_code = exit_code
+
+    def command(self, source):
+        script = ("import shutil, sys; source = open(sys.argv[1], 'rb'); source.seek(-8, 2); source.seek(0); "
+                  "shutil.copyfileobj(source, sys.stdout.buffer); "
+                  f"sys.stderr.write('boom'); sys.exit({self.exit_code})")
+        return [sys.executable, "-c", script, source]
+
+
+class TestTranscodedUpload(unittest.TestCase):
+    """Test the optional transcoding stage between download and upload"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server, cls.video_url = serve(FakeVideoHandler)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.spool_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.spool_dir.cleanup()
+
+    def video_json(self, video_id="42"):
+        return {
+            "itemInfo": {"itemStruct": {"id": video_id, "video": {"downloadAddr": self.video_url}}},
+            "$other": {"videoLinkHeaders": {}},
+        }
+
+    def test_profile_is_part_of_blob_name(self):
+        """Transcoded videos are cached under a name that includes the profile"""
+        transcoder = VideoTranscoder(height=360, fps=15, max_seconds=30, crf=30)
+        uploader = make_uploader(existing=["tikapi_videos/1.mp4"])
+        uploader.transcoder = transcoder
+        uploader.warm_blob_index()
+
+        self.assertEqual(transcoder.name, "360p15_30s_crf30")
+        self.assertEqual(uploader.video_blob_name("1"), "tikapi_videos/1_360p15_30s_crf30.mp4")
+        self.assertIsNone(uploader.existing_video_uri("1"))
+        command = transcoder.command("/tmp/video.mp4")
+        self.assertIn("-t", command)
+        self.assertEqual(command[command.index("-i") + 1], "/tmp/video.mp4")
+
+    def test_output_is_streamed_into_blob(self):
+        """The download is piped through the transcoder process into the blob"""
+        uploader = make_uploader()
+        uploader.transcoder = CopyTranscoder(name="copy")
+
+        gcs_url = uploader.upload_tiktok_video_direct(self.video_json())
+
+        blob = uploader.bucket.blobs["tikapi_videos/42_copy.mp4"]
+        self.assertEqual(gcs_url, "gs://test-bucket/tikapi_videos/42_copy.mp4")
+        self.assertEqual(bytes(blob.data), VIDEO_BYTES)
+        self.assertTrue(blob.closed)
+        self.assertLessEqual(blob.writer.max_write, uploader.chunk_size)
+
+    def test_failed_transcode_uploads_original(self):
+        """A transcoder failure discards its partial output and uploads the original video"""
+        uploader = make_uploader()
+        uploader.transcoder = CopyTranscoder(exit_code=1, name="broken", spool_dir=self.spool_dir.name)
+
+        gcs_url = uploader.upload_tiktok_video_direct(self.video_json())
+
+        transcoded = uploader.bucket.blobs["tikapi_videos/42_broken.mp4"]
+        original = uploader.bucket.blobs["tikapi_videos/42.mp4"]
+        self.assertEqual(gcs_url, "gs://test-bucket/tikapi_videos/42.mp4")
+        self.assertTrue(transcoded.terminated)
+        self.assertFalse(transcoded.closed)
+        self.assertTrue(original.closed)
+        self.assertEqual(bytes(original.data), VIDEO_BYTES)
+        self.assertEqual(os.listdir(self.spool_dir.name), [])
+        # The original is never mistaken for the transcoded copy on a later run
+        self.assertIsNone(uploader.existing_video_uri("42"))
+        self.assertTrue(uploader.blob_exists("tikapi_videos/42.mp4"))
+
+    def test_fallback_reuses_uploaded_original(self):
+        """An original that is already in the bucket is not uploaded again"""
+        uploader = make_uploader(existing=["tikapi_videos/42.mp4"])
+        uploader.transcoder = CopyTranscoder(exit_code=1, name="broken")
+        uploader.warm_blob_index()
+
+        self.assertEqual(uploader.upload_tiktok_video_direct(self.video_json()), "gs://test-bucket/tikapi_videos/42.mp4")
+        self.assertNotIn("tikapi_videos/42.mp4", uploader.bucket.blobs)
+
+    def test_custom_blob_name_fails_without_fallback(self):
+        """Without a profile suffix to strip, a failed transcode fails the video"""
+        uploader = make_uploader()
+        uploader.transcoder = CopyTranscoder(exit_code=1, name="broken")
+
+        self.assertIsNone(uploader.upload_tiktok_video_direct(self.video_json(), blob_name="custom/42.mp4"))
+        self.assertTrue(uploader.bucket.blobs["custom/42.mp4"].terminated)
+        self.assertEqual(list(uploader.bucket.blobs), ["custom/42.mp4"])
+
+    def test_async_upload_spools_and_falls_back(self):
+        """The async upload spools the download for the transcoder and falls back the same way"""
+        uploader = make_uploader()
+
+        async def upload(transcoder, video_id):
+            uploader.transcoder = transcoder
+            async with httpx.AsyncClient() as client:
+                return await uploader.upload_tiktok_video_async(self.video_json(video_id), client)
+
+        for transcoder, blob_name in ((CopyTranscoder(name="copy"), "tikapi_videos/1_copy.mp4"),
+                                      (CopyTranscoder(exit_code=1, name="x"), "tikapi_videos/2.mp4")):
+            video_id = blob_name.split("/")[1][0]
+            self.assertEqual(asyncio.run(upload(transcoder, video_id)), f"gs://test-bucket/{blob_name}")
+            blob = uploader.bucket.blobs[blob_name]
+            self.assertEqual(bytes(blob.data), VIDEO_BYTES)
+            self.assertTrue(blob.closed)
+        self.assertTrue(uploader.bucket.blobs["tikapi_videos/2_x.mp4"].terminated)
+
+    def test_unreadable_spool_is_not_committed(self):
+        """If even the original cannot be uploaded, the resumable upload is cancelled"""
+        uploader = make_uploader()
+        uploader.transcoder = CopyTranscoder(exit_code=1, name="broken")
+        uploader._restart_with_original = lambda blob, source, error: (_ for _ in ()).throw(OSError("disk"))
+
+        self.assertIsNone(uploader.upload_tiktok_video_direct(self.video_json()))
+        blob = uploader.bucket.blobs["tikapi_videos/42_broken.mp4"]
+        self.assertTrue(blob.terminated)
+        self.assertFalse(blob.closed)
+
+    def test_failed_fallback_keeps_its_error(self):
+        """The transcode's upload is terminated once, so the fallback's own error surfaces"""
+        uploader = make_uploader()
+        uploader.transcoder = CopyTranscoder(exit_code=1, name="broken")
+        uploader._restart_with_original = lambda blob, source, error: (_ for _ in ()).throw(OSError("disk"))
+
+        with uploader.http.get(self.video_url, stream=True) as resp:
+            with self.assertRaisesRegex(OSError, "disk"):
+                uploader._stream_to_blob(resp, uploader.bucket.blob("tikapi_videos/42_broken.mp4"))
+
+        async def transfer():
+            async with httpx.AsyncClient() as client:
+                await uploader._transfer_async(client, self.video_url, {}, "tikapi_videos/43_broken.mp4")
+
+        with self.assertRaisesRegex(OSError, "disk"):
+            asyncio.run(transfer())
+
+    @unittest.skipUnless(VideoTranscoder().available(), "ffmpeg is not installed")
+    def test_ffmpeg_reads_non_faststart_mp4(self):
+        """An MP4 whose moov atom is at the end (not demuxable from a pipe) is transcoded"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "moov_last.mp4")
+            subprocess.run(
+                ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "testsrc=size=640x360:rate=30",
+                 "-t", "2", "-c:v", "libx264", "-preset", "ultrafast", path],
+                check=True
+            )
+            with open(path, "rb") as f:
+                source = f.read()
+        self.assertLess(source.find(b"mdat"), source.find(b"moov"))
+        output = bytearray()
+
+        transcoder = VideoTranscoder(height=180, fps=10)
+        with transcoder.spool(source[i:i + 64 * 1024] for i in range(0, len(source), 64 * 1024)) as spooled:
+            written = transcoder.transcode_file(spooled, output.extend)
+
+        self.assertEqual(written, len(output))
+        self.assertEqual(bytes(output[4:8]), b"ftyp")
+
+    @unittest.skipUnless(VideoTranscoder().available(), "ffmpeg is not installed")
+    def test_ffmpeg_downsamples_and_trims(self):
+        """A real ffmpeg run produces a shorter, smaller fragmented MP4"""
+        source = subprocess.run(
+            ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "testsrc=size=1280x720:rate=30",
+             "-t", "4", "-c:v", "libx264", "-preset", "ultrafast",
+             "-movflags", "frag_keyframe+empty_moov", "-f", "mp4", "pipe:1"],
+            capture_output=True, check=True
+        ).stdout
+        output = bytearray()
+
+        transcoder = VideoTranscoder(height=180, fps=10, max_seconds=1)
+        with transcoder.spool(source[i:i + 64 * 1024] for i in range(0, len(source), 64 * 1024)) as spooled:
+            written = transcoder.transcode_file(spooled, output.extend)
+
+        self.assertEqual(written, len(output))
+        self.assertEqual(bytes(output[4:8]), b"ftyp")
+        self.assertLess(len(output), len(source))
+
+
+class TestBlobIndex(unittest.TestCase):
+    """Test the in-process index of videos already in the bucket"""
+
+    def test_warm_index_uses_one_listing(self):
+        """Warming lists the bucket once and answers lookups without metadata requests"""
+        uploader = make_uploader(existing=["tikapi_videos/1.mp4", "tikapi_videos/2.mp4", "other/3.mp4"])
+        self.assertEqual(uploader.warm_blob_index(), 2)
+
+        self.assertEqual(uploader.existing_video_uri("1"), "gs://test-bucket/tikapi_videos/1.mp4")
+        self.assertIsNone(uploader.existing_video_uri("3"))
+        self.assertEqual(uploader.storage_client.list_calls, 1)
+        self.assertNotIn("tikapi_videos/1.mp4", uploader.bucket.blobs)
+        self.assertEqual(uploader.get_index_stats()["hits"], 1)
+        self.assertEqual(uploader.get_index_stats()["misses"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+from google.cloud import videointelligence
+
+# Add parent directory to path to import from src
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from src.Cache import SQLiteCache
+from src.GoogleVideoAnalyzer import GoogleVideoAnalyzer
+from src.OperationPoller import OperationPoller
+from src.RateLimiter import ServiceLimiter
+
+Feature = videointelligence.Feature
+
+
+def make_annotation_result(seconds=30):
+    """A small annotation result with every feature filled in"""
+    return videointelligence.VideoAnnotationResults(
+        segment={"start_time_offset": {"seconds": 0}, "end_time_offset": {"seconds": seconds}},
+        segment_label_annotations=[{"entity": {"description": "Dance"}, "category_entities": [{"description": "Outdoor"}]}],
+        frame_label_annotations=[{"entity": {"description": "Smile"}}],
+        shot_annotations=[{"start_time_offset": {"seconds": 0}, "end_time_offset": {"seconds": 5}}],
+        object_annotations=[{
+            "entity": {"description": "person"},
+            "confidence": 0.8,
+            "frames": [
+                {"time_offset": {"seconds": 1}, "normalized_bounding_box": {"left": 0.1, "right": 0.5}},
+                {"time_offset": {"seconds": 1, "nanos": 500000000}, "normalized_bounding_box": {"top": 0.2}},
+            ],
+        }],
+        text_annotations=[{"text": "@mj", "segments": [{
+            "confidence": 0.9,
+            "segment": {"start_time_offset": {"seconds": 1}, "end_time_offset": {"seconds": 2}},
+            "frames": [
+                {"time_offset": {"seconds": 1},
+                 "rotated_bounding_box": {"vertices": [{"x": 0.1, "y": 0.2}, {"x": 0.3, "y": 0.2},
+                                                       {"x": 0.3, "y": 0.4}, {"x": 0.1, "y": 0.4}]}},
+                {"time_offset": {"seconds": 2}},
+            ],
+        }]}],
+        explicit_annotation={"frames": [{"time_offset": {"seconds": 1}, "pornography_likelihood": 1}]},
+    )
+
+
+def make_analyzer(feature_profile="full"):
+    """Build an analyzer around a mocked Video Intelligence client"""
+    analyzer = GoogleVideoAnalyzer.__new__(GoogleVideoAnalyzer)
+    analyzer.client = MagicMock()
+    analyzer.cache = None
+    analyzer.limiter = ServiceLimiter("video_intelligence")
+    analyzer.profiles = dict(GoogleVideoAnalyzer.FEATURE_PROFILES)
+    analyzer.feature_profile = feature_profile
+    analyzer.parse_mode = "summary"
+    analyzer.poller = OperationPoller(initial_delay=0.0)
+    analyzer._profile_stats = {}
+    analyzer._stats_lock = threading.Lock()
+
+    response = videointelligence.AnnotateVideoResponse(annotation_results=[make_annotation_result()])
+    analyzer.client.annotate_video.return_value.result.return_value = response
+    return analyzer
+
+
+class TestFeatureProfiles(unittest.TestCase):
+    """Test the named feature profiles and their per-profile stats"""
+
+    def test_profiles_request_their_features(self):
+        """Each profile sends only its own features and label mode"""
+        analyzer = make_analyzer()
+        features, context = analyzer._request_config("fast")
+        self.assertEqual(features, [Feature.LABEL_DETECTION])
+        self.assertEqual(context.label_detection_config.label_detection_mode.name, "SHOT_MODE")
+
+        features, context = analyzer._request_config("full")
+        self.assertEqual(len(features), 5)
+        self.assertEqual(context.label_detection_config.label_detection_mode.name, "SHOT_AND_FRAME_MODE")
+
+    def test_unknown_profile(self):
+        """Unknown profiles raise ValueError"""
+        with self.assertRaises(ValueError):
+            make_analyzer()._request_config("cheapest")
+
+    def test_parser_skips_unrequested_features(self):
+        """Only the sections of requested features are parsed"""
+        analyzer = make_analyzer()
+        result = make_annotation_result()
+
+        fast = analyzer._parse_annotation_result(result, [Feature.LABEL_DETECTION])
+        self.assertEqual(fast["segment_labels"], ["Dance"])
+        self.assertEqual(fast["environment_guess"], "outdoors")
+        for key in ("shots", "objects", "texts", "explicit_content"):
+            self.assertNotIn(key, fast)
+
+        full = analyzer._parse_annotation_result(result)
+        self.assertEqual(full["objects"][0]["object_description"], "person")
+        self.assertEqual(full["texts"][0]["text"], "@mj")
+        self.assertEqual(len(full["shots"]), 1)
+
+    def test_stats_per_profile(self):
+        """Latency, video minutes and estimated cost are recorded per profile"""
+        analyzer = make_analyzer()
+        analyzer.analyze_videos_in_batch(["gs://b/tikapi_videos/1.mp4", "gs://b/tikapi_videos/2.mp4"], profile="fast")
+        analyzer.analyze_videos_in_batch(["gs://b/tikapi_videos/3.mp4"])
+
+        stats = analyzer.profile_stats()
+        self.assertEqual(stats["fast"]["videos"], 2)
+        self.assertEqual(stats["fast"]["video_minutes"], 1.0)
+        self.assertAlmostEqual(stats["fast"]["estimated_cost_usd"], 0.10)
+        self.assertEqual(stats["full"]["videos"], 1)
+        self.assertAlmostEqual(stats["full"]["estimated_cost_usd"], 0.5 * 0.55)
+        request = analyzer.client.annotate_video.call_args_list[0].kwargs["request"]
+        self.assertEqual(list(request.features), [Feature.LABEL_DETECTION])
+
+    def test_latency_includes_start_request(self):
+        """The recorded latency counts the annotate_video start request, including any backoff"""
+        analyzer = make_analyzer()
+        operation = analyzer.client.annotate_video.return_value
+        analyzer.client.annotate_video.side_effect = lambda request: time.sleep(0.05) or operation
+
+        analyzer.analyze_videos_in_batch(["gs://b/tikapi_videos/1.mp4"], profile="fast")
+        self.assertGreaterEqual(analyzer.profile_stats()["fast"]["mean_latency_seconds"], 0.05)
+
+
+class TestParseModes(unittest.TestCase):
+    """Test the summary and geometry parse modes"""
+
+    def test_summary_drops_geometry(self):
+        """Summary results keep counts, spans and confidences but no frames"""
+        analysis = make_analyzer()._parse_annotation_result(make_annotation_result())
+
+        obj = analysis["objects"][0]
+        self.assertEqual(obj["object_description"], "person")
+        self.assertEqual(obj["frame_count"], 2)
+        self.assertAlmostEqual(obj["confidence"], 0.8, places=5)
+        self.assertNotIn("frames", obj)
+        segment = analysis["texts"][0]["text_segments"][0]
+        self.assertEqual((segment["segment_start"], segment["segment_end"], segment["frame_count"]), (1.0, 2.0, 2))
+        self.assertEqual(analysis["explicit_content"][0]["pornography_likelihood"], "VERY_UNLIKELY")
+
+    def test_geometry_as_arrays(self):
+        """Geometry mode adds compact float32 arrays per object and text segment"""
+        analysis = make_analyzer()._parse_annotation_result(make_annotation_result(), parse_mode="geometry")
+
+        obj = analysis["objects"][0]
+        np.testing.assert_allclose(obj["frame_times"], [1.0, 1.5])
+        self.assertEqual(obj["bounding_boxes"].shape, (2, 4))
+        self.assertEqual(obj["bounding_boxes"].dtype, np.float32)
+        np.testing.assert_allclose(obj["bounding_boxes"][0], [0.1, 0.0, 0.5, 0.0])
+        polygons = analysis["texts"][0]["text_segments"][0]["polygons"]
+        self.assertEqual(polygons.shape, (2, 4, 2))
+        np.testing.assert_allclose(polygons[0, 2], [0.3, 0.4])
+        self.assertFalse(polygons[1].any())
+
+    def test_geometry_is_not_cached(self):
+        """Summary results are cached; geometry requests always reach the API"""
+        analyzer = make_analyzer()
+        analyzer.cache = SQLiteCache(":memory:")
+        uri = "gs://b/tikapi_videos/1.mp4"
+
+        analyzer.analyze_videos_in_batch([uri])
+        analyzer.analyze_videos_in_batch([uri])
+        self.assertEqual(analyzer.client.annotate_video.call_count, 1)
+
+        result = analyzer.analyze_videos_in_batch([uri], parse_mode="geometry")
+        self.assertEqual(analyzer.client.annotate_video.call_count, 2)
+        self.assertIn("bounding_boxes", result[0]["analysis"]["objects"][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
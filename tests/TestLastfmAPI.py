@@ -0,0 +1,151 @@
+import concurrent.futures
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+# Add parent directory to path to import from src
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from src.Cache import LRUCache, SQLiteCache
+from src.LastfmAPI import LastfmAPI
+from src.RateLimiter import ServiceLimiter
+
+
+def similar(*tracks):
+    return [SimpleNamespace(item=SimpleNamespace(title=title, artist=SimpleNamespace(name=artist)), match=0.9)
+            for title, artist in tracks]
+
+
+def make_api(delay=0.0, **kwargs):
+    """An API whose network returns one similar track and one tag for every seed, counting requests"""
+    kwargs.setdefault("rate_limiter", ServiceLimiter("lastfm"))
+    api = LastfmAPI("test-key", "test-secret", **kwargs)
+    api.network = MagicMock()
+    api.requests = 0
+    lock = threading.Lock()
+
+    def get_track(artist, song):
+        def get_similar(limit):
+            with lock:
+                api.requests += 1
+            time.sleep(delay)
+            return similar((f"{song} (remix)", artist))
+
+        def get_top_tags(limit):
+            with lock:
+                api.requests += 1
+            return [SimpleNamespace(item=SimpleNamespace(name="pop"))]
+
+        return SimpleNamespace(get_similar=get_similar, get_top_tags=get_top_tags)
+
+    api.network.get_track.side_effect = get_track
+    return api
+
+
+class TestLastfmCache(unittest.TestCase):
+    """Test cached, coalesced Last.fm lookups"""
+
+    def test_results_survive_a_restart(self):
+        """A lookup cached in SQLite is answered without a request by a new instance"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.sqlite")
+            first = make_api(cache=SQLiteCache(path, table="lastfm"))
+            expected = [("Billie Jean (remix)", "Michael Jackson")]
+            self.assertEqual(first.get_similar_tracks("Billie Jean", "Michael Jackson", limit=3), expected)
+            self.assertEqual(first.get_similar_tracks_scored("Billie Jean", "Michael Jackson", limit=3),
+                             [("Billie Jean (remix)", "Michael Jackson", 0.9)])
+            self.assertEqual(first.requests, 1)
+
+            second = make_api(cache=SQLiteCache(path, table="lastfm"))
+            self.assertEqual(second.get_similar_tracks("billie jean", "Michael  Jackson", limit=3), expected)
+            self.assertEqual(second.requests, 0)
+            # A different limit is a different lookup
+            second.get_similar_tracks("Billie Jean", "Michael Jackson", limit=5)
+            self.assertEqual(second.requests, 1)
+
+    def test_per_method_ttls(self):
+        """Each method's results are cached for its own TTL; empty results for at most a day"""
+        cache = MagicMock()
+        cache.get.return_value = None
+        api = make_api(cache=cache, ttls={"track_tags": 60})
+        api.get_track_tags("Billie Jean", "Michael Jackson")
+        api.get_similar_tracks("Billie Jean", "Michael Jackson")
+        self.assertEqual([call.kwargs["ttl_seconds"] for call in cache.set.call_args_list],
+                         [60, LastfmAPI.DEFAULT_TTLS["similar_tracks"]])
+
+        api.network.get_track.side_effect = None
+        api.network.get_track.return_value.get_similar.return_value = []
+        api.get_similar_tracks("Unknown", "Nobody")
+        self.assertEqual(cache.set.call_args.kwargs["ttl_seconds"], LastfmAPI.EMPTY_TTL)
+
+    def test_concurrent_lookups_are_coalesced(self):
+        """Concurrent identical lookups share one request"""
+        api = make_api(delay=0.2, cache=LRUCache())
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: api.get_similar_tracks("Thriller", "Michael Jackson"), range(8)))
+
+        self.assertEqual(api.requests, 1)
+        self.assertTrue(all(result == results[0] for result in results))
+        self.assertEqual(api.cache_stats()["coalesced"], 7)
+
+    def test_errors_are_shared_but_not_cached(self):
+        api = make_api(cache=LRUCache())
+        api.network.get_track.side_effect = RuntimeError("boom")
+        with self.assertRaises(RuntimeError):
+            api.get_track_tags("Thriller", "Michael Jackson")
+        self.assertEqual(len(api.cache), 0)
+
+
+class TestLastfmBatch(unittest.TestCase):
+    """Test resolving many seeds at once"""
+
+    def test_seeds_are_resolved_concurrently(self):
+        api = make_api(delay=0.1, batch_workers=8)
+        seeds = [(f"Song {i}", "Artist") for i in range(8)]
+        start = time.perf_counter()
+        results = api.get_seed_info_batch(seeds + seeds[:2])
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(set(results), set(seeds))
+        self.assertEqual(results[("Song 3", "Artist")],
+                         {"similar_tracks": [("Song 3 (remix)", "Artist")], "tags": ["pop"]})
+        self.assertEqual(api.requests, 16)
+        self.assertLess(elapsed, 0.5)
+
+    def test_failures_are_reported_per_seed(self):
+        api = make_api()
+        get_similar_tracks = api.get_similar_tracks
+
+        def flaky(song, artist, limit=5):
+            if song == "Bad":
+                raise RuntimeError("not found")
+            return get_similar_tracks(song, artist, limit=limit)
+
+        api.get_similar_tracks = flaky
+        results = api.get_seed_info_batch([("Good", "A"), ("Bad", "B")], include_tags=False)
+        self.assertEqual(results[("Bad", "B")], {"similar_tracks": None})
+        self.assertEqual(results[("Good", "A")], {"similar_tracks": [("Good (remix)", "A")]})
+
+    def test_warm_artists(self):
+        """Popular artists are warmed through their top tracks"""
+        api = make_api(cache=LRUCache())
+        api.network.get_artist.return_value.get_top_tracks.return_value = [
+            SimpleNamespace(item=SimpleNamespace(title="Thriller"), weight=10),
+            SimpleNamespace(item=SimpleNamespace(title="Bad"), weight=5),
+        ]
+        self.assertEqual(api.warm_artists(["Michael Jackson"]), 2)
+
+        requests = api.requests
+        api.get_similar_tracks("Thriller", "Michael Jackson")
+        api.get_track_tags("Bad", "Michael Jackson")
+        self.assertEqual(api.requests, requests)
+
+
+if __name__ == '__main__':
+    unittest.main()
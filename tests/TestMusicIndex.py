@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+import unittest.mock
+
+# Add parent directory to path to import from src
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from src.MusicIndex import MusicIDIndex
+
+
+class TestMusicIDIndex(unittest.TestCase):
+    """Test cases for the persistent song -> TikTok music ID index"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "index.sqlite")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_lookup_is_normalized_and_persistent(self):
+        """Entries survive a reopen and match regardless of case and spacing"""
+        MusicIDIndex(self.path).record("Beat It", "Michael Jackson", "123")
+        index = MusicIDIndex(self.path)
+
+        self.assertEqual(index.lookup(" beat  it", "MICHAEL JACKSON")["music_id"], "123")
+        self.assertIsNone(index.lookup("Thriller", "Michael Jackson"))
+        self.assertEqual((index.hits, index.misses), (1, 1))
+
+    def test_negative_entries_expire_sooner(self):
+        """A cached "no match" is returned until its shorter TTL runs out"""
+        index = MusicIDIndex(self.path, ttl_seconds=3600, negative_ttl_seconds=0.05)
+        index.record("Unknown Song", "Nobody", None)
+        index.record("Beat It", "Michael Jackson", "123")
+
+        self.assertEqual(index.lookup("Unknown Song", "Nobody"), {"music_id": None, "resolved_at": unittest.mock.ANY})
+        self.assertEqual(index.negative_hits, 1)
+        time.sleep(0.1)
+        self.assertIsNone(index.lookup("Unknown Song", "Nobody"))
+        self.assertEqual(index.lookup("Beat It", "Michael Jackson")["music_id"], "123")
+        self.assertEqual(index.purge_expired(), 1)
+
+    def test_csv_round_trip(self):
+        """A catalog can be imported from and exported to CSV"""
+        catalog = os.path.join(self.tmpdir.name, "catalog.csv")
+        with open(catalog, "w", encoding="utf-8") as file:
+            file.write("song,artist,music_id\nBeat It,Michael Jackson,123\nThriller,Michael Jackson,\n,Nobody,9\n")
+
+        index = MusicIDIndex(self.path)
+        self.assertEqual(index.import_csv(catalog), 2)
+        self.assertIsNone(index.lookup("Thriller", "Michael Jackson")["music_id"])
+
+        exported = os.path.join(self.tmpdir.name, "export.csv")
+        self.assertEqual(index.export_csv(exported, include_negative=False), 1)
+        with open(exported, encoding="utf-8") as file:
+            self.assertEqual(file.read().splitlines(), ["song,artist,music_id", "Beat It,Michael Jackson,123"])
+
+
+if __name__ == '__main__':
+    unittest.main()
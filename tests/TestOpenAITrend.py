@@ -0,0 +1,227 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+# Add parent directory to path to import from src
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from src.Cache import LRUCache, SQLiteCache
+from src.RateLimiter import ServiceLimiter
+from src.OpenAITrend import OpenAITrendSummarizer, SummaryError
+from src.TrendCompactor import TrendCompactor
+
+
+def completion(text, tokens=120):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+        usage=SimpleNamespace(total_tokens=tokens),
+    )
+
+
+class TestSummaryCache(unittest.TestCase):
+    """Test cases for caching OpenAI trend summaries"""
+
+    def make_summarizer(self, cache, **kwargs):
+        summarizer = OpenAITrendSummarizer(api_key="test-key", cache=cache, **kwargs)
+        summarizer.client = MagicMock()
+        summarizer.client.chat.completions.create.return_value = completion("Dance brief")
+        return summarizer
+
+    def test_equivalent_trends_hit_the_cache(self):
+        """Reordered and duplicated items map to the same cached summary"""
+        summarizer = self.make_summarizer(LRUCache())
+        first = summarizer.summarize_trends({"label_trends": ["Dance", "Music"], "text_trends": ["@mj"]})
+        second = summarizer.summarize_trends({"text_trends": ["@mj", "@mj"], "label_trends": ["Music", "Dance"]})
+
+        self.assertEqual(first, second)
+        self.assertEqual(summarizer.client.chat.completions.create.call_count, 1)
+        stats = summarizer.cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["tokens_used"], 120)
+        self.assertEqual(stats["tokens_saved"], 120)
+
+    def test_model_and_temperature_are_part_of_the_key(self):
+        """Different sampling settings never share a cached summary"""
+        trends = {"label_trends": ["Dance"]}
+        cold = self.make_summarizer(None, temperature=0.7)
+        warm = self.make_summarizer(None, temperature=0.2)
+        self.assertNotEqual(cold.cache_key(trends), warm.cache_key(trends))
+
+    def test_errors_are_raised_and_not_cached(self):
+        """A failed completion raises SummaryError and is retried on the next call"""
+        summarizer = self.make_summarizer(SQLiteCache(":memory:"))
+        summarizer.client.chat.completions.create.side_effect = [RuntimeError("429"), completion("Dance brief")]
+
+        with self.assertRaisesRegex(SummaryError, "429"):
+            summarizer.summarize_trends({"label_trends": ["Dance"]})
+        self.assertEqual(summarizer.summarize_trends({"label_trends": ["Dance"]}), "Dance brief")
+
+    def test_exhausted_retries_raise(self):
+        """Once the limiter's retries are used up, the sync and async calls raise SummaryError"""
+        summarizer = self.make_summarizer(None, rate_limiter=ServiceLimiter("openai", max_retries=1, base_delay=0))
+        throttled = type("RateLimitError", (Exception,), {})("429")
+        summarizer.client.chat.completions.create.side_effect = throttled
+        summarizer.async_client = MagicMock()
+        summarizer.async_client.chat.completions.create = AsyncMock(side_effect=throttled)
+
+        with self.assertRaises(SummaryError):
+            summarizer.summarize_trends({"label_trends": ["Dance"]})
+        with self.assertRaises(SummaryError):
+            asyncio.run(summarizer.asummarize_trends({"label_trends": ["Dance"]}))
+        with self.assertRaises(SummaryError):
+            summarizer.summarize_batch([("a", {"label_trends": ["Dance"]})], {"label_trends": ["Dance"]})
+        self.assertEqual(summarizer.client.chat.completions.create.call_count, 4)
+        self.assertEqual(summarizer.limiter.stats()["failures"], 3)
+
+    def test_token_counters_under_concurrency(self):
+        """Concurrent summary workers never lose token counter updates"""
+        summarizer = self.make_summarizer(LRUCache())
+        summarizer.cache.set("hit", {"summary": "Dance brief", "tokens": 1})
+
+        def work():
+            for _ in range(2000):
+                summarizer._cache_store("miss", "", 1)
+                summarizer._cache_lookup("hit")
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=work) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(switch_interval)
+        stats = summarizer.cache_stats()
+        self.assertEqual((stats["tokens_used"], stats["tokens_saved"]), (16000, 16000))
+
+    def test_cached_summary_is_streamed_at_once(self):
+        """A cache hit with a token hook delivers the whole summary as one token"""
+        summarizer = self.make_summarizer(LRUCache())
+        summarizer.summarize_trends({"label_trends": ["Dance"]})
+        tokens = []
+        summarizer.summarize_trends({"label_trends": ["Dance"]}, on_token=tokens.append)
+        self.assertEqual(tokens, ["Dance brief"])
+
+
+class TestBatchedSummaries(unittest.TestCase):
+    """Test cases for summarizing every track in one completion"""
+
+    def make_summarizer(self, content, cache=None):
+        summarizer = OpenAITrendSummarizer(api_key="test-key", cache=cache)
+        summarizer.client = MagicMock()
+        summarizer.client.chat.completions.create.return_value = completion(content, tokens=400)
+        return summarizer
+
+    def test_one_call_for_all_tracks(self):
+        """Track briefs come back in request order, even if the model reorders them"""
+        content = json.dumps({
+            "tracks": [{"track": 2, "brief": "Thriller brief"}, {"track": 1, "brief": "Beat It brief"}],
+            "overall": "Overall brief",
+        })
+        summarizer = self.make_summarizer(content)
+        tracks, overall = summarizer.summarize_batch(
+            [("'Beat It' by MJ", {"label_trends": ["Dance"]}), ("'Thriller' by MJ", {"label_trends": ["Zombie"]})],
+            {"label_trends": ["Dance", "Zombie"]}
+        )
+
+        self.assertEqual(tracks, ["Beat It brief", "Thriller brief"])
+        self.assertEqual(overall, "Overall brief")
+        kwargs = summarizer.client.chat.completions.create.call_args.kwargs
+        self.assertEqual(kwargs["response_format"], {"type": "json_object"})
+        self.assertEqual(kwargs["max_tokens"], summarizer.max_tokens * 3)
+        self.assertEqual(summarizer.client.chat.completions.create.call_count, 1)
+
+    def test_missing_track_and_malformed_json(self):
+        """A response missing a track's brief, or with unusable JSON, returns None"""
+        summarizer = self.make_summarizer(json.dumps({"tracks": [], "overall": "Overall brief"}))
+        self.assertIsNone(summarizer.summarize_batch([("a", {"label_trends": ["Dance"]})], {"label_trends": ["Dance"]}))
+
+        summarizer = self.make_summarizer("not json")
+        self.assertIsNone(summarizer.summarize_batch([("a", {"label_trends": ["Dance"]})], {"label_trends": ["Dance"]}))
+
+    def test_batch_is_cached(self):
+        """Repeating the same batch is served from the cache"""
+        summarizer = self.make_summarizer(json.dumps({"tracks": [{"track": 1, "brief": "A"}], "overall": "B"}), LRUCache())
+        args = ([("a", {"label_trends": ["Dance"]})], {"label_trends": ["Dance"]})
+        self.assertEqual(summarizer.summarize_batch(*args), summarizer.summarize_batch(*args))
+        self.assertEqual(summarizer.client.chat.completions.create.call_count, 1)
+        self.assertEqual(summarizer.tokens_saved, 400)
+
+
+class TestTrendCompaction(unittest.TestCase):
+    """Test cases for compacting trends before they reach the prompt"""
+
+    def test_dedupe_rank_and_truncate(self):
+        """Items shared by several tracks come first; long OCR text is truncated"""
+        compactor = TrendCompactor(max_prompt_tokens=None, max_item_chars=20)
+        trends = {
+            "label_trends": ["Music", "Dance", "dance ", "Dance", "Music"],
+            "text_trends": ["follow   for part 2 and more of this song", "@mj"],
+        }
+        compacted, report = compactor.compact(trends)
+
+        self.assertEqual(compacted["label_trends"], ["Dance", "Music"])
+        self.assertEqual(compacted["text_trends"], ["follow for part 2 a…", "@mj"])
+        self.assertEqual(report["duplicates_removed"], 3)
+        self.assertEqual(report["truncated"], 1)
+        self.assertEqual((report["items_in"], report["items_out"]), (7, 4))
+
+    def test_budget_keeps_most_frequent_items(self):
+        """Under a tight budget the rarest items are dropped first"""
+        compactor = TrendCompactor(max_prompt_tokens=12)
+        trends = {"label_trends": ["Dance"] * 3 + ["Rare item number one", "Rare item number two", "Music", "Music"]}
+        compacted, report = compactor.compact(trends)
+
+        self.assertEqual(compacted["label_trends"][:2], ["Dance", "Music"])
+        self.assertLessEqual(report["tokens_after"], 12)
+        self.assertGreater(report["dropped"], 0)
+        self.assertLess(report["tokens_after"], report["tokens_before"])
+
+    def test_budget_trim_is_logarithmic(self):
+        """When per-item estimates undercount, the cut point is bisected rather than popped item by item"""
+        compactor = TrendCompactor(max_prompt_tokens=500)
+        calls = []
+        count_tokens = compactor.count_tokens
+        compactor.count_tokens = lambda text: calls.append(text) or count_tokens(text)
+        # Brackets and separators cost tokens the per-item estimate does not charge for
+        render = lambda trends: "\n".join(f"{category}: " + " ; ".join(f"[{item}]" for item in items)
+                                         for category, items in trends.items())
+        trends = {"text_trends": [f"caption{i}" for i in range(2000)]}
+
+        compacted, report = compactor.compact(trends, render=render)
+
+        kept = compacted["text_trends"]
+        self.assertLessEqual(report["tokens_after"], 500)
+        self.assertGreater(count_tokens(render({"text_trends": kept + ["caption1999"]})), 500)
+        self.assertEqual(kept, [f"caption{i}" for i in range(len(kept))])
+        # Per-item costs plus ~log2(n) prompt renders, not one render per dropped item
+        prompt_renders = [text for text in calls if text.startswith("text_trends:")]
+        self.assertLess(len(prompt_renders), 20)
+
+    def test_summarizer_prompt_is_compacted(self):
+        """The summarizer budgets its full prompt and records what was trimmed"""
+        summarizer = OpenAITrendSummarizer(api_key="test-key", compactor=TrendCompactor(max_prompt_tokens=400))
+        summarizer.client = MagicMock()
+        summarizer.client.chat.completions.create.return_value = completion("Dance brief")
+        trends = {"text_trends": [f"caption {i} " + "word " * 30 for i in range(50)] + ["@mj"] * 3}
+        summarizer.summarize_trends(trends)
+
+        messages = summarizer.client.chat.completions.create.call_args.kwargs["messages"]
+        prompt = messages[0]["content"] + "\n" + messages[1]["content"]
+        self.assertLessEqual(summarizer.compactor.count_tokens(prompt), 400)
+        self.assertIn("Text Trends: @mj,", messages[1]["content"])
+        stats = summarizer.compaction_stats
+        self.assertEqual(stats["items_in"], 53)
+        self.assertLess(stats["prompt_tokens_after"], stats["prompt_tokens_before"])
+
+
+if __name__ == '__main__':
+    unittest.main()
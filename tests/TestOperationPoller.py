@@ -0,0 +1,102 @@
+import concurrent.futures
+import os
+import sys
+import threading
+import time
+import unittest
+
+# Add parent directory to path to import from src
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from src.OperationPoller import OperationPoller
+
+
+class FakeOperation:
+    """A long-running operation that finishes after a number of polls"""
+
+    def __init__(self, polls_needed=3, result="done", error=None):
+        self.polls_needed = polls_needed
+        self.polls = 0
+        self._result = result
+        self.error = error
+        self.cancelled = False
+        self.poll_threads = set()
+
+    def done(self):
+        self.polls += 1
+        self.poll_threads.add(threading.current_thread().name)
+        return self.polls >= self.polls_needed
+
+    def result(self):
+        if self.error is not None:
+            raise self.error
+        return self._result
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TestOperationPoller(unittest.TestCase):
+    """Test polling many operations from a single thread"""
+
+    def setUp(self):
+        self.poller = OperationPoller(initial_delay=0.001, multiplier=2.0, max_delay=0.01)
+
+    def tearDown(self):
+        self.poller.shutdown()
+
+    def test_results_are_delivered(self):
+        """Each Future resolves with its operation's result"""
+        operations = [FakeOperation(polls_needed=i % 4 + 1, result=i) for i in range(20)]
+        futures = [self.poller.track(operation) for operation in operations]
+
+        self.assertEqual([future.result(timeout=5) for future in futures], list(range(20)))
+        self.assertEqual(self.poller.stats()["completed"], 20)
+        self.assertEqual(self.poller.stats()["in_flight"], 0)
+
+    def test_thread_count_is_constant(self):
+        """Hundreds of operations are polled by one thread"""
+        threads_before = threading.active_count()
+        operations = [FakeOperation(polls_needed=5) for _ in range(300)]
+        futures = [self.poller.track(operation) for operation in operations]
+        concurrent.futures.wait(futures, timeout=10)
+
+        self.assertLessEqual(threading.active_count(), threads_before + 1)
+        self.assertEqual(set().union(*(operation.poll_threads for operation in operations)), {"operation-poller"})
+
+    def test_failed_operation(self):
+        """An operation error is raised from the Future"""
+        future = self.poller.track(FakeOperation(polls_needed=1, error=ValueError("bad video")))
+        with self.assertRaises(ValueError):
+            future.result(timeout=5)
+
+    def test_timeout_cancels_operation(self):
+        """An operation still running at its deadline is cancelled"""
+        operation = FakeOperation(polls_needed=10 ** 6)
+        future = self.poller.track(operation, timeout=0.05, name="slow")
+
+        with self.assertRaises(concurrent.futures.TimeoutError):
+            future.result(timeout=5)
+        self.assertTrue(operation.cancelled)
+        self.assertEqual(self.poller.stats()["timed_out"], 1)
+
+    def test_backoff_limits_polls(self):
+        """Delays between polls grow, so a slow operation is polled rarely"""
+        poller = OperationPoller(initial_delay=0.01, multiplier=2.0, max_delay=0.08)
+        operation = FakeOperation(polls_needed=10 ** 6)
+        future = poller.track(operation, timeout=0.3)
+        with self.assertRaises(concurrent.futures.TimeoutError):
+            future.result(timeout=5)
+        poller.shutdown()
+        # 0.01 + 0.02 + 0.04 + 0.08 + 0.08 + ... reaches 0.3 s after about 6 polls
+        self.assertLess(operation.polls, 10)
+
+    def test_pending_names(self):
+        """Operations in flight are listed by name"""
+        self.poller.track(FakeOperation(polls_needed=10 ** 6), name="gs://b/1.mp4")
+        self.assertEqual(self.poller.pending(), ["gs://b/1.mp4"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import sys
+import time
+import unittest
+from types import SimpleNamespace
+
+# Add parent directory to path to import from src
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from src.RateLimiter import RateLimiterRegistry, ServiceLimiter, TokenBucket, is_retryable
+
+
+class HTTPError(Exception):
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(status_code=status, headers=headers)
+
+
+def flaky(failures):
+    """Return a function that raises each exception in `failures` once, then returns "ok"."""
+    failures = list(failures)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if failures:
+            raise failures.pop(0)
+        return "ok"
+
+    fn.calls = calls
+    return fn
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Test cases for the token bucket"""
+
+    def test_burst_then_rate(self):
+        """The burst is free, further tokens arrive at the configured rate"""
+        bucket = TokenBucket(rate=20, burst=2)
+        start = time.monotonic()
+        waits = [bucket.acquire() for _ in range(5)]
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertGreaterEqual(elapsed, 3 / 20 - 0.01)
+
+    def test_limiter_counts_throttled_calls(self):
+        """Calls that had to wait for a token are counted"""
+        limiter = ServiceLimiter("tikapi", rate=50, burst=1)
+        for _ in range(3):
+            limiter.call(lambda: None)
+        stats = limiter.stats()
+        self.assertEqual(stats["calls"], 3)
+        self.assertEqual(stats["throttled"], 2)
+        self.assertGreater(stats["throttle_wait_seconds"], 0)
+
+
+class TestRetries(unittest.TestCase):
+    """Test cases for retries, backoff and the retry budget"""
+
+    def test_retries_throttled_requests(self):
+        """429 and 503 responses are retried until the call succeeds"""
+        limiter = ServiceLimiter("openai", base_delay=0.001)
+        fn = flaky([HTTPError(429), HTTPError(503)])
+
+        self.assertEqual(limiter.call(fn), "ok")
+        self.assertEqual(len(fn.calls), 3)
+        stats = limiter.stats()
+        self.assertEqual((stats["retries"], stats["rate_limited"], stats["failures"]), (2, 1, 0))
+
+    def test_client_errors_are_not_retried(self):
+        """A 404 or a programming error is raised immediately"""
+        limiter = ServiceLimiter("tikapi", base_delay=0.001)
+        fn = flaky([HTTPError(404)])
+        with self.assertRaises(HTTPError):
+            limiter.call(fn)
+        self.assertEqual(len(fn.calls), 1)
+        self.assertFalse(is_retryable(ValueError("bad input")))
+        self.assertTrue(is_retryable(SimpleNamespace(status="29")))
+
+    def test_max_retries_and_retry_after(self):
+        """Retries stop after max_retries, honoring Retry-After (capped by max_delay)"""
+        limiter = ServiceLimiter("lastfm", max_retries=1, base_delay=0.001, max_delay=0.05)
+        fn = flaky([HTTPError(429, retry_after=30)] * 3)
+        start = time.monotonic()
+        with self.assertRaises(HTTPError):
+            limiter.call(fn)
+
+        self.assertEqual(len(fn.calls), 2)
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_retry_budget(self):
+        """Once the budget is spent, failures are no longer retried"""
+        limiter = ServiceLimiter("gcs", base_delay=0.001, retry_budget_ratio=0.0, min_retries=1)
+        self.assertEqual(limiter.call(flaky([HTTPError(500)])), "ok")
+        with self.assertRaises(HTTPError):
+            limiter.call(flaky([HTTPError(500)]))
+        self.assertEqual(limiter.stats()["budget_exhausted"], 1)
+
+    def test_async_call(self):
+        """acall retries coroutine functions the same way"""
+        limiter = ServiceLimiter("openai", base_delay=0.001)
+        failures = [HTTPError(429)]
+
+        async def create():
+            if failures:
+                raise failures.pop()
+            return "ok"
+
+        self.assertEqual(asyncio.run(limiter.acall(create)), "ok")
+        self.assertEqual(limiter.stats()["retries"], 1)
+
+    def test_registry_settings(self):
+        """Service settings override the defaults, which override the built-in values"""
+        registry = RateLimiterRegistry({"default": {"max_retries": 5}, "openai": {"rate": 1, "max_retries": 2}})
+        self.assertEqual(registry.get("openai").max_retries, 2)
+        self.assertEqual(registry.get("openai").bucket.rate, 1)
+        self.assertEqual(registry.get("tikapi").max_retries, 5)
+        self.assertIn("lastfm", registry.stats())
+
+
+if __name__ == '__main__':
+    unittest.main()
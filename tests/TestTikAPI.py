@@ -0,0 +1,172 @@
+import concurrent.futures
+import os
+import sys
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+# Add parent directory to path to import from src
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from src.TikAPI import TikAPIWrapper
+from src.TextSimilarity import NgramVectorizer
+
+
+def music_response(title, author, count):
+    items = [{"id": f"v{i}", "music": {"title": title, "authorName": author}} for i in range(count)]
+    return SimpleNamespace(status_code=200, json=lambda: {"itemList": items})
+
+
+def make_wrapper(matching_id, delay=0.05, **kwargs):
+    """A wrapper whose music endpoint only returns the right song for `matching_id`"""
+    wrapper = TikAPIWrapper("test-key", **kwargs)
+    wrapper.api = MagicMock()
+    wrapper.active = 0
+    wrapper.peak = 0
+    lock = threading.Lock()
+
+    def music(id, count):
+        with lock:
+            wrapper.active += 1
+            wrapper.peak = max(wrapper.peak, wrapper.active)
+        time.sleep(delay)
+        with lock:
+            wrapper.active -= 1
+        if id == matching_id:
+            return music_response("Beat It", "Michael Jackson", count)
+        return music_response("Beat It (Cover)", "Someone Else", count)
+
+    wrapper.api.public.music.side_effect = music
+    return wrapper
+
+
+class TestFindMatchingSong(unittest.TestCase):
+    """Test cases for parallel, cached candidate verification"""
+
+    def test_candidates_are_verified_concurrently(self):
+        """Candidates run in parallel and the pending ones are cancelled after a match"""
+        wrapper = make_wrapper("m3", verify_workers=4)
+        ids = [f"m{i}" for i in range(40)]
+        start = time.perf_counter()
+        match = wrapper.find_matching_song("Beat It", "Michael Jackson", ids)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(match, "m3")
+        self.assertGreater(wrapper.peak, 1)
+        self.assertLessEqual(wrapper.peak, 4)
+        self.assertLess(wrapper.api.public.music.call_count, len(ids))
+        self.assertLess(elapsed, 0.05 * 4)
+
+    def test_best_ranked_match_wins(self):
+        """A lower-ranked candidate that matches faster does not beat a better-ranked match"""
+        wrapper = make_wrapper(None, delay=0)
+        delays = {"m1": 0.1, "m2": 0}
+
+        def music(id, count):
+            time.sleep(delays[id])
+            return music_response("Beat It", "Michael Jackson", count)
+
+        wrapper.api.public.music.side_effect = music
+        self.assertEqual(wrapper.find_matching_song("Beat It", "Michael Jackson", ["m1", "m2"]), "m1")
+
+    def test_no_match(self):
+        """All candidates are checked when none of them match"""
+        wrapper = make_wrapper("missing", delay=0)
+        self.assertIsNone(wrapper.find_matching_song("Beat It", "Michael Jackson", ["m1", "m2", "m3"]))
+        self.assertEqual(wrapper.api.public.music.call_count, 3)
+
+    def test_verified_videos_are_reused(self):
+        """Fetching videos for the matched ID afterwards needs no API call"""
+        wrapper = make_wrapper("m1", delay=0)
+        match = wrapper.find_matching_song("Beat It", "Michael Jackson", ["m1"])
+        calls = wrapper.api.public.music.call_count
+
+        videos = wrapper.fetch_music_videos(match, limit=3)
+        self.assertEqual(len(videos), 3)
+        self.assertEqual(wrapper.api.public.music.call_count, calls)
+
+        wrapper.fetch_music_videos(match, limit=10)
+        self.assertEqual(wrapper.api.public.music.call_count, calls + 1)
+
+    def test_custom_submit(self):
+        """Verifications can be scheduled on a caller-provided pool"""
+        wrapper = make_wrapper("m2", delay=0)
+        submitted = []
+
+        def submit(fn, *args):
+            submitted.append(args[2])
+            future = concurrent.futures.Future()
+            future.set_result(fn(*args))
+            return future
+
+        self.assertEqual(wrapper.find_matching_song("Beat It", "Michael Jackson", ["m1", "m2"], submit=submit), "m2")
+        self.assertEqual(submitted, ["m1", "m2"])
+
+
+def search_response(results):
+    data = [{"item": {"music": {"id": music_id, "title": title, "authorName": author}}}
+            for music_id, title, author in results]
+    return SimpleNamespace(json=lambda: {"data": data})
+
+
+class TestSearchRanking(unittest.TestCase):
+    """Test cases for ranking search candidates by their title and author"""
+
+    RESULTS = [
+        ("m1", "original sound", "dj"),
+        ("m2", "Beat It (Cover)", "Someone Else"),
+        ("m3", "Beat It", "Michael Jackson"),
+        ("m2", "Beat It (Cover)", "Someone Else"),
+    ]
+
+    def make_wrapper(self):
+        wrapper = make_wrapper("m3", delay=0)
+        wrapper.api.public.search.return_value = search_response(self.RESULTS)
+        return wrapper
+
+    def test_candidates_are_ranked(self):
+        """search_music returns each candidate once, best match first"""
+        wrapper = self.make_wrapper()
+        ids = wrapper.search_music("Beat It", "Michael Jackson", early_stop=False)
+        self.assertEqual(ids, ["m3", "m2", "m1"])
+
+    def test_match_from_search_metadata(self):
+        """A confident match from the search results needs no verification requests"""
+        wrapper = self.make_wrapper()
+        ids = wrapper.search_music("Beat It", "Michael Jackson", early_stop=False)
+        self.assertEqual(wrapper.find_matching_song("Beat It", "Michael Jackson", ids), "m3")
+
+        wrapper.api.public.music.assert_not_called()
+        self.assertEqual(wrapper.match_stats["resolved_from_search"], 1)
+        # The serial walk in search order would have fetched m1, m2 and m3
+        self.assertEqual(wrapper.match_stats["api_calls_saved"], 3)
+
+    def test_candidate_presence_from_search_hits(self):
+        """Each candidate counts the search hits using it and their plays"""
+        wrapper = self.make_wrapper()
+        data = search_response(self.RESULTS).json()
+        for entry, plays in zip(data["data"], (5, 100, 7, "n/a")):
+            entry["item"]["stats"] = {"playCount": plays}
+        wrapper.api.public.search.return_value = SimpleNamespace(json=lambda: data)
+        wrapper.search_music("Beat It", "Michael Jackson", early_stop=False)
+
+        self.assertEqual(wrapper.candidate_presence("m2"), {"videos": 2, "plays": 100})
+        self.assertEqual(wrapper.candidate_presence("m3"), {"videos": 1, "plays": 7})
+        self.assertEqual(wrapper.candidate_presence("unknown"), {"videos": 0, "plays": 0})
+        wrapper.api.public.music.assert_not_called()
+
+    def test_vectorized_similarity(self):
+        """N-gram scores behave like a fuzzy ratio"""
+        vectorizer = NgramVectorizer()
+        scores = vectorizer.scores("Beat It", ["beat  it", "Beat It (Remastered)", "Thriller", ""])
+        self.assertAlmostEqual(float(scores[0]), 1.0, places=5)
+        self.assertTrue(0.3 < scores[1] < 1.0)
+        self.assertLess(scores[2], 0.2)
+        self.assertEqual(float(scores[3]), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
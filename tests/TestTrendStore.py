@@ -0,0 +1,102 @@
+import os
+import sys
+import tempfile
+import unittest
+
+# Add parent directory to path to import from src
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from src.CompareFeatures import CompareFeatures
+from src.TrendStore import TrendStore
+
+DAY = 86400
+NOW = 1_700_000_000
+
+
+def features(labels=(), objects=(), texts=()):
+    return {"labels": list(labels), "objects": list(objects), "texts": list(texts)}
+
+
+class TestTrendStore(unittest.TestCase):
+    """Test the persistent, time-decayed trend tables"""
+
+    def setUp(self):
+        self.store = TrendStore(":memory:", half_life_days=7)
+
+    def test_support_per_sound_and_global(self):
+        """Features are counted once per video in the sound's scope and globally"""
+        self.store.add_video(features(labels=["Dance", "Dance"], objects=["person"]), sound="1", observed_at=NOW)
+        self.store.add_video(features(labels=["Dance"]), sound="1", observed_at=NOW)
+        self.store.add_video(features(labels=["Car"]), sound="2", observed_at=NOW)
+
+        sound = self.store.trends(["1"], now=NOW)
+        self.assertEqual(sound["label_trends"], [{"feature": "Dance", "videos": 2, "score": 2.0, "support": 1.0}])
+        self.assertEqual(sound["object_trends"][0]["support"], 0.5)
+
+        overall = self.store.trends(now=NOW)
+        self.assertEqual([t["feature"] for t in overall["label_trends"]], ["Dance", "Car"])
+        self.assertAlmostEqual(overall["label_trends"][0]["support"], 2 / 3)
+
+    def test_sounds_are_merged(self):
+        """Trends across several sounds combine their scopes"""
+        self.store.add_video(features(labels=["Dance"]), sound="1", observed_at=NOW)
+        self.store.add_video(features(labels=["Dance"]), sound="2", observed_at=NOW)
+        self.store.add_video(features(labels=["Car"]), sound="3", observed_at=NOW)
+
+        merged = self.store.trends(["1", "2"], min_support=0.5, now=NOW)
+        self.assertEqual([t["feature"] for t in merged["label_trends"]], ["Dance"])
+
+    def test_time_decay(self):
+        """Older videos weigh less: a feature seen a week ago counts half"""
+        self.store.add_video(features(labels=["Old"]), sound="1", observed_at=NOW - 7 * DAY)
+        self.store.add_video(features(labels=["New"]), sound="1", observed_at=NOW)
+
+        trends = self.store.trends(["1"], now=NOW)["label_trends"]
+        self.assertEqual([t["feature"] for t in trends], ["New", "Old"])
+        self.assertAlmostEqual(trends[1]["score"], 0.5)
+        self.assertAlmostEqual(self.store.video_weight(["1"], now=NOW), 1.5)
+        self.assertAlmostEqual(trends[0]["support"], 1 / 1.5)
+
+        # "Old" is dropped from both the sound scope and the global scope
+        self.assertEqual(self.store.purge(min_score=0.6, now=NOW), 2)
+        self.assertEqual([t["feature"] for t in self.store.trends(["1"], now=NOW)["label_trends"]], ["New"])
+
+    def test_decayed_rows_are_purged_periodically(self):
+        """Every purge_every add_videos calls, decayed features and sounds are dropped"""
+        store = TrendStore(":memory:", half_life_days=7, purge_min_score=0.01, purge_every=2)
+        store.add_videos([features(labels=["Old"])], sound="old", observed_at=NOW - 100 * DAY)
+        self.assertEqual(store.stats()["scopes"], 2)
+
+        store.add_videos([features(labels=["New"])], sound="new", observed_at=NOW)
+        self.assertEqual(store.stats()["scopes"], 2)
+        self.assertEqual(store.stats()["features"], 2)
+        self.assertEqual(store.video_weight(["old"], now=NOW), 0.0)
+        self.assertEqual([t["feature"] for t in store.trends(now=NOW)["label_trends"]], ["New"])
+
+    def test_videos_are_folded_once(self):
+        """Re-analyzing a video does not count it again"""
+        self.assertTrue(self.store.add_video(features(labels=["Dance"]), sound="1", video_id="v1"))
+        self.assertFalse(self.store.add_video(features(labels=["Dance"]), sound="1", video_id="v1"))
+        self.assertEqual(self.store.stats()["videos"], 1)
+
+    def test_persistence(self):
+        """The tables survive reopening the database"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trends.sqlite")
+            TrendStore(path).add_video(features(texts=["@mj"]), sound="1", observed_at=NOW)
+            self.assertEqual(TrendStore(path).trends(["1"], now=NOW)["text_trends"][0]["feature"], "@mj")
+
+    def test_compare_features_queries_store(self):
+        """CompareFeatures answers trend queries for sounds from the store"""
+        for labels in (["Dance", "Smile"], ["Dance"], ["Car"]):
+            self.store.add_video(features(labels=labels), sound="1")
+        comparator = CompareFeatures(threshold=0.5, store=self.store)
+
+        self.assertEqual(comparator.detect_trends(sounds=["1"])["label_trends"], ["Dance"])
+        with self.assertRaises(ValueError):
+            CompareFeatures().detect_trends(sounds=["1"])
+
+
+if __name__ == '__main__':
+    unittest.main()
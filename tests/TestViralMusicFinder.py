@@ -0,0 +1,536 @@
+import asyncio
+import concurrent.futures
+import os
+import subprocess
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+# Add parent directory to path to import from src
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from src.CompareFeatures import CompareFeatures
+from src.GoogleVideoAnalyzer import GoogleVideoAnalyzer
+from src.MusicIndex import MusicIDIndex
+from src.Scheduler import PipelineScheduler
+from src.OpenAITrend import SummaryError
+from src.TrendStore import TrendStore
+from src.ViralMusicFinder import ViralMusicFinder, DEFAULT_EXPANSION, candidate_score, lazy_client
+from src.AsyncViralMusicFinder import AsyncViralMusicFinder
+
+SIMILAR_TRACKS = [("Beat It", "Michael Jackson"), ("Thriller", "Michael Jackson")]
+
+
+def make_finder(scheduler=None):
+    """Build a ViralMusicFinder whose external clients are all mocks"""
+    finder = ViralMusicFinder.__new__(ViralMusicFinder)
+    finder.scheduler = scheduler or PipelineScheduler()
+    finder.summary_mode = "concurrent"
+    finder.music_index = None
+    finder.trend_store = None
+    finder.expansion = dict(DEFAULT_EXPANSION)
+
+    finder.music_api = MagicMock()
+    finder.music_api.get_similar_tracks_scored.return_value = [(song, artist, 0.9) for song, artist in SIMILAR_TRACKS]
+
+    finder.tiktok_api = MagicMock()
+    finder.tiktok_api.search_music.side_effect = lambda song, artist: [f"music-{song}"]
+    finder.tiktok_api.candidate_presence.side_effect = lambda music_id: {"videos": 10, "plays": 0}
+    finder.tiktok_api.find_matching_song.side_effect = lambda song, artist, ids, **kwargs: ids[0]
+    finder.tiktok_api.fetch_music_videos.side_effect = (
+        lambda music_id, limit=10: [{"id": f"{music_id}-{i}"} for i in range(limit)]
+    )
+    finder.tiktok_api.get_video_metadata.side_effect = lambda video_id: {"id": video_id}
+
+    finder.Uploader = MagicMock()
+    finder.Uploader.existing_video_uri.return_value = None
+    finder.Uploader.upload_tiktok_video_direct.side_effect = (
+        lambda video_json, check_existing=True: f"gs://bucket/tikapi_videos/{video_json['id']}.mp4"
+    )
+
+    finder.Analyzer = MagicMock()
+    finder.Analyzer.profiles = dict(GoogleVideoAnalyzer.FEATURE_PROFILES)
+    finder.Analyzer.analyze_videos_in_batch.side_effect = lambda video_uris, **kwargs: [
+        {
+            "video_uri": uri,
+            "analysis": {
+                "segment_labels": ["Dance"],
+                "shot_labels": [],
+                "objects": [{"object_description": "person"}],
+                "texts": [{"text": "@mj"}],
+            },
+        }
+        for uri in video_uris
+    ]
+
+    finder.Comparator = CompareFeatures(threshold=0.5)
+    finder.Summarizer = MagicMock()
+    finder.Summarizer.summarize_trends.return_value = "A dance brief"
+    finder.Summarizer.summarize_batch.side_effect = lambda track_trends, overall_trends: (
+        ["A dance brief"] * len(track_trends), "A dance brief"
+    )
+    return finder
+
+
+def make_async_finder():
+    """Build an AsyncViralMusicFinder sharing the mocked clients of make_finder"""
+    sync_finder = make_finder()
+    finder = AsyncViralMusicFinder.__new__(AsyncViralMusicFinder)
+    for name in ("music_api", "tiktok_api", "Uploader", "Analyzer", "Comparator", "Summarizer"):
+        setattr(finder, name, getattr(sync_finder, name))
+    finder.limits = dict(PipelineScheduler.DEFAULT_LIMITS)
+    finder._semaphores = {service: asyncio.Semaphore(limit) for service, limit in finder.limits.items()}
+    finder.http_client = None
+    finder.music_index = None
+    finder.expansion = dict(DEFAULT_EXPANSION)
+
+    finder.Uploader.timeout = (5.0, 30.0)
+    finder.trend_store = None
+    upload = sync_finder.Uploader.upload_tiktok_video_direct.side_effect
+    finder.Uploader.upload_tiktok_video_async = AsyncMock(
+        side_effect=lambda video_json, client, check_existing=True: upload(video_json)
+    )
+    analyze = sync_finder.Analyzer.analyze_videos_in_batch.side_effect
+    finder.Analyzer.analyze_videos_async = AsyncMock(
+        side_effect=lambda video_uris, **kwargs: analyze(video_uris)
+    )
+    finder.Summarizer.asummarize_trends = AsyncMock(return_value="A dance brief")
+    return finder
+
+
+class TestPipelineScheduler(unittest.TestCase):
+    """Test the shared bounded scheduler"""
+
+    def test_per_service_limit(self):
+        """No more than `limit` calls to one service run at the same time"""
+        scheduler = PipelineScheduler(limits={"gcs": 2})
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def task():
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.01)
+            with lock:
+                active.pop()
+
+        futures = [scheduler.submit("gcs", task) for _ in range(10)]
+        for future in futures:
+            future.result()
+        self.assertLessEqual(max(peak), 2)
+        self.assertEqual(scheduler.stats()["gcs"]["submitted"], 10)
+        scheduler.shutdown()
+
+    def test_unknown_service(self):
+        """Submitting to an unconfigured service is an error"""
+        scheduler = PipelineScheduler()
+        with self.assertRaises(ValueError):
+            scheduler.submit("spotify", lambda: None)
+        scheduler.shutdown()
+
+
+class TestFindTiktoks(unittest.TestCase):
+    """Test the brief pipeline end to end with mocked services"""
+
+    def test_output_lines(self):
+        """Every similar track gets a summary and the overall summary comes last"""
+        finder = make_finder()
+        lines = finder.find_tiktoks("Billie Jean", "Michael Jackson")
+
+        self.assertEqual(lines[:2], ["Found 2 similar tracks.", "Analyzing the 2 with the most TikTok presence."])
+        self.assertIn("=== Summary for 'Beat It' by Michael Jackson ===", lines)
+        self.assertIn("=== Summary for 'Thriller' by Michael Jackson ===", lines)
+        self.assertEqual(lines[-1], "A dance brief")
+        self.assertEqual(finder.Uploader.upload_tiktok_video_direct.call_count, 6)
+
+    def test_existing_videos_skip_metadata(self):
+        """Videos already in the bucket are not fetched from TikAPI again"""
+        finder = make_finder()
+        finder.Uploader.existing_video_uri.side_effect = lambda video_id: f"gs://bucket/{video_id}.mp4"
+        finder.find_tiktoks("Billie Jean", "Michael Jackson")
+
+        finder.tiktok_api.get_video_metadata.assert_not_called()
+        finder.Uploader.upload_tiktok_video_direct.assert_not_called()
+
+    def test_track_exception_is_reported(self):
+        """A failing track is reported without losing the other tracks"""
+        finder = make_finder()
+        finder.tiktok_api.search_music.side_effect = (
+            lambda song, artist: (_ for _ in ()).throw(RuntimeError("boom")) if song == "Thriller" else [song]
+        )
+        lines = finder.find_tiktoks("Billie Jean", "Michael Jackson")
+
+        self.assertIn("Track ('Thriller', 'Michael Jackson') generated an exception: boom", lines)
+        self.assertIn("=== Summary for 'Beat It' by Michael Jackson ===", lines)
+
+    def test_trend_store_accumulates_across_briefs(self):
+        """Analyzed videos are folded into the trend store once and trends are queried from it"""
+        finder = make_finder()
+        finder.trend_store = TrendStore(":memory:")
+        finder.Comparator = CompareFeatures(threshold=0.5, store=finder.trend_store)
+
+        lines = finder.find_tiktoks("Billie Jean", "Michael Jackson")
+        finder.find_tiktoks("Billie Jean", "Michael Jackson")
+
+        self.assertEqual(lines[-1], "A dance brief")
+        self.assertEqual(finder.trend_store.stats()["videos"], 6)
+        overall = finder.Summarizer.summarize_trends.call_args_list[-1].args[0]
+        self.assertEqual(overall["label_trends"], ["Dance"])
+        self.assertEqual(overall["text_trends"], ["@mj"])
+
+    def test_feature_profile_reaches_analyzer(self):
+        """The requested feature profile is used for every track's analysis"""
+        finder = make_finder()
+        finder.find_tiktoks("Billie Jean", "Michael Jackson", feature_profile="fast")
+
+        calls = finder.Analyzer.analyze_videos_in_batch.call_args_list
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(all(call.kwargs["profile"] == "fast" for call in calls))
+
+    def test_unknown_feature_profile(self):
+        """An unknown feature profile is rejected before any track is processed"""
+        finder = make_finder()
+        with self.assertRaises(ValueError):
+            finder.find_tiktoks("Billie Jean", "Michael Jackson", feature_profile="cheapest")
+        finder.tiktok_api.search_music.assert_not_called()
+
+    def test_events_are_emitted(self):
+        """Each pipeline milestone reaches the event hook, tagged with its track"""
+        finder = make_finder()
+        events = []
+        lock = threading.Lock()
+
+        def on_event(event, data):
+            with lock:
+                events.append((event, data))
+
+        finder.find_tiktoks("Billie Jean", "Michael Jackson", on_event=on_event)
+        names = [event for event, _ in events]
+
+        self.assertEqual(names[0], "similar_tracks")
+        self.assertEqual(names[-1], "summary")
+        self.assertEqual(names.count("tiktok_match"), 2)
+        self.assertEqual(names.count("video_uploaded"), 6)
+        self.assertEqual(names.count("track_summary"), 2)
+        matches = [data for event, data in events if event == "tiktok_match"]
+        self.assertIn({"song": "Beat It", "artist": "Michael Jackson", "music_id": "music-Beat It"}, matches)
+        self.assertIn("on_token", finder.Summarizer.summarize_trends.call_args.kwargs)
+
+    def test_music_index_skips_search(self):
+        """Indexed tracks are not searched; fresh resolutions are recorded"""
+        finder = make_finder()
+        finder.music_index = MusicIDIndex(":memory:")
+        finder.music_index.record("Beat It", "Michael Jackson", "indexed-id")
+        finder.music_index.record("Thriller", "Michael Jackson", None)
+        lines = finder.find_tiktoks("Billie Jean", "Michael Jackson")
+
+        finder.tiktok_api.search_music.assert_not_called()
+        self.assertIn("=== Summary for 'Beat It' by Michael Jackson ===", lines)
+        self.assertNotIn("=== Summary for 'Thriller' by Michael Jackson ===", lines)
+        finder.tiktok_api.fetch_music_videos.assert_called_with("indexed-id", limit=3)
+
+        finder.music_index.delete("Thriller", "Michael Jackson")
+        finder.find_tiktoks("Billie Jean", "Michael Jackson")
+        self.assertEqual(finder.music_index.lookup("thriller", "michael  jackson")["music_id"], "music-Thriller")
+
+    def test_delayed_summaries_are_set_before_lines(self):
+        """Every track summary is stored before its future resolves, even when the summarizer is slow"""
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for _ in range(50):
+                finder = make_finder()
+                finder.Summarizer.summarize_trends.side_effect = (
+                    lambda trends, **kwargs: time.sleep(0.001) or "A dance brief"
+                )
+                lines = finder.find_tiktoks("Billie Jean", "Michael Jackson")
+
+                self.assertEqual(lines.count("A dance brief"), 3)
+        finally:
+            sys.setswitchinterval(switch_interval)
+
+    def test_failed_track_summary(self):
+        """A failed summary is raised from its future and fails the brief, in both finders"""
+        finder = make_finder()
+        finder.Summarizer.summarize_trends.side_effect = SummaryError("quota")
+        events = []
+        result = {"song": "Beat It", "artist": "Michael Jackson", "trends": {"labels": ["Dance"]}, "summary": None}
+        future = finder._submit_track_summary(result, on_event=lambda event, data: events.append((event, data)))
+
+        with self.assertRaises(SummaryError):
+            future.result()
+        self.assertIsNone(result["summary"])
+        self.assertEqual(events, [])
+        with self.assertRaises(SummaryError):
+            finder.find_tiktoks("Billie Jean", "Michael Jackson")
+
+        async_finder = make_async_finder()
+        async_finder.Summarizer.asummarize_trends.side_effect = SummaryError("quota")
+        with self.assertRaises(SummaryError):
+            asyncio.run(async_finder.find_tiktoks("Billie Jean", "Michael Jackson"))
+
+    def test_batched_summaries(self):
+        """Batched mode makes one summary call and produces the same lines"""
+        concurrent_lines = make_finder().find_tiktoks("Billie Jean", "Michael Jackson")
+        finder = make_finder()
+        batched_lines = finder.find_tiktoks("Billie Jean", "Michael Jackson", summary_mode="batched")
+
+        self.assertEqual(sorted(batched_lines), sorted(concurrent_lines))
+        self.assertEqual(batched_lines[-1], concurrent_lines[-1])
+        finder.Summarizer.summarize_batch.assert_called_once()
+        finder.Summarizer.summarize_trends.assert_not_called()
+
+    def test_batched_falls_back_to_per_track(self):
+        """An unusable batched response falls back to one call per track"""
+        finder = make_finder()
+        finder.Summarizer.summarize_batch.side_effect = None
+        finder.Summarizer.summarize_batch.return_value = None
+        lines = finder.find_tiktoks("Billie Jean", "Michael Jackson", summary_mode="batched")
+
+        self.assertEqual(finder.Summarizer.summarize_trends.call_count, 3)
+        self.assertEqual(lines[-1], "A dance brief")
+
+
+def make_expansion_finder():
+    """A finder whose five similar tracks differ in Last.fm match and TikTok presence"""
+    finder = make_finder()
+    finder.music_api.get_similar_tracks_scored.return_value = [
+        ("Quiet", "A", 0.95), ("Viral", "B", 0.4), ("Popular", "C", 0.6), ("Absent", "D", 0.9), ("Niche", "E", 0.5)
+    ]
+    plays = {"Quiet": 100, "Viral": 500_000_000, "Popular": 1_000_000, "Niche": 10_000}
+    finder.tiktok_api.search_music.side_effect = lambda song, artist: [f"music-{song}"] if song in plays else []
+    finder.tiktok_api.find_matching_song.side_effect = lambda song, artist, ids, **kwargs: ids[0] if ids else None
+    # Search hits on each candidate sound; Niche has only two
+    hits = lambda music_id: 2 if music_id == "music-Niche" else DEFAULT_EXPANSION["probe_videos"]
+    finder.tiktok_api.candidate_presence.side_effect = lambda music_id: {
+        "videos": hits(music_id), "plays": hits(music_id) * plays[music_id[len("music-"):]]
+    }
+    finder.tiktok_api.fetch_music_videos.side_effect = lambda music_id, limit=10: [
+        {"id": f"{music_id}-{i}", "stats": {"playCount": plays[music_id[len("music-"):]]}}
+        for i in range(min(limit, hits(music_id)))
+    ]
+    return finder
+
+
+class TestSimilarTrackExpansion(unittest.TestCase):
+    """Test that similar tracks are probed cheaply and only the best are analyzed"""
+
+    def test_candidate_score(self):
+        self.assertEqual(candidate_score(1.0, 0, 10 ** 6, 10), 0.0)
+        self.assertGreater(candidate_score(0.5, 10, 10 ** 7, 10), candidate_score(0.9, 10, 100, 10))
+        self.assertAlmostEqual(candidate_score(1.0, 10, 10 ** 9 - 1, 10), 1.0)
+
+    def test_only_the_best_tracks_are_analyzed(self):
+        """The track budget is spent on the tracks with the most TikTok presence"""
+        finder = make_expansion_finder()
+        events = []
+        lines = finder.find_tiktoks("Billie Jean", "Michael Jackson", track_budget=2,
+                                    on_event=lambda event, data: events.append((event, data)))
+
+        self.assertEqual(lines[:2], ["Found 5 similar tracks.", "Analyzing the 2 with the most TikTok presence."])
+        headers = [line for line in lines if line.startswith("===")]
+        self.assertEqual(sorted(headers), ["=== Summary for 'Popular' by C ===", "=== Summary for 'Viral' by B ==="])
+        self.assertEqual(finder.Analyzer.analyze_videos_in_batch.call_count, 2)
+        # Every candidate is searched once; only the selected ones are verified, reusing that search
+        self.assertEqual(finder.tiktok_api.search_music.call_count, 5)
+        verified = sorted(call.args[0] for call in finder.tiktok_api.find_matching_song.call_args_list)
+        self.assertEqual(verified, ["Popular", "Viral"])
+        fetched = {call.args[0] for call in finder.tiktok_api.fetch_music_videos.call_args_list}
+        self.assertEqual(fetched, {"music-Popular", "music-Viral"})
+
+        candidates = next(data["candidates"] for event, data in events if event == "track_candidates")
+        self.assertEqual([track["song"] for track in candidates], ["Viral", "Popular", "Quiet", "Niche"])
+        self.assertEqual(candidates[0]["videos"], DEFAULT_EXPANSION["probe_videos"])
+
+    def test_indexed_tracks_are_probed_without_search(self):
+        """A track in the music index is probed from its sound's videos and not verified again"""
+        finder = make_expansion_finder()
+        finder.music_index = MusicIDIndex(":memory:")
+        finder.music_index.record("Quiet", "A", "music-Viral")
+        finder.music_index.record("Viral", "B", None)
+        lines = finder.find_tiktoks("Billie Jean", "Michael Jackson", track_budget=1)
+
+        self.assertEqual([line for line in lines if line.startswith("===")], ["=== Summary for 'Quiet' by A ==="])
+        searched = sorted(call.args[0] for call in finder.tiktok_api.search_music.call_args_list)
+        self.assertEqual(searched, ["Absent", "Niche", "Popular"])
+        finder.tiktok_api.find_matching_song.assert_not_called()
+
+    def test_budget_defaults_and_validation(self):
+        finder = make_expansion_finder()
+        finder.expansion = {**DEFAULT_EXPANSION, "candidates": 4, "track_budget": 1}
+        lines = finder.find_tiktoks("Billie Jean", "Michael Jackson")
+
+        finder.music_api.get_similar_tracks_scored.assert_called_with(song="Billie Jean", artist="Michael Jackson", limit=4)
+        self.assertEqual([line for line in lines if line.startswith("===")], ["=== Summary for 'Viral' by B ==="])
+        with self.assertRaises(ValueError):
+            finder.find_tiktoks("Billie Jean", "Michael Jackson", track_budget=0)
+
+    def test_async_budget(self):
+        """The asyncio pipeline ranks and selects the same tracks"""
+        sync_finder = make_expansion_finder()
+        finder = make_async_finder()
+        finder.music_api = sync_finder.music_api
+        finder.tiktok_api = sync_finder.tiktok_api
+
+        async def run():
+            try:
+                return await finder.find_tiktoks("Billie Jean", "Michael Jackson", track_budget=1)
+            finally:
+                await finder.aclose()
+
+        lines = asyncio.run(run())
+        self.assertEqual([line for line in lines if line.startswith("===")], ["=== Summary for 'Viral' by B ==="])
+
+
+class TestLazyClients(unittest.TestCase):
+    """Test that the package and the finder defer loading the service SDKs"""
+
+    SDKS = ("google.cloud.videointelligence", "google.cloud.storage", "openai", "pylast", "tikapi")
+
+    def make_real_finder(self):
+        return ViralMusicFinder("lastfm-key", "lastfm-secret", "openai-key", "tikapi-key",
+                                "google.json", "bucket", scheduler=PipelineScheduler())
+
+    def test_importing_loads_no_sdk(self):
+        """Importing the package or the finder module imports none of the SDKs"""
+        code = (
+            "import sys; import src; from src.ViralMusicFinder import load_config_and_initialize; "
+            "from src import ViralMusicFinder, TrendStore; "
+            f"print([m for m in {self.SDKS!r} if m in sys.modules])"
+        )
+        output = subprocess.run([sys.executable, "-c", code], cwd=parent_dir, capture_output=True, text=True, check=True)
+        self.assertEqual(output.stdout.strip(), "[]")
+
+    def test_package_exports(self):
+        import src
+        self.assertIs(src.ViralMusicFinder, ViralMusicFinder)
+        self.assertIs(src.TrendStore, TrendStore)
+        self.assertEqual(src.Scheduler.PipelineScheduler, PipelineScheduler)
+        with self.assertRaises(AttributeError):
+            src.NotAModule
+
+    def test_clients_are_built_on_first_use(self):
+        finder = self.make_real_finder()
+        for name in ("music_api", "tiktok_api", "Uploader", "Analyzer", "Summarizer"):
+            self.assertFalse(lazy_client.is_built(finder, name))
+        self.assertEqual(finder.analysis_stats(), {})
+        self.assertEqual(finder.lastfm_stats(), {})
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            clients = list(executor.map(lambda _: finder.music_api, range(8)))
+        self.assertTrue(all(client is clients[0] for client in clients))
+        self.assertEqual(clients[0].API_KEY, "lastfm-key")
+        self.assertIs(clients[0].limiter, finder.rate_limiters.get("lastfm"))
+        self.assertEqual(finder.lastfm_stats()["coalesced"], 0)
+        finder.scheduler.shutdown()
+
+    CLIENT_NAMES = ("music_api", "tiktok_api", "Uploader", "Analyzer", "Summarizer")
+
+    def recording_async_finder(self, built_on):
+        """An async finder whose lazy clients return mocks and record the thread that built them"""
+        def recorded(name):
+            def build(finder):
+                built_on[name] = threading.get_ident()
+                return finder._mocks[name]
+            return lazy_client(build)
+
+        names = self.CLIENT_NAMES
+        RecordingFinder = type("RecordingFinder", (AsyncViralMusicFinder,), {name: recorded(name) for name in names})
+        finder = RecordingFinder.__new__(RecordingFinder)
+        mocked = make_async_finder()
+        finder.__dict__.update({key: value for key, value in mocked.__dict__.items() if key not in names})
+        finder._mocks = {name: mocked.__dict__[name] for name in names}
+        return finder
+
+    def test_async_clients_are_built_off_the_loop(self):
+        """The async finder builds its clients in worker threads, never on the event loop"""
+        built_on = {}
+        finder = self.recording_async_finder(built_on)
+
+        async def run():
+            return threading.get_ident(), await finder.find_tiktoks("Billie Jean", "Michael Jackson")
+
+        loop_thread, lines = asyncio.run(run())
+        self.assertEqual(lines[-1], "A dance brief")
+        self.assertEqual(sorted(built_on), sorted(self.CLIENT_NAMES))
+        self.assertNotIn(loop_thread, built_on.values())
+
+    def test_async_analyzer_is_built_only_when_used(self):
+        """A brief without similar tracks never builds the Video Intelligence client"""
+        built_on = {}
+        finder = self.recording_async_finder(built_on)
+        finder._mocks["music_api"].get_similar_tracks_scored.return_value = []
+
+        lines = asyncio.run(finder.find_tiktoks("Billie Jean", "Michael Jackson", feature_profile="fast"))
+        self.assertEqual(lines[0], "No similar tracks found.")
+        self.assertEqual(sorted(built_on), ["music_api"])
+
+
+class TestAsyncFindTiktoks(unittest.TestCase):
+    """Test that the asyncio pipeline matches the threaded one"""
+
+    def test_same_output_as_sync(self):
+        """Both variants produce the same output lines for the same inputs"""
+        sync_lines = make_finder().find_tiktoks("Billie Jean", "Michael Jackson")
+
+        async def run():
+            finder = make_async_finder()
+            try:
+                return await finder.find_tiktoks("Billie Jean", "Michael Jackson")
+            finally:
+                await finder.aclose()
+
+        async_lines = asyncio.run(run())
+        self.assertEqual(async_lines[0], sync_lines[0])
+        self.assertEqual(sorted(async_lines), sorted(sync_lines))
+        self.assertEqual(async_lines[-1], sync_lines[-1])
+
+    def test_many_briefs_on_one_loop(self):
+        """Several briefs can run concurrently on the same event loop"""
+        async def run():
+            finder = make_async_finder()
+            return await asyncio.gather(*(finder.find_tiktoks("Billie Jean", "Michael Jackson") for _ in range(5)))
+
+        results = asyncio.run(run())
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(lines[-1] == "A dance brief" for lines in results))
+
+    def test_verifications_respect_the_tikapi_limit(self):
+        """Candidate verifications of concurrent resolutions share the TikAPI semaphore"""
+        finder = make_async_finder()
+        finder.limits["tikapi"] = 2
+        finder._semaphores["tikapi"] = asyncio.Semaphore(2)
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def verify(music_id):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.01)
+            with lock:
+                active[0] -= 1
+            return None
+
+        def find_matching_song(song, artist, ids, submit=None):
+            futures = [submit(verify, f"{song}-{i}") for i in range(8)]
+            concurrent.futures.wait(futures)
+            return ids[0]
+
+        finder.tiktok_api.find_matching_song.side_effect = find_matching_song
+
+        async def run():
+            return await asyncio.gather(*(finder._resolve_music_id(song, "Michael Jackson")
+                                          for song in ("Beat It", "Thriller", "Bad", "Smooth Criminal")))
+
+        self.assertEqual(asyncio.run(run()), ["music-Beat It", "music-Thriller", "music-Bad", "music-Smooth Criminal"])
+        self.assertEqual(peak[0], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
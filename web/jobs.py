@@ -0,0 +1,249 @@
+import concurrent.futures
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def describe_event(event, data):
+    """
+    Turn a pipeline event into a short progress message, or None for events too small
+    to be worth recording (such as individual summary tokens).
+    """
+    track = f"'{data['song']}' by {data['artist']}" if "song" in data else None
+    if event == "similar_tracks":
+        return f"Found {len(data.get('tracks', []))} similar tracks"
+    if event == "tiktok_match":
+        return f"Matched {track} on TikTok"
+    if event == "video_uploaded":
+        return f"Uploaded video {data.get('video_id')} for {track}"
+    if event == "analysis_done":
+        return f"Analyzed {data.get('video_uri')} for {track}"
+    if event == "track_summary":
+        return f"Summarized {track}"
+    if event == "summary":
+        return "Writing the final brief"
+    return None
+
+
+class BriefJobStore:
+    """
+    Persists brief generation jobs in a local SQLite database.
+
+    Each job records the requested song/artist, its status (queued, running, done, failed),
+    a short progress message and, once finished, the brief or the error message.
+
+    Several processes (e.g. web workers) may share one database. Each store is an owner
+    that stamps the jobs it creates and renews a heartbeat lease from a background thread;
+    only queued or running jobs whose owner's lease has expired are marked as interrupted.
+    """
+    COLUMNS = ("id", "song", "artist", "request_key", "status", "progress",
+               "result", "error", "created_at", "updated_at", "owner")
+
+    def __init__(self, path, lease=60.0):
+        """
+        Open (or create) the job database and recover the jobs of owners that are gone.
+
+        Args:
+            path (str): Path to the SQLite file, or ":memory:"
+            lease (float, optional): Seconds without a heartbeat after which an owner's
+                                     unfinished jobs are considered interrupted
+        """
+        self.path = path
+        self.lease = lease
+        self.owner = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " song TEXT, artist TEXT, request_key TEXT,"
+                " status TEXT, progress TEXT, result TEXT, error TEXT,"
+                " created_at REAL, updated_at REAL, owner TEXT)"
+            )
+            # Databases created before jobs had owners
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if "owner" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_request_key ON jobs (request_key, status)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS job_owners (owner TEXT PRIMARY KEY, heartbeat_at REAL)")
+        self.heartbeat()
+        self.recover_interrupted()
+        threading.Thread(target=self._keep_alive, name="brief-job-heartbeat", daemon=True).start()
+
+    def heartbeat(self):
+        """Renew this store's lease on the jobs it owns."""
+        with self._lock, self._conn:
+            if self._closed.is_set():
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_owners (owner, heartbeat_at) VALUES (?, ?)", (self.owner, time.time())
+            )
+
+    def recover_interrupted(self):
+        """
+        Mark the queued or running jobs of owners whose lease has expired (or that have no
+        owner at all) as failed; they will never finish.
+
+        Returns:
+            int: The number of jobs marked as failed
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM job_owners WHERE heartbeat_at < ?", (now - self.lease,))
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE status IN (?, ?)"
+                " AND (owner IS NULL OR owner NOT IN (SELECT owner FROM job_owners))",
+                (FAILED, "Interrupted by a server restart", now, QUEUED, RUNNING)
+            )
+        return cursor.rowcount
+
+    def close(self):
+        """Stop renewing the lease and release it; call once this store's jobs have finished."""
+        self._closed.set()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM job_owners WHERE owner = ?", (self.owner,))
+
+    def _keep_alive(self):
+        """Heartbeat thread body: renew the lease and recover other owners' jobs a few times per lease."""
+        while not self._closed.wait(self.lease / 3):
+            try:
+                self.heartbeat()
+                self.recover_interrupted()
+            except sqlite3.Error as e:
+                print(f"Brief job heartbeat failed: {e}")
+
+    def create(self, song, artist, request_key):
+        """Insert a new queued job and return it as a dictionary."""
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex, "song": song, "artist": artist, "request_key": request_key,
+            "status": QUEUED, "progress": "Waiting for a worker", "result": None, "error": None,
+            "created_at": now, "updated_at": now, "owner": self.owner,
+        }
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO jobs ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                tuple(job[column] for column in self.COLUMNS)
+            )
+        return job
+
+    def update(self, job_id, **fields):
+        """Update the given columns of a job."""
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id):
+        """Return a job as a dictionary, or None if it does not exist."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return dict(zip(self.COLUMNS, row)) if row else None
+
+    def find_active(self, request_key):
+        """Return the queued or running job for `request_key`, if there is one."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs"
+                " WHERE request_key = ? AND status IN (?, ?) ORDER BY created_at DESC LIMIT 1",
+                (request_key, QUEUED, RUNNING)
+            ).fetchone()
+        return dict(zip(self.COLUMNS, row)) if row else None
+
+
+class BriefJobQueue:
+    """
+    Runs brief generation jobs on a background worker pool.
+
+    Identical requests (same song/artist and options) that are already queued or running
+    are coalesced onto the existing job instead of starting the pipeline again.
+    """
+    def __init__(self, store, runner, max_workers=2):
+        """
+        Args:
+            store (BriefJobStore): Where job state is persisted
+            runner (callable): Called as runner({"song": ..., "artist": ..., "feature_profile": ...,
+                               "track_budget": ...}, on_event) and returns the brief. Events passed to on_event update the job's progress.
+            max_workers (int, optional): Number of briefs generated at the same time
+        """
+        self.store = store
+        self.runner = runner
+        self._submit_lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="brief-job"
+        )
+
+    @staticmethod
+    def request_key(song, artist, feature_profile=None, track_budget=None):
+        """
+        Normalize a request so that trivially different requests coalesce. Options that are
+        set become part of the key, so requests with different options never share a job.
+        """
+        key = f"{' '.join(song.lower().split())}|{' '.join(artist.lower().split())}"
+        if feature_profile is not None:
+            key += f"|profile={feature_profile}"
+        if track_budget is not None:
+            key += f"|budget={track_budget}"
+        return key
+
+    def submit(self, song, artist, feature_profile=None, track_budget=None):
+        """
+        Enqueue a brief for `song` by `artist`, or join the identical job already in flight.
+
+        Args:
+            song (str): The input song
+            artist (str): The input song's artist
+            feature_profile (str, optional): Video Intelligence feature profile for the analyses
+            track_budget (int, optional): How many similar tracks are uploaded and analyzed
+
+        Returns:
+            tuple: (job, coalesced) where coalesced is True if an existing job was returned
+        """
+        key = self.request_key(song, artist, feature_profile, track_budget)
+        with self._submit_lock:
+            existing = self.store.find_active(key)
+            if existing:
+                return existing, True
+            job = self.store.create(song, artist, key)
+        request = {"song": song, "artist": artist, "feature_profile": feature_profile, "track_budget": track_budget}
+        self._executor.submit(self._run, job["id"], request)
+        return job, False
+
+    def get(self, job_id):
+        """Return the current state of a job, or None."""
+        return self.store.get(job_id)
+
+    def shutdown(self, wait=True):
+        """Stop the worker pool and release the store's lease on its jobs."""
+        self._executor.shutdown(wait=wait)
+        self.store.close()
+
+    def _run(self, job_id, request):
+        """Worker body: run the pipeline and record the outcome."""
+        self.store.update(job_id, status=RUNNING, progress="Generating brief")
+
+        def on_event(event, data):
+            message = describe_event(event, data)
+            if message:
+                self.store.update(job_id, progress=message)
+
+        try:
+            result = self.runner(request, on_event)
+        except Exception as e:
+            print(f"Brief job {job_id} failed: {e}")
+            self.store.update(job_id, status=FAILED, progress="Failed", error=str(e))
+            return
+        self.store.update(job_id, status=DONE, progress="Done", result=result)
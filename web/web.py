@@ -1,13 +1,20 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 import sys
 import os
+import json
+import queue
+import threading
 
 # Add the parent directory to the path so we can import from src
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(parent_dir)
 
-# Import from the src directory
-from src import *
+# Make sibling modules importable both as a script and as web.web
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Import only the entry point; the API clients and their SDKs load on first use
+from src.ViralMusicFinder import load_config_and_initialize
+from jobs import BriefJobStore, BriefJobQueue
 
 app = Flask(__name__)
 
@@ -19,6 +26,15 @@ except Exception as e:
     print(f"Error initializing ViralMusicFinder: {e}")
     music_finder = None
 
+# Background jobs for POST /briefs, persisted so that results survive the request.
+# Workers may share the database; only jobs of workers that stopped are marked interrupted.
+JOBS_DB = os.environ.get('BRIEF_JOBS_DB', os.path.join(parent_dir, 'cache', 'jobs.sqlite'))
+job_queue = BriefJobQueue(
+    BriefJobStore(JOBS_DB),
+    runner=lambda data, on_event: generate_brief(data, on_event=on_event),
+    max_workers=int(os.environ.get('BRIEF_JOB_WORKERS', 2))
+)
+
 def pretty_print(text: str) -> str:
     # Replace escaped newlines with actual newlines
     formatted_text = text.replace("\\n", "\n")
@@ -34,38 +50,60 @@ def pretty_print(text: str) -> str:
     result = "\n\n".join(paragraph.strip() for paragraph in paragraphs)
     return result
 
-def generate_brief(song_data) -> str:
-    """Generate a brief for the given song data as a nicely formatted string."""
-    try:
-        # Extract song and artist from the request data
-        song = song_data.get("song")
-        artist = song_data.get("artist")
-        
-        if not song or not artist:
-            return "Please provide both song and artist"
-        
-        # Use your ViralMusicFinder to process the song
-        result = music_finder.find_tiktoks(song=song, artist=artist)
-        
-        # If the function returns a tuple, assume the second element is the summary.
-        # Otherwise, assume the result is the summary.
-        if isinstance(result, tuple):
-            _, summary = result
-        else:
-            summary = result
-        
-        # If the summary is a list of strings, join them with newline characters.
-        if isinstance(summary, list):
-            formatted_summary = "\n".join(summary)
-            formatted_summary = pretty_print(formatted_summary)
-        else:
-            formatted_summary = summary
-        
-        return formatted_summary if formatted_summary else "Could not generate a brief for this song"
+def generate_brief(song_data, on_event=None) -> str:
+    """Generate a brief for the given song data as a nicely formatted string.
+    Pipeline milestones are passed to `on_event(event, data)` when it is given.
+    Pipeline failures are raised, so that job and stream callers can report them.
+    """
+    # Extract song and artist from the request data
+    song = song_data.get("song")
+    artist = song_data.get("artist")
     
-    except Exception as e:
-        print(f"Error generating brief: {e}")
-        return f"Error generating brief: {str(e)}"
+    if not song or not artist:
+        return "Please provide both song and artist"
+    if music_finder is None:
+        raise RuntimeError("ViralMusicFinder is not initialized")
+    
+    # Use your ViralMusicFinder to process the song (options are checked by brief_options)
+    result = music_finder.find_tiktoks(song=song, artist=artist, on_event=on_event,
+                                       feature_profile=song_data.get("feature_profile"),
+                                       track_budget=song_data.get("track_budget"))
+    
+    # If the function returns a tuple, assume the second element is the summary.
+    # Otherwise, assume the result is the summary.
+    if isinstance(result, tuple):
+        _, summary = result
+    else:
+        summary = result
+    
+    # If the summary is a list of strings, join them with newline characters.
+    if isinstance(summary, list):
+        formatted_summary = "\n".join(summary)
+        formatted_summary = pretty_print(formatted_summary)
+    else:
+        formatted_summary = summary
+    
+    return formatted_summary if formatted_summary else "Could not generate a brief for this song"
+
+def brief_options(data):
+    """Validate the optional feature_profile and track_budget of a brief request.
+    Returns (options, error): options holds both (None when unset) and error is
+    None, or the message of a 400 response.
+    """
+    feature_profile = data.get("feature_profile") or None
+    if feature_profile is not None and not isinstance(feature_profile, str):
+        return None, "feature_profile must be a string"
+    track_budget = data.get("track_budget")
+    if track_budget in (None, ""):
+        track_budget = None
+    else:
+        try:
+            track_budget = int(track_budget)
+        except (TypeError, ValueError):
+            return None, "track_budget must be an integer"
+        if track_budget < 1:
+            return None, "track_budget must be at least 1"
+    return {"feature_profile": feature_profile, "track_budget": track_budget}, None
 
 @app.route('/get-brief', methods=['POST', 'GET'])
 def get_brief_endpoint():
@@ -80,15 +118,24 @@ def get_brief_endpoint():
             artist = request.args.get('artist')
             if not song or not artist:
                 return jsonify({"error": "Please provide both song and artist as query parameters"}), 400
-            data = {"song": song, "artist": artist}
+            data = {"song": song, "artist": artist, "feature_profile": request.args.get('feature_profile'),
+                    "track_budget": request.args.get('track_budget')}
         else:
             # For POST requests, extract JSON data
             data = request.get_json()
             if not data:
                 return jsonify({"error": "No data provided"}), 400
+        options, error = brief_options(data)
+        if error:
+            return jsonify({"error": error}), 400
+        data = {**data, **options}
         
         # Generate the brief as a nicely formatted string
-        brief = generate_brief(data)
+        try:
+            brief = generate_brief(data)
+        except Exception as e:
+            print(f"Error generating brief: {e}")
+            brief = f"Error generating brief: {str(e)}"
         print(f"Brief generated:\n{brief}")
         
         # Return the result in JSON with the nicely formatted string
@@ -97,11 +144,107 @@ def get_brief_endpoint():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/get-brief/stream', methods=['GET'])
+def stream_brief_endpoint():
+    """API endpoint that streams brief progress as server-sent events.
+    Emits one event per pipeline milestone, the summaries token by token,
+    and finally a 'brief' event with the formatted brief.
+    """
+    song = request.args.get('song')
+    artist = request.args.get('artist')
+    if not song or not artist:
+        return jsonify({"error": "Please provide both song and artist as query parameters"}), 400
+    options, error = brief_options(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    events = queue.Queue()
+
+    def run_pipeline():
+        try:
+            brief = generate_brief({"song": song, "artist": artist, **options},
+                                   on_event=lambda event, data: events.put((event, data)))
+            events.put(("brief", {"brief": brief}))
+        except Exception as e:
+            events.put(("error", {"error": str(e)}))
+        finally:
+            events.put(None)
+
+    threading.Thread(target=run_pipeline, daemon=True).start()
+
+    def event_stream():
+        while True:
+            try:
+                item = events.get(timeout=15)
+            except queue.Empty:
+                # Comment lines keep proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                break
+            event, data = item
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return Response(
+        stream_with_context(event_stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/briefs', methods=['POST'])
+def create_brief_job():
+    """API endpoint to start generating a brief in the background.
+    Accepts song and artist, plus the optional feature_profile and track_budget of /get-brief.
+    Returns 202 with the job ID. Identical requests already in flight share one job.
+    """
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+        song = data.get("song")
+        artist = data.get("artist")
+        if not song or not artist:
+            return jsonify({"error": "Please provide both song and artist"}), 400
+        options, error = brief_options(data)
+        if error:
+            return jsonify({"error": error}), 400
+
+        job, coalesced = job_queue.submit(song, artist, **options)
+        response = jsonify({"job_id": job["id"], "status": job["status"], "coalesced": coalesced})
+        response.headers["Location"] = f"/briefs/{job['id']}"
+        return response, 202
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/briefs/<job_id>', methods=['GET'])
+def get_brief_job(job_id):
+    """API endpoint to poll a brief job for its status, progress and result."""
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({
+        "job_id": job["id"],
+        "song": job["song"],
+        "artist": job["artist"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "brief": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    })
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Simple health check endpoint."""
     print("health")
-    return jsonify({"status": "ok"})
+    return jsonify({
+        "status": "ok",
+        "rate_limits": music_finder.throttle_stats() if music_finder else {},
+        "analysis": music_finder.analysis_stats() if music_finder else {},
+        "lastfm": music_finder.lastfm_stats() if music_finder else {}
+    })
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8080))